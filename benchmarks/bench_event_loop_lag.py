@@ -0,0 +1,92 @@
+"""Event-loop lag while scoring DIDs concurrently, blocking vs. executor-backed storage.
+
+A ticker coroutine sleeps for 1 ms in a loop and records how late it wakes
+up. Blocking database calls made directly from coroutines show up as lag;
+calls routed through run_db() should not.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_event_loop_lag --count 2000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import did_trust_scoring as trust
+
+TICK = 0.001
+
+
+async def _ticker(lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def _blocking_score(did):
+    """The pre-async storage path: synchronous DB calls inside the coroutine."""
+    trust.init_db()
+    report = await trust.score_trust_report(did)
+    trust.insert_trust_score(did, report['score'])
+
+
+async def _measure(score, count, concurrency):
+    lags, stop = [], asyncio.Event()
+    ticker = asyncio.ensure_future(_ticker(lags, stop))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await score(f'did:agent:lag-{i}')
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+
+    lags.sort()
+    return {
+        'seconds': elapsed,
+        'ticks': len(lags),
+        'lag_p50_ms': statistics.median(lags) * 1000 if lags else None,
+        'lag_p99_ms': lags[int(len(lags) * 0.99) - 1] * 1000 if lags else None,
+        'lag_max_ms': lags[-1] * 1000 if lags else None
+    }
+
+
+def run(count, concurrency=64):
+    """Return lag statistics for the blocking and the async storage paths."""
+    with tempfile.TemporaryDirectory(prefix='diddragon-bench-') as workdir:
+        trust.close_pools()
+        trust.DATABASE_CONFIG['default'] = 'sqlite'
+        trust.DATABASE_CONFIG['backends']['sqlite']['NAME'] = os.path.join(workdir, 'lag.db')
+        trust.init_db()
+        try:
+            return {
+                'blocking': asyncio.run(_measure(_blocking_score, count, concurrency)),
+                'async': asyncio.run(_measure(trust.aggregate_trust_score, count, concurrency))
+            }
+        finally:
+            trust.shutdown_db_executor()
+            trust.close_pools()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event-loop lag benchmark")
+    parser.add_argument('--count', type=int, default=2000, help="DIDs to score per mode")
+    parser.add_argument('--concurrency', type=int, default=64)
+    args = parser.parse_args()
+
+    for mode, stats in run(args.count, args.concurrency).items():
+        print(f"{mode:>9}: " + ", ".join(
+            f"{name}={value:.2f}" if isinstance(value, float) else f"{name}={value}"
+            for name, value in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
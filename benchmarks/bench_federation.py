@@ -0,0 +1,99 @@
+"""Federated quorum latency and accuracy against local stand-in nodes, with and without hedging.
+
+Every node answers after `--latency` seconds, except for a `--slow-ratio`
+share of requests that take `--slow-latency`. One node always lies and one
+fails a `--error-rate` share of requests, so the consensus and the
+error-rate steering are exercised too.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_federation --queries 2000 --nodes 7 --quorum 3
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from did_federation import FederatedQuorumClient, StandInNode, stand_in_score
+
+from benchmarks.datagen import unique_dids
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+    return {
+        'p50_ms': pick(0.50) * 1000,
+        'p99_ms': pick(0.99) * 1000,
+        'max_ms': samples[-1] * 1000,
+        'mean_ms': statistics.fmean(samples) * 1000
+    }
+
+
+async def measure(urls, dids, quorum, concurrency, hedge_percentile):
+    client = FederatedQuorumClient(urls, quorum=quorum, hedge_percentile=hedge_percentile)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, wrong = [], 0
+
+    async def one(did):
+        nonlocal wrong
+        async with semaphore:
+            start = time.perf_counter()
+            result = await client.query(did)
+            latencies.append(time.perf_counter() - start)
+            wrong += abs(result['score'] - stand_in_score(did)) > 1e-9
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(did) for did in dids))
+    elapsed = time.perf_counter() - start
+    requests = sum(node.requests for node in client.nodes)
+    return {
+        'latency': _percentiles(latencies),
+        'queries_per_sec': len(dids) / elapsed,
+        'requests_per_query': requests / len(dids),
+        'hedged': client.hedged,
+        'wrong_scores': wrong
+    }
+
+
+async def run(args):
+    nodes = [await StandInNode(latency=args.latency, slow_ratio=args.slow_ratio, slow_latency=args.slow_latency,
+                               seed=i).start() for i in range(args.nodes)]
+    nodes[0].score = 0.0  # Byzantine: always reports zero trust
+    nodes[1].error_rate = args.error_rate
+    urls = [node.url for node in nodes]
+    dids = list(unique_dids(args.queries, args.seed))
+    try:
+        return {
+            'no_hedging': await measure(urls, dids, args.quorum, args.concurrency, None),
+            'hedged_p95': await measure(urls, dids, args.quorum, args.concurrency, 0.95),
+        }
+    finally:
+        for node in nodes:
+            await node.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Federated quorum benchmark")
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--nodes', type=int, default=7)
+    parser.add_argument('--quorum', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--slow-ratio', type=float, default=0.02)
+    parser.add_argument('--slow-latency', type=float, default=0.25)
+    parser.add_argument('--error-rate', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for mode, results in asyncio.run(run(args)).items():
+        print(mode)
+        for name, value in results.items():
+            if isinstance(value, dict):
+                print('   ' + '  '.join(f"{key}={val:.2f}" for key, val in value.items()))
+            else:
+                print(f"   {name}: {value:.2f}" if isinstance(value, float) else f"   {name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
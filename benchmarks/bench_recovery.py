@@ -0,0 +1,119 @@
+"""Per-DID recovery loop against bulk_trust_repair(), checking both give the same scores.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_recovery --count 5000
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import did_trust_scoring as trust
+
+
+def use_database(path):
+    """Point the scoring module at a SQLite file."""
+    trust.close_pools()
+    trust.DATABASE_CONFIG['default'] = 'sqlite'
+    trust.DATABASE_CONFIG['backends']['sqlite']['NAME'] = path
+
+
+def populate(path, count, seed=0):
+    """Create `count` pending recoveries with mixed flag state and ledger age."""
+    use_database(path)
+    trust.init_db()
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    with trust.db_connection() as conn:
+        c = conn.cursor()
+        conn.execute('BEGIN IMMEDIATE')
+        for i in range(count):
+            did = f'did:agent:recovery-{i}'
+            c.execute('INSERT INTO did_scores (did, score, flagged) VALUES (?, ?, ?)',
+                      (did, round(rng.random(), 3), rng.random() < 0.5))
+            # A quarter of the DIDs have no ledger history yet
+            if rng.random() < 0.75:
+                age = timedelta(days=rng.choice([10, 90, 365, 720]))
+                trust.append_ledger_event(c, did, 0.5, 'score',
+                                          (now - age).isoformat(timespec='microseconds'))
+            c.execute("INSERT INTO trust_recovery (did, recovery_stage, last_attempt, status) "
+                      "VALUES (?, 'start', ?, 'pending')", (did, now.isoformat(' ')))
+        conn.commit()
+    trust.close_pools()
+
+
+def read_scores(path):
+    use_database(path)
+    with trust.db_connection() as conn:
+        scores = dict(conn.cursor().execute('SELECT did, score FROM did_scores').fetchall())
+    trust.close_pools()
+    return scores
+
+
+def run(count, passes=2, seed=0):
+    """Time both recovery paths on identical copies and verify the results match."""
+    workdir = tempfile.mkdtemp(prefix='diddragon-bench-')
+    try:
+        base = os.path.join(workdir, 'base.db')
+        populate(base, count, seed)
+        per_did_db = os.path.join(workdir, 'per_did.db')
+        bulk_db = os.path.join(workdir, 'bulk.db')
+        shutil.copy(base, per_did_db)
+        shutil.copy(base, bulk_db)
+
+        use_database(per_did_db)
+        start = time.perf_counter()
+        for _ in range(passes):
+            with trust.db_connection() as conn:
+                pending = conn.cursor().execute(
+                    "SELECT did FROM trust_recovery WHERE status = 'pending'").fetchall()
+            for (did,) in pending:
+                trust.repair_trust_score(did)
+        per_did_seconds = time.perf_counter() - start
+
+        use_database(bulk_db)
+        start = time.perf_counter()
+        for _ in range(passes):
+            trust.bulk_trust_repair()
+        bulk_seconds = time.perf_counter() - start
+
+        expected, actual = read_scores(per_did_db), read_scores(bulk_db)
+        mismatches = [did for did in expected if expected[did] != actual.get(did)]
+        if mismatches:
+            raise AssertionError(f"{len(mismatches)} DIDs differ, e.g. {mismatches[:3]}")
+        use_database(bulk_db)
+        chain = trust.verify_ledger_chain()
+        trust.close_pools()
+        if chain['broken']:
+            raise AssertionError(f"Ledger chain broken after bulk repair: {chain['broken'][:3]}")
+
+        return {
+            'dids': count,
+            'passes': passes,
+            'per_did_seconds': per_did_seconds,
+            'bulk_seconds': bulk_seconds,
+            'matching_scores': len(expected)
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trust recovery benchmark")
+    parser.add_argument('--count', type=int, default=5000, help="Number of pending recoveries")
+    parser.add_argument('--passes', type=int, default=2, help="Repair passes to run")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = run(args.count, args.passes, args.seed)
+    for name, value in results.items():
+        print(f"{name:>16}: {value}")
+    print(f"{'speedup':>16}: {results['per_did_seconds'] / results['bulk_seconds']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Social trust propagation time on large endorsement graphs, cold and warm-started.
+
+Builds a seeded graph with a skewed in-degree (a few heavily endorsed
+DIDs, a long tail), propagates it from scratch, then changes a fraction of
+the edges and propagates again warm-started and from scratch.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_social_graph --nodes 1000000 --edges 5000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from did_social_graph import SocialTrustGraph
+
+from benchmarks.datagen import unique_dids
+
+
+def generate_graph(nodes, edges, seed=0):
+    """Return (src, dst, weights) node-id arrays; in-degree falls off steeply with the node id."""
+    rng = np.random.default_rng(seed)
+    src = rng.integers(0, nodes, edges)
+    dst = np.minimum((nodes * rng.random(edges) ** 3).astype(np.int64), nodes - 1)
+    return src, dst, rng.uniform(0.1, 1.0, edges)
+
+
+def generate_changes(graph, dids, count, seed=0):
+    """Return `count` (src, dst, weight) changes: new endorsements, reweighted ones and removals."""
+    rng = np.random.default_rng(seed + 1)
+    indptr, indices, _ = graph.csr()
+    sources = rng.integers(0, len(dids), count)
+    changes = []
+    for i, src in enumerate(sources.tolist()):
+        start, end = indptr[src], indptr[src + 1]
+        if i % 3 and end > start:
+            dst = int(indices[rng.integers(start, end)])
+            weight = 0.0 if i % 3 == 1 else float(rng.uniform(0.1, 1.0))  # Remove or reweight an existing edge
+        else:
+            dst, weight = int(rng.integers(0, len(dids))), float(rng.uniform(0.1, 1.0))
+        changes.append((dids[src], dids[dst], weight))
+    return changes
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def run(nodes, edges, change_fraction=0.001, seed=0):
+    dids = list(unique_dids(nodes, seed))
+    src, dst, weights = generate_graph(nodes, edges, seed)
+    graph, build_seconds = _timed(lambda: SocialTrustGraph.from_arrays(dids, src, dst, weights))
+    del src, dst, weights
+
+    cold, cold_seconds = _timed(lambda: graph.propagate(warm=False))
+    changes = generate_changes(graph, dids, max(1, int(edges * change_fraction)), seed)
+    graph.update_edges(changes)
+    _, merge_seconds = _timed(graph.csr)
+    warm, warm_seconds = _timed(lambda: graph.propagate(warm=True))
+    warm_scores = graph._scores
+    recold, recold_seconds = _timed(lambda: graph.propagate(warm=False))
+
+    return {
+        'nodes': nodes,
+        'edges': graph.edge_count,
+        'changed_edges': len(changes),
+        'build_seconds': build_seconds,
+        'csr_bytes_per_edge': (graph._keys.nbytes + graph._weights.nbytes) / graph.edge_count,
+        'cold_seconds': cold_seconds,
+        'cold_iterations': cold['iterations'],
+        'seconds_per_iteration': cold_seconds / cold['iterations'],
+        'merge_seconds': merge_seconds,
+        'warm_seconds': warm_seconds,
+        'warm_iterations': warm['iterations'],
+        'recold_seconds': recold_seconds,
+        'recold_iterations': recold['iterations'],
+        'warm_vs_cold_max_score_diff': float(np.abs(warm_scores - graph._scores).max()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Social trust propagation benchmark")
+    parser.add_argument('--nodes', type=int, default=1000000)
+    parser.add_argument('--edges', type=int, default=5000000)
+    parser.add_argument('--change-fraction', type=float, default=0.001,
+                        help="Share of the edges changed before the incremental propagation")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for name, value in run(args.nodes, args.edges, args.change_fraction, args.seed).items():
+        print(f"{name:>28}: {value:.6g}" if isinstance(value, float) else f"{name:>28}: {value}")
+
+
+if __name__ == "__main__":
+    main()
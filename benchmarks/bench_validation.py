@@ -0,0 +1,78 @@
+"""Per-DID cost of DIDVerifier.validate against the original pattern loop.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_validation --count 200000
+"""
+import argparse
+import re
+import time
+
+from did_verification import DIDVerifier
+
+from benchmarks.datagen import generate_dids
+
+
+def sample_dids(count, seed=0):
+    """Build a mixed sample covering every supported method plus invalid DIDs."""
+    return list(generate_dids(count, seed, invalid_ratio=1 / 6))
+
+
+def legacy_validate(did_patterns, did):
+    """The original implementation: try each uncompiled pattern in turn."""
+    for key, pattern in did_patterns.items():
+        if re.match(pattern, did):
+            return key
+    raise ValueError("Unsupported DID format")
+
+
+def _time_per_did(fn, dids):
+    start = time.perf_counter()
+    fn(dids)
+    return (time.perf_counter() - start) / len(dids) * 1e9
+
+
+def run(count, seed=0):
+    """Return per-DID nanoseconds for each implementation."""
+    verifier = DIDVerifier()
+    dids = sample_dids(count, seed)
+
+    def legacy(items):
+        for did in items:
+            try:
+                legacy_validate(verifier.did_patterns, did)
+            except ValueError:
+                pass
+
+    def current(items):
+        for did in items:
+            try:
+                verifier.validate(did)
+            except ValueError:
+                pass
+
+    def bulk(items):
+        for _ in verifier.validate_many(items):
+            pass
+
+    return {
+        'legacy_loop_ns': _time_per_did(legacy, dids),
+        'validate_ns': _time_per_did(current, dids),
+        'validate_many_ns': _time_per_did(bulk, dids),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DID validation benchmark")
+    parser.add_argument('--count', type=int, default=200000, help="Number of DIDs to classify")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = run(args.count, args.seed)
+    for name, ns in results.items():
+        print(f"{name:>18}: {ns:8.1f} ns/DID")
+    print(f"{'speedup':>18}: {results['legacy_loop_ns'] / results['validate_many_ns']:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Synthetic DID populations for the benchmarks.
+
+Everything here is a generator, so populations of 10^7 DIDs can be produced
+and written in chunks without holding them in memory.
+"""
+import random
+import string
+
+BASE58 = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+SLUG = string.ascii_letters + '123456789_-'  # No '0': did:w3c identifiers exclude it
+HEX = '0123456789abcdef'
+
+# The five methods in DIDVerifier.did_patterns
+METHODS = ('ethr', 'sol', 'w3c', 'agent', 'fed')
+
+
+def make_did(rng, method):
+    """Build one valid DID for a method."""
+    if method == 'ethr':
+        return 'did:ethr:0x' + ''.join(rng.choice(HEX) for _ in range(40))
+    if method == 'sol':
+        return 'did:sol:' + ''.join(rng.choice(BASE58) for _ in range(rng.randint(32, 44)))
+    return f'did:{method}:' + ''.join(rng.choice(SLUG) for _ in range(16))
+
+
+def make_invalid_did(rng):
+    """Build a DID that no pattern accepts."""
+    return rng.choice([
+        'did:unknown:' + ''.join(rng.choice(SLUG) for _ in range(16)),
+        'did:ethr:0x' + ''.join(rng.choice(HEX) for _ in range(12)),
+        'not-a-did-' + ''.join(rng.choice(SLUG) for _ in range(8)),
+    ])
+
+
+def generate_dids(count, seed=0, invalid_ratio=0.0, methods=METHODS):
+    """Yield `count` DIDs spread evenly over `methods`, with an optional share of invalid ones."""
+    rng = random.Random(seed)
+    for i in range(count):
+        if invalid_ratio and rng.random() < invalid_ratio:
+            yield make_invalid_did(rng)
+        else:
+            yield make_did(rng, methods[i % len(methods)])
+
+
+def unique_dids(count, seed=0, methods=METHODS):
+    """Yield `count` distinct valid DIDs cheaply: a random prefix plus a counter."""
+    rng = random.Random(seed)
+    for i in range(count):
+        method = methods[i % len(methods)]
+        if method == 'ethr':
+            yield f'did:ethr:0x{i:040x}'
+        elif method == 'sol':
+            yield 'did:sol:' + ''.join(rng.choice(BASE58) for _ in range(24)) + _base58(i).rjust(12, '1')
+        else:
+            yield f'did:{method}:bench-{_base58(i)}'
+
+
+def _base58(n):
+    digits = ''
+    while True:
+        n, r = divmod(n, 58)
+        digits = BASE58[r] + digits
+        if n == 0:
+            return digits
+
+
+def generate_scores(dids, seed=0):
+    """Yield (did, score) pairs with scores spread over [0, 1)."""
+    rng = random.Random(seed)
+    for did in dids:
+        yield did, round(rng.random(), 4)
+
+
+def generate_components(dids, seed=0, missing_ratio=0.1):
+    """Yield (did, {source: score}) pairs; each source is left out with probability `missing_ratio`."""
+    rng = random.Random(seed)
+    sources = ('onchain', 'federated', 'usage', 'social')
+    for did in dids:
+        yield did, {name: round(rng.random(), 4) for name in sources if rng.random() >= missing_ratio}
+
+
+def generate_usage_events(count, dids, seed=0, start=1700000000.0, rate=1000.0, failure_ratio=0.02):
+    """Yield `count` (did, action, counterparty, timestamp) usage events at `rate` events/second.
+
+    A few DIDs produce most of the events; counterparties are drawn from the same population.
+    """
+    rng = random.Random(seed)
+    dids = list(dids)
+    actions = ('call', 'transfer', 'query')
+    for i in range(count):
+        did = dids[min(int(len(dids) * rng.random() ** 3), len(dids) - 1)]
+        action = 'failed' if rng.random() < failure_ratio else actions[i % len(actions)]
+        yield did, action, dids[rng.randrange(len(dids))], start + i / rate
+
+
+def generate_rules(count, seed=0):
+    """Return `count` (rule_name, min_trust_score, action) policy rules."""
+    rng = random.Random(seed)
+    actions = ('restrict', 'review', 'alert')
+    return [(f'bench-rule-{i}', round(rng.uniform(0.05, 0.8), 3), rng.choice(actions))
+            for i in range(count)]
@@ -0,0 +1,444 @@
+"""Reproducible benchmark harness for validation, scoring, enforcement, ledger growth, usage ingestion and sharding.
+
+Every run uses a fresh SQLite database in a temporary directory and a
+seeded synthetic population (benchmarks/datagen.py), and writes its results
+to a JSON file that can be compared against a previous run.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --dids 100000 --output bench_results.json
+    python -m benchmarks.run_benchmarks --compare old.json --output new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import did_trust_scoring as trust
+from did_verification import DIDVerifier, did_method
+
+from benchmarks import datagen
+
+SOURCE_FUNCTIONS = {
+    'fetch_onchain_proofs': 0.8,
+    'fetch_federated_nodes': 0.7,
+    'fetch_usage_patterns': 0.6,
+    'fetch_social_signals': 0.5
+}
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register a benchmark section."""
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+    return {
+        'p50_ms': pick(0.50) * 1000,
+        'p99_ms': pick(0.99) * 1000,
+        'max_ms': samples[-1] * 1000,
+        'mean_ms': statistics.fmean(samples) * 1000
+    }
+
+
+@contextmanager
+def fresh_database(workdir, name, shards=1):
+    """Point the scoring module at new SQLite shard files for the duration of a section."""
+    trust.shutdown_db_executor()
+    trust.close_pools()
+    trust.DATABASE_CONFIG['default'] = 'sqlite'
+    trust.DATABASE_CONFIG['backends']['sqlite']['NAME'] = os.path.join(workdir, f'{name}.db')
+    trust.DATABASE_CONFIG['backends']['sqlite']['SHARDS'] = shards
+    trust.init_db()
+    try:
+        yield
+    finally:
+        trust.shutdown_db_executor()
+        trust.close_pools()
+
+
+@contextmanager
+def stubbed_sources(delay):
+    """Replace the four trust sources with stubs that answer after `delay` seconds."""
+    originals = {name: getattr(trust, name) for name in SOURCE_FUNCTIONS}
+
+    def make_stub(score):
+        async def stub(did):
+            await asyncio.sleep(delay)
+            return {'score': score}
+        return stub
+
+    for name, score in SOURCE_FUNCTIONS.items():
+        setattr(trust, name, make_stub(score))
+    try:
+        yield
+    finally:
+        for name, func in originals.items():
+            setattr(trust, name, func)
+
+
+def populate_scores(count, seed=0):
+    """Write `count` scored DIDs in chunks; returns seconds taken."""
+    start = time.perf_counter()
+    trust.insert_trust_scores(datagen.generate_scores(datagen.unique_dids(count, seed), seed), chunk_size=5000)
+    return time.perf_counter() - start
+
+
+@benchmark('validation')
+def bench_validation(args, workdir):
+    verifier = DIDVerifier()
+    results = {'dids': args.dids}
+
+    start = time.perf_counter()
+    for did in datagen.generate_dids(args.dids, args.seed, invalid_ratio=0.1):
+        verifier.is_valid(did)
+    elapsed = time.perf_counter() - start
+    results['generate_and_validate_per_sec'] = args.dids / elapsed
+
+    sample = list(datagen.generate_dids(min(args.dids, 200000), args.seed, invalid_ratio=0.1))
+    start = time.perf_counter()
+    for did in sample:
+        verifier.is_valid(did)
+    results['is_valid_per_sec'] = len(sample) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in verifier.validate_many(sample):
+        pass
+    results['validate_many_per_sec'] = len(sample) / (time.perf_counter() - start)
+    return results
+
+
+@benchmark('aggregate')
+def bench_aggregate(args, workdir):
+    results = {}
+    for delay in args.source_delays:
+        with fresh_database(workdir, f'aggregate-{delay}'), stubbed_sources(delay):
+            async def measure():
+                latencies = []
+                semaphore = asyncio.Semaphore(args.concurrency)
+
+                async def one(did):
+                    async with semaphore:
+                        start = time.perf_counter()
+                        await trust.aggregate_trust_score(did, refresh=True)
+                        latencies.append(time.perf_counter() - start)
+
+                dids = list(datagen.unique_dids(args.aggregate_dids, args.seed))
+                start = time.perf_counter()
+                await asyncio.gather(*(one(did) for did in dids))
+                single_elapsed = time.perf_counter() - start
+
+                start = time.perf_counter()
+                count = 0
+                async for _ in trust.aggregate_many(dids, concurrency=args.concurrency, refresh=True):
+                    count += 1
+                batch_elapsed = time.perf_counter() - start
+                return latencies, single_elapsed, batch_elapsed
+
+            latencies, single_elapsed, batch_elapsed = asyncio.run(measure())
+            results[f'delay_{delay}s'] = {
+                'dids': args.aggregate_dids,
+                'concurrency': args.concurrency,
+                'latency': _percentiles(latencies),
+                'aggregate_trust_score_per_sec': args.aggregate_dids / single_elapsed,
+                'aggregate_many_per_sec': args.aggregate_dids / batch_elapsed
+            }
+    return results
+
+
+@benchmark('scoring')
+def bench_scoring(args, workdir):
+    engine = trust.scoring_engine
+    rows = list(datagen.generate_components(datagen.unique_dids(args.dids, args.seed), args.seed))
+
+    start = time.perf_counter()
+    single = [trust.weighted_trust_score(components, method=did_method(did)) for did, components in rows]
+    single_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matrix = engine.components_matrix(components for _, components in rows)
+    methods = [did_method(did) for did, _ in rows]
+    build_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    scores = engine.score_matrix(matrix, methods)
+    matrix_elapsed = time.perf_counter() - start
+
+    identical = all((a is None and b != b) or a == b for a, b in zip(single, scores.tolist()))
+    if not identical:
+        raise AssertionError("Batch scores differ from the single-DID path")
+    return {
+        'dids': args.dids,
+        'single_per_sec': args.dids / single_elapsed,
+        'matrix_build_seconds': build_elapsed,
+        'score_matrix_per_sec': args.dids / matrix_elapsed
+    }
+
+
+@benchmark('enforcement')
+def bench_enforcement(args, workdir):
+    results = {}
+    with fresh_database(workdir, 'enforcement', args.shards):
+        results['populate_seconds'] = populate_scores(args.dids, args.seed)
+        results['dids'] = args.dids
+        sample = list(datagen.unique_dids(min(args.dids, 1000), args.seed))
+
+        for rule_count in args.rule_counts:
+            with trust.db_connection() as conn:
+                c = conn.cursor()
+                c.execute('DELETE FROM policy_rules')
+                c.executemany('INSERT INTO policy_rules (rule_name, min_trust_score, action) VALUES (?, ?, ?)',
+                              datagen.generate_rules(rule_count, args.seed))
+            for shard in range(args.shards):
+                with trust.db_connection(shard=shard) as conn:
+                    conn.execute('UPDATE did_scores SET flagged = 0')
+            trust.policy_index.invalidate()
+            trust.score_cache.invalidate()
+
+            per_did = []
+            for did in sample:
+                start = time.perf_counter()
+                trust.enforce_trust_policy(did)
+                per_did.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            trust.enforce_trust_policies()
+            bulk_seconds = time.perf_counter() - start
+
+            # What auto_enforce_trust runs: first sweep after a rule change, then a
+            # steady-state sweep after 1% of the scores changed
+            start = time.perf_counter()
+            trust.incremental_enforce_trust(name=f'bench-{rule_count}')
+            sweep_initial = time.perf_counter() - start
+            new_score = min(0.99, rule_count / 1000)  # Differs per pass so every touched row really changes
+            touched = [(did, new_score) for did in datagen.unique_dids(max(1, args.dids // 100), args.seed + 1)]
+            trust.insert_trust_scores(touched)
+            start = time.perf_counter()
+            trust.incremental_enforce_trust(name=f'bench-{rule_count}')
+            sweep_steady = time.perf_counter() - start
+
+            start = time.perf_counter()
+            trust.load_restriction_gate()
+            gate_load_seconds = time.perf_counter() - start
+            checks = []
+            for did in sample:
+                start = time.perf_counter()
+                trust.is_restricted(did)
+                checks.append(time.perf_counter() - start)
+
+            results[f'rules_{rule_count}'] = {
+                'enforce_trust_policy': _percentiles(per_did),
+                'enforce_trust_policies_seconds': bulk_seconds,
+                'incremental_sweep_initial_seconds': sweep_initial,
+                'incremental_sweep_1pct_changed_seconds': sweep_steady,
+                'restriction_gate_load_seconds': gate_load_seconds,
+                'is_restricted': _percentiles(checks)
+            }
+    return results
+
+
+@benchmark('ledger')
+def bench_ledger(args, workdir):
+    results = {}
+    with fresh_database(workdir, 'ledger', args.shards):
+        did = 'did:agent:ledger-growth'
+        history = 0
+        for target in args.history_sizes:
+            # Grow the chain to `target` entries with batched appends
+            with trust.db_connection(did=did) as conn:
+                c = conn.cursor()
+                trust.begin_write(conn)
+                trust.append_ledger_events(c, [(did, 0.5, 'score')] * (target - history))
+            history = target
+
+            samples = []
+            for i in range(args.ledger_appends):
+                start = time.perf_counter()
+                trust.update_trust_ledger(did, 0.5)
+                samples.append(time.perf_counter() - start)
+            history += args.ledger_appends
+            results[f'history_{target}'] = _percentiles(samples)
+
+        start = time.perf_counter()
+        report = trust.verify_ledger_chain(did)
+        results['verify_chain'] = {
+            'entries': report['checked'],
+            'seconds': time.perf_counter() - start,
+            'broken': len(report['broken'])
+        }
+    return results
+
+
+@benchmark('usage')
+def bench_usage(args, workdir):
+    dids = list(datagen.unique_dids(min(args.dids, 100000), args.seed))
+    events = list(datagen.generate_usage_events(args.usage_events, dids, args.seed))
+    results = {'events': len(events), 'dids': len(dids)}
+
+    aggregator = trust.new_usage_aggregator()
+    start = time.perf_counter()
+    aggregator.ingest_many(events)
+    results['ingest_events_per_sec'] = len(events) / (time.perf_counter() - start)
+    results['profiles'] = len(aggregator)
+
+    path = os.path.join(workdir, 'usage.jsonl')
+    with open(path, 'w') as f:
+        for did, action, counterparty, timestamp in events:
+            f.write(json.dumps({'did': did, 'action': action, 'counterparty': counterparty,
+                                'timestamp': timestamp}) + '\n')
+    start = time.perf_counter()
+    trust.new_usage_aggregator().ingest_file(path)
+    results['ingest_file_events_per_sec'] = len(events) / (time.perf_counter() - start)
+
+    sample = dids[:min(len(dids), 100000)]
+    start = time.perf_counter()
+    for did in sample:
+        aggregator.score(did)
+    results['score_per_sec'] = len(sample) / (time.perf_counter() - start)
+    return results
+
+
+@benchmark('sharding')
+def bench_sharding(args, workdir):
+    """Write throughput and cross-shard scans for each shard count in --shard-counts.
+
+    Writers are threads appending to random DIDs' ledgers; SQLite releases
+    the GIL while it works, so with enough cores more shards mean fewer
+    writers waiting on the same file's write lock.
+    """
+    results = {}
+    dids = list(datagen.unique_dids(args.dids, args.seed))
+    for shards in args.shard_counts:
+        with fresh_database(workdir, f'sharding-{shards}', shards):
+            section = {'shards': shards, 'dids': args.dids, 'writers': args.writers}
+            start = time.perf_counter()
+            trust.insert_trust_scores(datagen.generate_scores(dids, args.seed), chunk_size=5000)
+            section['insert_trust_scores_per_sec'] = args.dids / (time.perf_counter() - start)
+
+            retries_before = trust.DB_LOCK_RETRIES.value(operation='update_trust_ledger')
+
+            def write(worker):
+                for i in range(args.writes_per_writer):
+                    trust.update_trust_ledger(dids[(worker * 7919 + i * 104729) % len(dids)], 0.5)
+
+            threads = [threading.Thread(target=write, args=(worker,)) for worker in range(args.writers)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            section['concurrent_ledger_appends_per_sec'] = (
+                args.writers * args.writes_per_writer / (time.perf_counter() - start))
+            section['lock_retries'] = trust.DB_LOCK_RETRIES.value(operation='update_trust_ledger') - retries_before
+
+            trust.add_policy_rule('bench-restrict', 0.3, 'restrict')
+            start = time.perf_counter()
+            trust.enforce_trust_policies()
+            section['enforce_trust_policies_seconds'] = time.perf_counter() - start
+            start = time.perf_counter()
+            trust.verify_ledger_chain()
+            section['verify_ledger_chain_seconds'] = time.perf_counter() - start
+            results[f'shards_{shards}'] = section
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _flatten(data, prefix=''):
+    for key, value in data.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            yield from _flatten(value, f'{name}.')
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
+
+
+def compare(previous, current):
+    """Print every numeric metric next to its value in a previous run."""
+    before = dict(_flatten(previous['results']))
+    for name, value in _flatten(current['results']):
+        if name in before and before[name]:
+            print(f"{name:<70} {before[name]:>14.4f} -> {value:>14.4f} ({value / before[name]:6.2f}x)")
+
+
+def run(args):
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='diddragon-bench-') as workdir:
+        for name in args.only or BENCHMARKS:
+            start = time.perf_counter()
+            results[name] = BENCHMARKS[name](args, workdir)
+            print(f"{name}: done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sqlite': trust.sqlite3.sqlite_version,
+            'args': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')}
+        },
+        'results': results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DIDDragon benchmark suite")
+    parser.add_argument('--dids', type=int, default=10000,
+                        help="Population size for validation and enforcement (10^4 to 10^7)")
+    parser.add_argument('--aggregate-dids', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--source-delays', type=float, nargs='+', default=[0.0, 0.01, 0.05],
+                        help="Stubbed trust source latencies in seconds")
+    parser.add_argument('--rule-counts', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--history-sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--ledger-appends', type=int, default=20)
+    parser.add_argument('--usage-events', type=int, default=200000,
+                        help="Usage events streamed through the usage aggregator")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="SQLite shard files for the enforcement and ledger sections")
+    parser.add_argument('--shard-counts', type=int, nargs='+', default=[1, 2, 4],
+                        help="Shard counts compared by the sharding section")
+    parser.add_argument('--writers', type=int, default=8, help="Concurrent writer threads in the sharding section")
+    parser.add_argument('--writes-per-writer', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS))
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="Previous results file to compare against")
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    else:
+        for name, value in _flatten(report['results']):
+            print(f"{name:<70} {value:>14.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,436 @@
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import argparse
+from collections import deque
+from urllib.parse import quote, unquote, urlsplit
+from did_metrics import counter, histogram
+
+FEDERATED_REQUEST_SECONDS = histogram('federated_request_seconds', "Federated node request latency",
+                                      ('node', 'outcome'))
+FEDERATED_HEDGES = counter('federated_hedged_requests_total', "Extra requests sent after the hedge delay")
+FEDERATED_QUERIES = counter('federated_queries_total', "Federated quorum queries by outcome", ('outcome',))
+
+AGGREGATES = ('median', 'trimmed_mean')
+
+class QuorumError(Exception):
+    """Raised when too few federated nodes agree on a score."""
+
+class FederatedNodeError(Exception):
+    """Raised for a non-200 or malformed node response."""
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+def trimmed_mean(values, trim=0.2):
+    """Mean after dropping the `trim` share of values at each end (never all of them)."""
+    values = sorted(values)
+    cut = min(int(len(values) * trim), (len(values) - 1) // 2)
+    kept = values[cut:len(values) - cut]
+    return sum(kept) / len(kept)
+
+def consensus(values, aggregate='median', trim=0.2, agreement=0.1):
+    """Return (score, agreeing) for the largest group of values within `agreement` of one of them.
+
+    `agreeing` holds the indexes of that group's values. The score
+    aggregates that group only, so outliers never move it. Ties go to the
+    group around the value closest to the overall median.
+    """
+    center = median(values)
+    agreeing = max(([i for i, other in enumerate(values) if abs(other - value) <= agreement]
+                    for value in sorted(values, key=lambda value: abs(value - center))), key=len)
+    group = [values[i] for i in agreeing]
+    return (median(group) if aggregate == 'median' else trimmed_mean(group, trim)), agreeing
+
+async def _read_chunked(reader):
+    """Read a chunked transfer-encoded body, dropping chunk extensions and trailers."""
+    chunks = []
+    while True:
+        size = int((await reader.readline()).split(b';')[0].strip(), 16)
+        if not size:
+            while (await reader.readline()).strip():
+                pass  # Trailers
+            return b''.join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)  # CRLF after each chunk
+
+async def http_get_json(url):
+    """GET a JSON document over HTTP/1.1 (one connection per request); the caller bounds the time taken.
+
+    The body is framed by chunked transfer encoding or Content-Length, and
+    runs until the server closes the connection only when neither is sent.
+    """
+    parts = urlsplit(url)
+    path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+    reader, writer = await asyncio.open_connection(parts.hostname,
+                                                   parts.port or (443 if parts.scheme == 'https' else 80),
+                                                   ssl=parts.scheme == 'https')
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nAccept: application/json\r\n'
+                     f'Connection: close\r\n\r\n'.encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        status = int(status_line.split()[1]) if status_line else 0
+        headers = {}
+        while (line := (await reader.readline()).strip()):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            body = await _read_chunked(reader)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+    finally:
+        writer.close()
+    if status != 200:
+        raise FederatedNodeError(f"{url} answered HTTP {status}")
+    return json.loads(body)
+
+class FederatedNode:
+    """One federated node with latency and error EWMAs.
+
+    The error EWMA decays back towards 0 with `recovery_half_life` while
+    the node is not queried, so a node that was steered away from gets
+    tried again later.
+    """
+
+    def __init__(self, url, name=None, alpha=0.2, recovery_half_life=30.0):
+        self.url = url.rstrip('/')
+        self.name = name or urlsplit(self.url).netloc or self.url
+        self.alpha = alpha
+        self.recovery_half_life = recovery_half_life
+        self.latency_ewma = None
+        self._error_ewma = 0.0
+        self._updated_at = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.outliers = 0
+
+    def url_for(self, did):
+        return f'{self.url}/trust/{quote(did, safe=":")}'
+
+    def error_rate(self, now=None):
+        elapsed = (now or time.monotonic()) - self._updated_at
+        return self._error_ewma * 0.5 ** (elapsed / self.recovery_half_life)
+
+    def observe(self, latency, ok):
+        """Fold one finished request into the EWMAs."""
+        now = time.monotonic()
+        self._error_ewma = self.error_rate(now) * (1 - self.alpha) + (0.0 if ok else self.alpha)
+        self._updated_at = now
+        self.requests += 1
+        self.errors += not ok
+        if ok:
+            self.latency_ewma = latency if self.latency_ewma is None else \
+                self.latency_ewma * (1 - self.alpha) + latency * self.alpha
+
+    def observe_outlier(self):
+        """The node answered, but outside the consensus: count it against the node like an error."""
+        now = time.monotonic()
+        self._error_ewma = self.error_rate(now) * (1 - self.alpha) + self.alpha
+        self._updated_at = now
+        self.outliers += 1
+
+    def observe_cancelled(self, elapsed):
+        """A request cut short still shows the node is at least this slow."""
+        if self.latency_ewma is None:
+            self.latency_ewma = elapsed
+        elif elapsed > self.latency_ewma:
+            self.latency_ewma = self.latency_ewma * (1 - self.alpha) + elapsed * self.alpha
+
+    def stats(self):
+        return {
+            'url': self.url,
+            'latency_ewma': self.latency_ewma,
+            'error_rate': self.error_rate(),
+            'requests': self.requests,
+            'errors': self.errors,
+            'outliers': self.outliers
+        }
+
+class FederatedQuorumClient:
+    """Query a DID's score from federated nodes and return once a quorum agrees.
+
+    Each query goes to the `fanout` healthiest nodes at once (default
+    `quorum`): nodes whose decayed error EWMA is at most `max_error_rate`,
+    fastest latency EWMA first, then degraded nodes. The rest are spares.
+    A failed request is replaced by the next spare straight away, and
+    nodes whose answers fall outside the consensus are scored as errors. If the
+    quorum has not answered after the `hedge_percentile` latency of recent
+    requests (`hedge_delay` until enough samples exist), spares are sent the
+    same query and the first answers win (`hedge_percentile=None` turns
+    hedging off). Responses agree when they are
+    within `agreement` of each other (see consensus()). The score is the median or
+    trimmed mean of the agreeing responses. Outstanding requests are
+    cancelled once the quorum is reached.
+    """
+
+    def __init__(self, nodes, quorum=2, fanout=None, aggregate='median', trim=0.2, agreement=0.1,
+                 hedge_percentile=0.95, hedge_delay=0.05, node_timeout=1.5, max_error_rate=0.5,
+                 ewma_alpha=0.2, recovery_half_life=30.0, transport=http_get_json):
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate '{aggregate}', expected one of {AGGREGATES}")
+        self.nodes = [node if isinstance(node, FederatedNode) else
+                      FederatedNode(node, alpha=ewma_alpha, recovery_half_life=recovery_half_life)
+                      for node in nodes]
+        if not 1 <= quorum <= len(self.nodes):
+            raise ValueError(f"Quorum must be between 1 and the number of nodes ({len(self.nodes)}), got {quorum}")
+        self.quorum = quorum
+        self.fanout = max(quorum, min(fanout or quorum, len(self.nodes)))
+        self.aggregate = aggregate
+        self.trim = trim
+        self.agreement = agreement
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = hedge_delay
+        self.node_timeout = node_timeout
+        self.max_error_rate = max_error_rate
+        self.transport = transport
+        self._latencies = deque(maxlen=1000)  # Recent successful request latencies, for the hedge delay
+        self._cancelling = set()  # Keeps cancelled requests referenced until they have unwound
+        self.hedged = 0
+
+    def ranked_nodes(self):
+        """Healthy nodes by latency EWMA (untried first), then degraded nodes by error rate."""
+        now = time.monotonic()
+        healthy, degraded = [], []
+        for node in self.nodes:
+            error_rate = node.error_rate(now)
+            if error_rate <= self.max_error_rate:
+                healthy.append((node.latency_ewma or 0.0, random.random(), node))
+            else:
+                degraded.append((error_rate, random.random(), node))
+        return [node for *_, node in sorted(healthy)] + [node for *_, node in sorted(degraded)]
+
+    def hedge_delay(self):
+        """Seconds to wait for the quorum before hedging: the configured percentile of recent latencies."""
+        if self.hedge_percentile is None:
+            return None
+        if len(self._latencies) < 20:
+            return self.default_hedge_delay
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.hedge_percentile))]
+
+    def stats(self):
+        return {
+            'hedge_delay': self.hedge_delay(),
+            'hedged': self.hedged,
+            'nodes': {node.name: node.stats() for node in self.nodes}
+        }
+
+    def _discard(self, task):
+        """Cancel a task we no longer wait for, keeping it referenced until it has unwound."""
+        if task.done():
+            if not task.cancelled():
+                task.exception()  # Mark a late failure as retrieved
+            return
+        task.cancel()
+        self._cancelling.add(task)
+        task.add_done_callback(self._cancelling.discard)
+
+    async def _ask(self, node, did):
+        start = time.perf_counter()
+        request = asyncio.ensure_future(self.transport(node.url_for(did)))
+        try:
+            done, _ = await asyncio.wait((request,), timeout=self.node_timeout)
+            if not done:
+                raise asyncio.TimeoutError(f"No answer within {self.node_timeout}s")
+            score = float(request.result()['score'])
+            if not 0.0 <= score <= 1.0:
+                raise FederatedNodeError(f"Score out of range: {score}")
+        except asyncio.CancelledError:
+            elapsed = time.perf_counter() - start
+            node.observe_cancelled(elapsed)
+            FEDERATED_REQUEST_SECONDS.observe(elapsed, node=node.name, outcome='cancelled')
+            raise
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            node.observe(elapsed, ok=False)
+            FEDERATED_REQUEST_SECONDS.observe(elapsed, node=node.name, outcome='error')
+            logging.debug(f"Federated node {node.name} failed for {did}: {e!r}")
+            return None
+        finally:
+            self._discard(request)
+        elapsed = time.perf_counter() - start
+        node.observe(elapsed, ok=True)
+        self._latencies.append(elapsed)
+        FEDERATED_REQUEST_SECONDS.observe(elapsed, node=node.name, outcome='ok')
+        return score
+
+    async def query(self, did):
+        """Return {'score', 'agreeing', 'responses', 'hedged', 'nodes'} once a quorum agrees.
+
+        Raises QuorumError when every node has been asked without a quorum agreeing.
+        """
+        ranked = self.ranked_nodes()
+        spares = deque(ranked[self.fanout:])
+        pending = {}  # task -> node
+        responses = []  # (node, score)
+        hedged = 0
+
+        def launch(count):
+            launched = 0
+            while spares and launched < count:
+                node = spares.popleft()
+                pending[asyncio.ensure_future(self._ask(node, did))] = node
+                launched += 1
+            return launched
+
+        for node in ranked[:self.fanout]:
+            pending[asyncio.ensure_future(self._ask(node, did))] = node
+        loop = asyncio.get_running_loop()
+        hedge_delay = self.hedge_delay()
+        hedge_at = None if hedge_delay is None else loop.time() + hedge_delay
+        try:
+            agreeing = 0
+            while pending:
+                timeout = max(0.0, hedge_at - loop.time()) if hedge_at is not None and spares else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Hedge: ask enough spares to make up the quorum on their own
+                    hedged += launch(self.quorum - agreeing)
+                    hedge_at = None
+                    continue
+                for task in done:
+                    node = pending.pop(task)
+                    score = task.result()
+                    if score is not None:
+                        responses.append((node, score))
+                if responses:
+                    score, group = consensus([score for _, score in responses], self.aggregate, self.trim,
+                                             self.agreement)
+                    agreeing = len(group)
+                    if agreeing >= self.quorum:
+                        group = set(group)
+                        for i, (node, _) in enumerate(responses):
+                            if i not in group:
+                                node.observe_outlier()
+                        FEDERATED_QUERIES.inc(outcome='quorum')
+                        return {'score': score, 'agreeing': agreeing, 'responses': len(responses),
+                                'hedged': hedged, 'nodes': [node.name for node, _ in responses]}
+                # Replace failures and outliers so the quorum stays reachable
+                launch(self.quorum - agreeing - len(pending))
+            FEDERATED_QUERIES.inc(outcome='no_quorum')
+            raise QuorumError(f"Only {agreeing} of {len(responses)} federated responses agree for {did} "
+                              f"(quorum {self.quorum}, {len(self.nodes)} nodes)")
+        finally:
+            for task in pending:
+                self._discard(task)
+            if hedged:
+                self.hedged += hedged
+                FEDERATED_HEDGES.inc(hedged)
+
+### 🔥 Stand-in nodes: local federated node servers for offline testing
+def stand_in_score(did):
+    """Deterministic per-DID score that every honest stand-in node agrees on."""
+    return int.from_bytes(hashlib.blake2b(did.encode(), digest_size=8).digest(), 'big') / 2 ** 64
+
+class StandInNode:
+    """Local HTTP server answering GET /trust/<did> like a federated node, with injectable faults.
+
+    Every attribute can be changed while the server runs: `latency` seconds
+    plus up to `jitter` seconds per request, `slow_latency` instead for a
+    `slow_ratio` share of requests, HTTP 500 for an `error_rate` share, and
+    `score` (a float, or a function of the DID) for the answer. With
+    `chunked` the body is sent with chunked transfer encoding and the
+    connection is left open until the client closes it.
+    """
+
+    def __init__(self, latency=0.005, jitter=0.0, slow_ratio=0.0, slow_latency=1.0, error_rate=0.0,
+                 score=stand_in_score, chunked=False, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_ratio = slow_ratio
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.score = score
+        self.chunked = chunked
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._server = None
+        self.url = None
+
+    async def start(self, host='127.0.0.1', port=0):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self.url = f'http://{host}:{self._server.sockets[0].getsockname()[1]}'
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def _delay(self):
+        if self.slow_ratio and self._rng.random() < self.slow_ratio:
+            return self.slow_latency
+        return self.latency + (self._rng.random() * self.jitter if self.jitter else 0.0)
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode()
+            while (await reader.readline()).strip():
+                pass
+            self.requests += 1
+            parts = request_line.split()
+            path = parts[1] if len(parts) > 1 else ''
+            await asyncio.sleep(self._delay())
+            if not path.startswith('/trust/'):
+                status, body = 404, {'error': 'not found'}
+            elif self.error_rate and self._rng.random() < self.error_rate:
+                status, body = 500, {'error': 'injected failure'}
+            else:
+                did = unquote(path[len('/trust/'):])
+                score = self.score(did) if callable(self.score) else self.score
+                status, body = 200, {'did': did, 'score': score}
+            payload = json.dumps(body).encode()
+            head = f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\nContent-Type: application/json\r\n'
+            if self.chunked:
+                half = len(payload) // 2
+                writer.write(f'{head}Transfer-Encoding: chunked\r\n\r\n'.encode() +
+                             f'{half:x};part=1\r\n'.encode() + payload[:half] + b'\r\n' +
+                             f'{len(payload) - half:x}\r\n'.encode() + payload[half:] + b'\r\n0\r\n\r\n')
+                await writer.drain()
+                await reader.read()  # Keep-alive: only the client ends the connection
+            else:
+                writer.write(f'{head}Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n'.encode() +
+                             payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass  # Client gone, or the server is shutting down
+        finally:
+            writer.close()
+
+async def start_stand_in_nodes(count, host='127.0.0.1', **options):
+    """Start `count` StandInNode servers with the same options; returns the nodes."""
+    return [await StandInNode(**options, seed=i).start(host) for i in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local stand-in federated nodes")
+    parser.add_argument('--nodes', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--slow-ratio', type=float, default=0.0)
+    parser.add_argument('--slow-latency', type=float, default=1.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    async def serve():
+        nodes = await start_stand_in_nodes(args.nodes, latency=args.latency, jitter=args.jitter,
+                                           slow_ratio=args.slow_ratio, slow_latency=args.slow_latency,
+                                           error_rate=args.error_rate)
+        print(f"FEDERATED_NODES={','.join(node.url for node in nodes)}", flush=True)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import os
+import time
+import queue
+import atexit
+import bisect
+import logging
+import threading
+from contextlib import ContextDecorator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import QueueHandler, QueueListener
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Log records buffered between the application and the log writer thread
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Port for start_metrics_server() when none is given
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9464'))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}  # label values tuple -> count
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        """Add `amount` to the series selected by `labels`."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Return the current value of one series."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        """Yield (name, labels, value) for every series."""
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, list(zip(self.labelnames, key)), value
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+class Histogram(Counter):
+    """Cumulative-bucket latency histogram with optional labels."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def inc(self, amount=1, **labels):
+        raise TypeError(f"Histogram {self.name} is observed, not incremented")
+
+    def observe(self, value, **labels):
+        """Record one observation, in seconds for latency histograms."""
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def value(self, **labels):
+        """Return {'count', 'sum'} for one series."""
+        with self._lock:
+            series = self._values.get(self._key(labels))
+            return {'count': series[2], 'sum': series[1]} if series else {'count': 0, 'sum': 0.0}
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        for key, (counts, total, count) in sorted(values.items()):
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', labels + [('le', _format_value(bound))], cumulative
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+    def time(self, **labels):
+        """Context manager/decorator observing elapsed time; see `timed`."""
+        return timed(self, **labels)
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif type(metric) is not cls:
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """Return the counter called `name`, creating it on first use."""
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Return the histogram called `name`, creating it on first use."""
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def get(self, name):
+        with self._lock:
+            return self._metrics.get(name)
+
+    def reset(self):
+        """Zero every metric (the metrics themselves stay registered)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {_escape(metric.documentation)}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+def counter(name, documentation, labelnames=()):
+    """Return a counter from the shared registry."""
+    return REGISTRY.counter(name, documentation, labelnames)
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """Return a histogram from the shared registry."""
+    return REGISTRY.histogram(name, documentation, labelnames, buckets)
+
+def render_metrics():
+    """Dump the shared registry in Prometheus text format."""
+    return REGISTRY.render()
+
+class timed(ContextDecorator):
+    """Observe the duration of a block or sync function in a histogram.
+
+    The histogram must have an `outcome` label, which is set to "ok" or
+    "error" depending on whether the block raised.
+    """
+
+    def __init__(self, histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def _recreate_cm(self):
+        # One instance per call, so concurrent calls of a decorated function don't share a start time
+        return timed(self.histogram, **self.labels)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self._start,
+                               outcome='ok' if exc_type is None else 'error', **self.labels)
+        return False
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would otherwise flood the log
+
+def start_metrics_server(port=None, host='127.0.0.1'):
+    """Serve /metrics from a daemon thread. Returns the server; call .shutdown() to stop it."""
+    server = ThreadingHTTPServer((host, METRICS_PORT if port is None else port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logging.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+### 🔥 Queue-backed logging: file writes happen on a background thread
+LOG_RECORDS_DROPPED = counter('log_records_dropped_total', "Log records dropped because the log queue was full")
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: records are dropped and counted when the queue is full."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+_log_listener = None
+_log_lock = threading.Lock()
+
+def configure_logging(filename, level=None, format=LOG_FORMAT, queue_size=None):
+    """Log to `filename` through a bounded queue drained by a writer thread.
+
+    Like logging.basicConfig, this does nothing if the root logger already
+    has handlers, so the first module to configure logging wins.
+    """
+    global _log_listener
+    root = logging.getLogger()
+    with _log_lock:
+        if root.handlers:
+            return
+        file_handler = logging.FileHandler(filename)
+        file_handler.setFormatter(logging.Formatter(format))
+        log_queue = queue.Queue(LOG_QUEUE_SIZE if queue_size is None else queue_size)
+        root.addHandler(DroppingQueueHandler(log_queue))
+        root.setLevel(level or LOG_LEVEL)
+        _log_listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        _log_listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging():
+    """Flush queued records to disk and stop the writer thread."""
+    global _log_listener
+    with _log_lock:
+        listener, _log_listener = _log_listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
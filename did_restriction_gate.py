@@ -0,0 +1,118 @@
+import math
+import hashlib
+import threading
+
+DEFAULT_FALSE_POSITIVE_RATE = 0.001
+
+_BLOOM_HEADER = 8  # Bytes: hash count (4, little endian) + reserved
+
+def _double_hash(did):
+    digest = hashlib.blake2b(did.encode(), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+class BloomFilter:
+    """Bloom filter over DIDs: `in` is False for every DID never added.
+
+    Positions come from one 128-bit blake2b digest (double hashing), so a
+    filter serialized with to_bytes() answers the same in any process or
+    language that repeats the construction.
+    """
+
+    def __init__(self, capacity, false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE):
+        if not 0 < false_positive_rate < 1:
+            raise ValueError(f"False positive rate must be in (0, 1), got {false_positive_rate}")
+        capacity = max(1, capacity)
+        bits = max(64, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.size = bits + (-bits % 8)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray(self.size // 8)
+
+    def _positions(self, did):
+        h1, h2 = _double_hash(did)
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, did):
+        for position in self._positions(did):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, did):
+        bits = self._bits
+        return all(bits[position >> 3] >> (position & 7) & 1 for position in self._positions(did))
+
+    def to_bytes(self):
+        return self.hashes.to_bytes(4, 'little') + bytes(_BLOOM_HEADER - 4) + bytes(self._bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        bloom = cls.__new__(cls)
+        bloom.hashes = int.from_bytes(data[:4], 'little')
+        bloom._bits = bytearray(data[_BLOOM_HEADER:])
+        bloom.size = len(bloom._bits) * 8
+        return bloom
+
+class RestrictionGate:
+    """In-memory set of restricted DIDs for admission checks.
+
+    is_restricted() is one set lookup with no lock: writers either mutate
+    the set in place or swap in a rebuilt one, both atomic under the GIL.
+    The owner keeps it current with set_restricted()/apply() after its
+    writes and replace() after a full reload.
+
+    bloom_filter() exports the set as a compact BloomFilter for gateways
+    in other processes: a miss there means "not restricted" without asking
+    this process; only hits need a real check.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()  # Serializes writers only
+        self._restricted = set()
+        self.loaded = False
+        self.updates = 0
+
+    def __len__(self):
+        return len(self._restricted)
+
+    def is_restricted(self, did):
+        return did in self._restricted
+
+    def replace(self, dids):
+        """Swap in a freshly loaded set of restricted DIDs."""
+        restricted = set(dids)
+        with self._lock:
+            self._restricted = restricted
+            self.loaded = True
+
+    def reset(self):
+        """Forget every DID and mark the gate as not loaded."""
+        with self._lock:
+            self._restricted = set()
+            self.loaded = False
+
+    def set_restricted(self, did, restricted):
+        self.apply(((did, restricted),))
+
+    def apply(self, changes):
+        """Apply (did, restricted) pairs; returns how many changed the set."""
+        changed = 0
+        with self._lock:
+            current = self._restricted
+            for did, restricted in changes:
+                if restricted and did not in current:
+                    current.add(did)
+                    changed += 1
+                elif not restricted and did in current:
+                    current.discard(did)
+                    changed += 1
+            self.updates += changed
+        return changed
+
+    def bloom_filter(self, false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE):
+        """Return a BloomFilter holding every currently restricted DID."""
+        dids = list(self._restricted)
+        bloom = BloomFilter(len(dids), false_positive_rate)
+        for did in dids:
+            bloom.add(did)
+        return bloom
+
+    def stats(self):
+        return {'restricted': len(self._restricted), 'loaded': self.loaded, 'updates': self.updates}
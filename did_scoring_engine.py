@@ -0,0 +1,158 @@
+import numpy as np
+from did_verification import did_method
+
+# Column order of every components matrix
+TRUST_SOURCE_NAMES = ('onchain', 'federated', 'usage', 'social')
+
+# Allowed difference between a weight profile's sum and 1
+WEIGHT_SUM_TOLERANCE = 1e-9
+
+def validate_weights(weights, sources=TRUST_SOURCE_NAMES):
+    """Check a weight profile and return it as a tuple in `sources` order.
+
+    Every weight must name a known source and be a finite number >= 0, and
+    the weights must sum to 1. Sources left out get weight 0.
+    """
+    unknown = set(weights) - set(sources)
+    if unknown:
+        raise ValueError(f"Unknown trust sources in weights: {sorted(unknown)}")
+    row = []
+    for name in sources:
+        weight = weights.get(name, 0.0)
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)) or not np.isfinite(weight) or weight < 0:
+            raise ValueError(f"Weight for '{name}' must be a finite number >= 0, got {weight!r}")
+        row.append(float(weight))
+    total = sum(row)
+    if abs(total - 1.0) > WEIGHT_SUM_TOLERANCE:
+        raise ValueError(f"Trust weights must sum to 1, got {total}")
+    return tuple(row)
+
+class ScoringEngine:
+    """Weighted trust scores for N DIDs in one NumPy pass.
+
+    Components are an (N, len(sources)) float matrix with NaN for sources
+    that did not answer. Components are clipped to [0, 1]; when some are
+    missing, the weights of the ones present are renormalized. Each DID is
+    weighted by the profile for its DID method, falling back to the
+    default weights.
+
+    Columns are accumulated one source at a time, in `sources` order.
+    score() for a single DID does the same float operations in the same
+    order without building arrays, so it gives bit-identical results to
+    score_matrix().
+    """
+
+    def __init__(self, weights, profiles=None, sources=TRUST_SOURCE_NAMES):
+        self.sources = tuple(sources)
+        self._column = {name: i for i, name in enumerate(self.sources)}
+        self._weights = validate_weights(weights, self.sources)
+        self._profiles = {}
+        for method, profile in (profiles or {}).items():
+            self._profiles[method] = validate_weights(profile, self.sources)
+        self._rebuild()
+
+    def _rebuild(self):
+        # Row 0 holds the default weights, row i + 1 the profile of self._methods[i]
+        self._methods = list(self._profiles)
+        self._profile_index = {method: i + 1 for i, method in enumerate(self._methods)}
+        self._weight_rows = np.array([self._weights] + [self._profiles[m] for m in self._methods], dtype=np.float64)
+
+    def weights(self, method=None):
+        """Return the weights used for a DID method as a dict."""
+        row = self._profiles.get(method, self._weights)
+        return dict(zip(self.sources, row))
+
+    def profiles(self):
+        """Return every per-method weight profile."""
+        return {method: dict(zip(self.sources, row)) for method, row in self._profiles.items()}
+
+    def set_weights(self, weights):
+        """Replace the default weights after validating them."""
+        self._weights = validate_weights(weights, self.sources)
+        self._rebuild()
+
+    def set_profile(self, method, weights):
+        """Use `weights` for every DID of `method`, after validating them."""
+        self._profiles[method] = validate_weights(weights, self.sources)
+        self._rebuild()
+
+    def remove_profile(self, method):
+        """Go back to the default weights for `method`."""
+        self._profiles.pop(method, None)
+        self._rebuild()
+
+    def components_matrix(self, components):
+        """Build an (N, sources) matrix from an iterable of {source: score} dicts, NaN for missing."""
+        rows = list(components)
+        matrix = np.full((len(rows), len(self.sources)), np.nan)
+        column = self._column
+        for i, row in enumerate(rows):
+            for name, value in row.items():
+                j = column.get(name)
+                if j is not None and value is not None:
+                    matrix[i, j] = value
+        return matrix
+
+    def profile_indices(self, methods):
+        """Map DID methods to rows of the weight table (0 for the default weights)."""
+        lookup = self._profile_index
+        return np.fromiter((lookup.get(method, 0) for method in methods), dtype=np.intp)
+
+    def score_matrix(self, components, methods=None):
+        """Score an (N, sources) components matrix; returns N scores, NaN where no source answered.
+
+        `methods` holds one DID method per row; None uses the default weights
+        for every row.
+        """
+        components = np.asarray(components, dtype=np.float64)
+        if components.ndim != 2 or components.shape[1] != len(self.sources):
+            raise ValueError(f"Expected an (N, {len(self.sources)}) components matrix, got {components.shape}")
+        n = components.shape[0]
+        if methods is None or not self._methods:
+            weights = np.broadcast_to(self._weight_rows[0], components.shape)
+        else:
+            weights = self._weight_rows[self.profile_indices(methods)]
+
+        present = ~np.isnan(components)
+        values = np.clip(np.where(present, components, 0.0), 0.0, 1.0)
+        total = np.zeros(n)
+        weight_present = np.zeros(n)
+        for j in range(len(self.sources)):
+            total += np.where(present[:, j], weights[:, j] * values[:, j], 0.0)
+            weight_present += np.where(present[:, j], weights[:, j], 0.0)
+
+        answered = present.any(axis=1)
+        partial = answered & ~present.all(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.where(partial, total / weight_present, total)
+        scores = np.clip(scores, 0.0, 1.0)
+        scores[~answered | (partial & (weight_present == 0))] = np.nan
+        return scores
+
+    def score_many(self, rows):
+        """Score (did, {source: score}) pairs; returns [(did, score or None)] in input order."""
+        rows = list(rows)
+        dids = [did for did, _ in rows]
+        scores = self.score_matrix(self.components_matrix(components for _, components in rows),
+                                   [did_method(did) for did in dids])
+        return [(did, None if np.isnan(score) else float(score)) for did, score in zip(dids, scores)]
+
+    def score(self, components, method=None):
+        """Score one DID's {source: score} dict; None if no source answered."""
+        weights = self._profiles.get(method, self._weights)
+        total = weight_present = 0.0
+        answered = 0
+        for name, weight in zip(self.sources, weights):
+            value = components.get(name)
+            if value is None or value != value:
+                continue
+            total += weight * min(max(value, 0.0), 1.0)
+            weight_present += weight
+            answered += 1
+        if not answered:
+            return None
+        if answered < len(self.sources):
+            if weight_present == 0:
+                return None
+            total /= weight_present
+        return min(max(total, 0.0), 1.0)
@@ -0,0 +1,266 @@
+import threading
+
+import numpy as np
+
+# Probability of jumping back to the pre-trusted distribution at each step (EigenTrust's a, PageRank's 1 - d)
+DEFAULT_TELEPORT = 0.15
+# Stop once no DID's trust, relative to the average (t * nodes), changes by more than this in a step
+DEFAULT_TOLERANCE = 1e-6
+DEFAULT_MAX_ITERATIONS = 200
+
+_NODE_BITS = 32
+_NODE_MASK = (1 << _NODE_BITS) - 1
+
+def _edge_keys(src, dst):
+    """Pack (src, dst) node ids into sortable int64 keys; sorted keys are CSR order."""
+    return (np.asarray(src, dtype=np.int64) << _NODE_BITS) | np.asarray(dst, dtype=np.int64)
+
+def _check_weights(weights):
+    if not np.all(np.isfinite(weights)) or np.any(weights < 0):
+        raise ValueError("Endorsement weights must be finite numbers >= 0")
+
+class SocialTrustGraph:
+    """DID -> DID endorsement graph with EigenTrust-style propagated trust.
+
+    Edges live in CSR form: sorted (src << 32 | dst) keys plus a parallel
+    weight array, from which indptr/indices/data are derived. Edge changes
+    are buffered and merged into the sorted arrays with searchsorted/insert
+    on the next propagate(), without re-sorting the whole graph.
+
+    propagate() runs power iteration t = (1 - a) * C^T t + a * p, where C
+    holds each DID's endorsements normalized to sum to 1, p is uniform over
+    the pre-trusted DIDs (over every DID when none are set) and `a` is the
+    teleport probability. DIDs that endorse nobody hand their trust to p.
+    Each step is one gather and one np.bincount over the edges. By default
+    the iteration warm-starts from the previous vector, which saves
+    iterations after small edge changes.
+
+    score() maps trust to [0, 1] as r / (1 + r) with r = t * nodes: a DID
+    with exactly average trust scores 0.5. There is no baseline score: a
+    DID that nobody endorses and that is not pre-trusted only holds
+    teleport mass (r = a, about 0.13 at the default teleport, with no
+    pre-trusted set), which says nothing about it, so score() returns None
+    for it and the social source counts as missing.
+    """
+
+    def __init__(self, teleport=DEFAULT_TELEPORT, tolerance=DEFAULT_TOLERANCE, max_iterations=DEFAULT_MAX_ITERATIONS):
+        if not 0 < teleport <= 1:
+            raise ValueError(f"Teleport probability must be in (0, 1], got {teleport}")
+        self.teleport = teleport
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self._lock = threading.Lock()  # Guards the node index and the pending edge buffer
+        self._compute_lock = threading.Lock()  # Serializes merges and propagation
+        self._index = {}  # did -> node id
+        self._dids = []
+        self._pending = {}  # (src, dst) node ids -> weight; 0 removes the edge
+        self._pretrusted = set()  # node ids
+        self._keys = np.empty(0, dtype=np.int64)
+        self._weights = np.empty(0, dtype=np.float64)
+        self._trust = None
+        self._scores = None
+        self._previous_scores = None  # NaN where a DID had no social signal
+
+    def __len__(self):
+        return len(self._dids)
+
+    @property
+    def edge_count(self):
+        """Edges merged into the CSR arrays (buffered changes are not counted until merged)."""
+        return len(self._keys)
+
+    @classmethod
+    def from_arrays(cls, dids, src, dst, weights=None, **kwargs):
+        """Build a graph from node-id arrays into `dids`; the fast path for millions of edges."""
+        graph = cls(**kwargs)
+        graph._dids = list(dids)
+        graph._index = {did: i for i, did in enumerate(graph._dids)}
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        weights = np.ones(len(src)) if weights is None else np.asarray(weights, dtype=np.float64)
+        _check_weights(weights)
+        if len(src) and (min(src.min(), dst.min()) < 0 or max(src.max(), dst.max()) >= len(graph._dids)):
+            raise ValueError("Edge endpoints must be node ids into `dids`")
+        graph._merge(_edge_keys(src, dst), weights)
+        return graph
+
+    def _node(self, did):
+        i = self._index.get(did)
+        if i is None:
+            if len(self._dids) > _NODE_MASK >> 1:
+                raise ValueError("Social graph is full")
+            i = self._index[did] = len(self._dids)
+            self._dids.append(did)
+        return i
+
+    def set_edge(self, src, dst, weight=1.0):
+        """Record that DID `src` endorses `dst` with `weight`; 0 removes the endorsement."""
+        self.update_edges([(src, dst, weight)])
+
+    def remove_edge(self, src, dst):
+        self.set_edge(src, dst, 0.0)
+
+    def update_edges(self, edges):
+        """Buffer (src, dst, weight) endorsement changes; they take effect at the next propagate().
+
+        Self-endorsements are ignored. Returns the number of changes buffered.
+        """
+        changes = 0
+        with self._lock:
+            for src, dst, weight in edges:
+                weight = float(weight)
+                if not np.isfinite(weight) or weight < 0:
+                    raise ValueError(f"Endorsement weight must be a finite number >= 0, got {weight!r}")
+                if src == dst:
+                    continue
+                self._pending[(self._node(src), self._node(dst))] = weight
+                changes += 1
+        return changes
+
+    def set_pretrusted(self, dids):
+        """Use `dids` as the pre-trusted set the iteration teleports to (empty = every DID)."""
+        with self._lock:
+            self._pretrusted = {self._node(did) for did in dids}
+
+    def _merge(self, keys, weights):
+        # Keep the last change per key, then update, insert or drop against the sorted arrays
+        order = np.argsort(keys, kind='stable')
+        keys, weights = keys[order], weights[order]
+        last = np.append(keys[1:] != keys[:-1], True)
+        keys, weights = keys[last], weights[last]
+        keep = (keys >> _NODE_BITS) != (keys & _NODE_MASK)
+        keys, weights = keys[keep], weights[keep]
+
+        pos = np.searchsorted(self._keys, keys)
+        found = pos < len(self._keys)
+        found[found] = self._keys[pos[found]] == keys[found]
+        current = self._weights.copy()  # Never mutate arrays a reader may still hold
+        current[pos[found]] = weights[found]
+        new = ~found & (weights > 0)
+        if new.any():
+            self._keys = np.insert(self._keys, pos[new], keys[new])
+            current = np.insert(current, pos[new], weights[new])
+        if (weights[found] == 0).any():
+            nonzero = current > 0
+            self._keys = self._keys[nonzero]
+            current = current[nonzero]
+        self._weights = current
+
+    def _apply_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            nodes = len(self._dids)
+            pretrusted = np.fromiter(self._pretrusted, dtype=np.intp, count=len(self._pretrusted))
+        if pending:
+            keys = np.fromiter(((src << _NODE_BITS) | dst for src, dst in pending), dtype=np.int64, count=len(pending))
+            self._merge(keys, np.fromiter(pending.values(), dtype=np.float64, count=len(pending)))
+        return nodes, pretrusted
+
+    def csr(self):
+        """Merge buffered changes and return (indptr, indices, data) of the raw endorsement weights."""
+        with self._compute_lock:
+            nodes, _ = self._apply_pending()
+            src = (self._keys >> _NODE_BITS).astype(np.intp)
+            indptr = np.concatenate(([0], np.cumsum(np.bincount(src, minlength=nodes))))
+            return indptr, (self._keys & _NODE_MASK).astype(np.int32), self._weights
+
+    def endorsements(self, did):
+        """Return [(endorsed did, weight)] for one DID, from the CSR arrays."""
+        i = self._index.get(did)
+        if i is None:
+            return []
+        indptr, indices, data = self.csr()
+        if i + 1 >= len(indptr):
+            return []
+        start, end = indptr[i], indptr[i + 1]
+        return [(self._dids[j], float(w)) for j, w in zip(indices[start:end], data[start:end])]
+
+    def propagate(self, warm=True):
+        """Merge buffered edge changes and iterate to the trust vector.
+
+        Returns {'nodes', 'edges', 'iterations', 'residual', 'converged', 'warm'}.
+        """
+        with self._compute_lock:
+            n, pretrusted = self._apply_pending()
+            summary = {'nodes': n, 'edges': len(self._keys), 'iterations': 0, 'residual': 0.0,
+                       'converged': True, 'warm': False}
+            if n == 0:
+                return summary
+
+            src = (self._keys >> _NODE_BITS).astype(np.intp)
+            dst = (self._keys & _NODE_MASK).astype(np.intp)
+            out_weight = np.bincount(src, weights=self._weights, minlength=n)
+            normalized = self._weights / out_weight[src]
+            dangling = np.flatnonzero(out_weight == 0)
+
+            p = np.zeros(n)
+            if len(pretrusted):
+                p[pretrusted] = 1.0 / len(pretrusted)
+            else:
+                p[:] = 1.0 / n
+
+            previous = self._trust
+            if warm and previous is not None and previous.sum() > 0:
+                t = np.concatenate((previous, p[len(previous):]))
+                t /= t.sum()
+                summary['warm'] = True
+            else:
+                t = p.copy()
+
+            a = self.teleport
+            flow_in = np.empty(len(src))
+            residual = np.inf
+            for iteration in range(1, self.max_iterations + 1):
+                np.take(t, src, out=flow_in)
+                flow_in *= normalized
+                new = np.bincount(dst, weights=flow_in, minlength=n)
+                new += t[dangling].sum() * p
+                new *= 1 - a
+                new += a * p
+                residual = float(np.abs(new - t).max()) * n
+                t = new
+                if residual < self.tolerance:
+                    break
+
+            ratio = t * n
+            self._previous_scores = self._scores
+            self._trust = t
+            # Only endorsed or pre-trusted DIDs have a social signal
+            signal = np.bincount(dst, weights=self._weights, minlength=n) > 0
+            signal[pretrusted] = True
+            self._scores = np.where(signal, ratio / (1 + ratio), np.nan)
+            summary.update(iterations=iteration, residual=residual, converged=residual < self.tolerance)
+            return summary
+
+    def trust(self, did):
+        """Return a DID's share of the trust vector (sums to 1), or None before the first propagate()."""
+        trust, i = self._trust, self._index.get(did)
+        if trust is None:
+            return None
+        return float(trust[i]) if i is not None and i < len(trust) else 0.0
+
+    def score(self, did):
+        """Return a DID's social trust score in [0, 1].
+
+        None before the first propagate() and for DIDs without a social
+        signal: not endorsed by anyone and not pre-trusted.
+        """
+        scores, i = self._scores, self._index.get(did)
+        if scores is None or i is None or i >= len(scores) or np.isnan(scores[i]):
+            return None
+        return float(scores[i])
+
+    def changed_dids(self, min_delta):
+        """DIDs whose score moved by at least `min_delta`, or appeared or went away, in the last propagate().
+
+        All of them after the first propagate().
+        """
+        scores, previous = self._scores, self._previous_scores
+        if scores is None:
+            return []
+        if previous is None:
+            return list(self._dids[:len(scores)])
+        current = scores[:len(previous)]
+        moved = (np.abs(current - previous) >= min_delta) | (np.isnan(current) != np.isnan(previous))
+        changed = np.concatenate((np.flatnonzero(moved), np.arange(len(previous), len(scores))))
+        return [self._dids[i] for i in changed]
@@ -1,23 +1,50 @@
 import os
 import sqlite3
-import psycopg2
-from datetime import datetime
+from datetime import datetime, timedelta
 import asyncio
 import logging
 import json
 import hashlib
 import time
+import threading
+import bisect
+import math
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import contextmanager
+from did_metrics import configure_logging, counter, histogram, timed
+from did_scoring_engine import ScoringEngine
+from did_verification import did_method
+from did_social_graph import SocialTrustGraph
+from did_federation import FederatedQuorumClient, QuorumError
+from did_usage_stream import UsageAggregator
+from did_restriction_gate import RestrictionGate
 
 # Set up logging
-logging.basicConfig(filename='trust_scoring.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+configure_logging('trust_scoring.log')
+
+# Hot-path metrics, exported with did_metrics.render_metrics() or start_metrics_server()
+SOURCE_FETCH_SECONDS = histogram('trust_source_fetch_seconds', "Trust source fetch latency", ('source', 'outcome'))
+DB_OPERATION_SECONDS = histogram('trust_db_operation_seconds', "Database operation latency", ('operation', 'outcome'))
+DB_POOL_WAIT_SECONDS = histogram('trust_db_pool_wait_seconds', "Time to check out a pooled connection", ('backend',))
+DB_LOCK_RETRIES = counter('trust_db_lock_retries_total', "'database is locked' errors that were retried", ('operation',))
+LEDGER_APPEND_FAILURES = counter('trust_ledger_append_failures_total',
+                                 "update_trust_ledger calls that gave up", ('reason',))
+POLICY_DECISIONS = counter('trust_policy_decisions_total', "Policy decisions by action", ('action', 'mode'))
+
+def db_operation(func):
+    """Record a database function's latency in trust_db_operation_seconds."""
+    return timed(DB_OPERATION_SECONDS, operation=func.__name__)(func)
 
 def init_wal_mode():
     """Enable SQLite WAL mode to prevent database locking."""
     try:
-        with sqlite3.connect('did_trust_scores.db') as conn:
-            conn.execute('PRAGMA journal_mode=WAL')
-            conn.commit()
-            logging.info("WAL mode initialized successfully")
+        for shard in range(shard_count()):
+            with sqlite3.connect(shard_path(shard)) as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.commit()
+        logging.info("WAL mode initialized successfully")
     except Exception as e:
         logging.error(f"Error initializing WAL mode: {e}")
         raise
@@ -28,44 +55,309 @@ DATABASE_CONFIG = {
     'backends': {
         'sqlite': {
             'ENGINE': 'sqlite3',
-            'NAME': os.getenv('SQLITE_DB_NAME', 'did_trust_scores.db')
-        },
-        'postgresql': {
-            'ENGINE': 'postgresql',
-            'NAME': os.getenv('POSTGRESQL_DB_NAME', 'trust_db'),
-            'USER': os.getenv('POSTGRESQL_DB_USER', 'user'),
-            'PASSWORD': os.getenv('POSTGRESQL_DB_PASSWORD', 'password'),
-            'HOST': os.getenv('POSTGRESQL_DB_HOST', 'localhost'),
-            'PORT': os.getenv('POSTGRESQL_DB_PORT', '5432')
+            'NAME': os.getenv('SQLITE_DB_NAME', 'did_trust_scores.db'),
+            'SHARDS': int(os.getenv('SQLITE_SHARDS', '1'))  # Files the DIDs are hash-partitioned over
         }
+    },
+    'max_retry_attempts': int(os.getenv('MAX_RETRY_ATTEMPTS', '5')),
+    'retry_delay': float(os.getenv('DB_RETRY_DELAY', '0.5')),
+    'pool': {
+        'MAX_SIZE': int(os.getenv('DB_POOL_SIZE', '8')),
+        'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'HEALTH_CHECK_INTERVAL': float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', '30'))
     }
 }
 
+### 🔥 Sharded Storage: DIDs hash-partitioned over SQLITE_SHARDS files
+# Every shard file has the full schema. A DID's scores, ledger, components,
+# recovery state and outgoing endorsements live in its shard; policy rules
+# are global and live in shard 0, which is also where unrouted
+# db_connection() calls go.
+
+def did_shard(did, shards):
+    """Stable shard number of a DID (same in every process)."""
+    return int.from_bytes(hashlib.blake2b(did.encode(), digest_size=8).digest(), 'big') % shards
+
+def shard_count():
+    """Number of shard files the DIDs are spread over."""
+    return max(1, DATABASE_CONFIG['backends']['sqlite']['SHARDS'])
+
+def shard_path(shard, shards=None):
+    """SQLite file of one shard: NAME itself when unsharded, NAME with a '.shard-<i>-of-<n>' suffix otherwise.
+
+    The shard count is part of the name, so a rebalanced layout is written
+    next to the old one.
+    """
+    name = DATABASE_CONFIG['backends']['sqlite']['NAME']
+    shards = shards or shard_count()
+    if shards <= 1:
+        return name
+    root, ext = os.path.splitext(name)
+    return f'{root}.shard-{shard}-of-{shards}{ext}'
+
+def shard_of(did, shards=None):
+    """Shard holding a DID's rows."""
+    shards = shards or shard_count()
+    return did_shard(did, shards) if shards > 1 else 0
+
+def group_by_shard(items, key=None, shards=None):
+    """Split DIDs (or rows, with `key` returning the DID) into {shard: [items]}, keeping their order."""
+    groups = {}
+    for item in items:
+        groups.setdefault(shard_of(key(item) if key else item, shards), []).append(item)
+    return groups
+
+def map_shards(func, shards=None):
+    """Call func(shard) for every shard, one thread per shard, and return the results in shard order.
+
+    SQLite releases the GIL while it works, so per-shard scans and writes
+    run in parallel on multi-core hosts.
+    """
+    shards = list(range(shard_count()) if shards is None else shards)
+    if len(shards) <= 1:
+        return [func(shard) for shard in shards]
+    with ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix='trust-shard') as executor:
+        return list(executor.map(func, shards))
+
 # Get database connection
-def get_database_connection():
-    """Get a new database connection."""
-    if DATABASE_CONFIG['default'] == 'sqlite':
-        return sqlite3.connect('did_trust_scores.db', timeout=30, isolation_level=None)
-    elif DATABASE_CONFIG['default'] == 'postgresql':
-        return psycopg2.connect(
-            dbname=DATABASE_CONFIG['backends']['postgresql']['NAME'],
-            user=DATABASE_CONFIG['backends']['postgresql']['USER'],
-            password=DATABASE_CONFIG['backends']['postgresql']['PASSWORD'],
-            host=DATABASE_CONFIG['backends']['postgresql']['HOST'],
-            port=DATABASE_CONFIG['backends']['postgresql']['PORT']
+def get_database_connection(backend=None, shard=0, shards=None):
+    """Open a new, unpooled database connection. Prefer db_connection()."""
+    backend = backend or DATABASE_CONFIG['default']
+    if backend == 'sqlite':
+        conn = sqlite3.connect(
+            shard_path(shard, shards),
+            timeout=30,
+            check_same_thread=False  # Pooled connections move between threads, one owner at a time
         )
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')  # Only takes effect on a new database, before WAL
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA busy_timeout = 5000')
+        return conn
     else:
-        raise ValueError("Unsupported database backend")
+        # The schema, PRAGMAs and queries are SQLite-only
+        raise ValueError(f"Unsupported database backend: {backend}")
+
+def _current_owner():
+    """Identify the checkout owner: the current thread, and the asyncio task if any."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return threading.get_ident(), id(task) if task is not None else None
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of connections for one database backend.
+
+    Connections are checked out per thread/asyncio task: nested checkouts by
+    the same owner reuse its connection, different owners never share one.
+    Idle connections are pinged before reuse once `health_check_interval`
+    seconds have passed and replaced if the ping fails.
+    """
+
+    def __init__(self, backend=None, max_size=None, timeout=None, health_check_interval=None, shard=0, shards=None):
+        pool_config = DATABASE_CONFIG['pool']
+        self.backend = backend or DATABASE_CONFIG['default']
+        self.shard = shard
+        self.shards = shards or shard_count()
+        self.max_size = max_size or pool_config['MAX_SIZE']
+        self.timeout = timeout if timeout is not None else pool_config['TIMEOUT']
+        self.health_check_interval = (health_check_interval if health_check_interval is not None
+                                      else pool_config['HEALTH_CHECK_INTERVAL'])
+        self._lock = threading.Lock()
+        self._available = threading.BoundedSemaphore(self.max_size)
+        self._idle = []  # (conn, last_used) stack, most recently used last
+        self._owned = {}  # owner -> [conn, depth]
+        self._closed = False
+        self.created = 0
+        self.checkouts = 0
+        self.discarded = 0
+
+    def stats(self):
+        """Return pool counters."""
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'shard': self.shard,
+                'max_size': self.max_size,
+                'idle': len(self._idle),
+                'in_use': len(self._owned),
+                'created': self.created,
+                'checkouts': self.checkouts,
+                'discarded': self.discarded
+            }
+
+    def _ping(self, conn):
+        try:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.fetchone()
+            return True
+        except Exception as e:
+            logging.warning(f"Discarding unhealthy {self.backend} connection: {e}")
+            return False
 
-# Initialize database connection
-conn = get_database_connection()
-c = conn.cursor()
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _checkout(self):
+        if not self._available.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No {self.backend} connection available within {self.timeout}s")
+        try:
+            while True:
+                with self._lock:
+                    if self._closed:
+                        raise RuntimeError("Connection pool is closed")
+                    conn, last_used = self._idle.pop() if self._idle else (None, None)
+                if conn is None:
+                    conn = get_database_connection(self.backend, self.shard, self.shards)
+                    with self._lock:
+                        self.created += 1
+                    return conn
+                if time.monotonic() - last_used < self.health_check_interval or self._ping(conn):
+                    return conn
+                self._close_quietly(conn)
+                with self._lock:
+                    self.discarded += 1
+        except BaseException:
+            self._available.release()
+            raise
+
+    def _checkin(self, conn, healthy=True):
+        try:
+            if healthy:
+                try:
+                    conn.rollback()  # Never hand out a connection mid-transaction
+                except Exception:
+                    healthy = False
+            with self._lock:
+                if healthy and not self._closed:
+                    self._idle.append((conn, time.monotonic()))
+                    return
+                self.discarded += 1
+            self._close_quietly(conn)
+        finally:
+            self._available.release()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection, committing on success and rolling back on error."""
+        owner = _current_owner()
+        with self._lock:
+            held = self._owned.get(owner)
+            if held is not None:
+                held[1] += 1
+        if held is not None:
+            try:
+                yield held[0]
+            finally:
+                with self._lock:
+                    held[1] -= 1
+            return
+
+        start = time.perf_counter()
+        conn = self._checkout()
+        DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start, backend=self.backend)
+        with self._lock:
+            self._owned[owner] = [conn, 1]
+            self.checkouts += 1
+        healthy = True
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:
+                healthy = False
+            raise
+        finally:
+            with self._lock:
+                del self._owned[owner]
+            self._checkin(conn, healthy)
+
+    def health_check(self):
+        """Ping every idle connection and drop the ones that fail. Returns the number dropped."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        keep, dropped = [], 0
+        for conn, _ in idle:
+            if self._ping(conn):
+                keep.append((conn, time.monotonic()))
+            else:
+                self._close_quietly(conn)
+                dropped += 1
+        with self._lock:
+            self._idle.extend(keep)
+            self.discarded += dropped
+        return dropped
+
+    def close(self):
+        """Close idle connections; connections in use are closed when returned."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(backend=None, shard=0, shards=None):
+    """Return the shared connection pool for a backend (and shard), creating it on first use."""
+    backend = backend or DATABASE_CONFIG['default']
+    shards = shards or shard_count()
+    key = (backend, shard, shards)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(backend, shard=shard, shards=shards)
+        return pool
+
+def close_pools():
+    """Close every shared connection pool and forget the scores cached from them."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+    score_cache.invalidate()
+    restriction_gate.reset()
+
+def db_connection(backend=None, did=None, shard=None, shards=None):
+    """Check out a pooled connection: `with db_connection() as conn: ...`.
+
+    With `did`, the connection is to that DID's shard; with `shard`, to that
+    shard; otherwise to shard 0, which holds the global tables. `shards`
+    selects another layout than the configured one (see rebalance_shards).
+    """
+    shards = shards or shard_count()
+    if shard is None:
+        shard = shard_of(did, shards) if did is not None else 0
+    return get_pool(backend, shard, shards).connection()
+
+def begin_write(conn):
+    """Take the SQLite write lock up front unless a transaction is already open."""
+    if isinstance(conn, sqlite3.Connection) and not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+
+def _ensure_column(c, table, column, definition):
+    """Add a column to an existing SQLite table created before it was introduced."""
+    c.execute(f'PRAGMA table_info({table})')
+    if column not in [row[1] for row in c.fetchall()]:
+        c.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
 
 # Initialize database and create tables
-def init_db():
-    """Initialize all database tables."""
+def init_db(shard=None, shards=None):
+    """Initialize all database tables (in every shard, unless one is given)."""
+    if shard is None:
+        for shard in range(shards or shard_count()):
+            init_db(shard, shards)
+        return
     try:
-        with get_database_connection() as conn:
+        with db_connection(shard=shard, shards=shards) as conn:
             c = conn.cursor()
             
             # Create did_scores table
@@ -73,7 +365,59 @@ def init_db():
                 CREATE TABLE IF NOT EXISTS did_scores (
                     did TEXT PRIMARY KEY, 
                     score REAL,
-                    flagged INTEGER DEFAULT 0
+                    flagged INTEGER DEFAULT 0,  -- 1 = flagged, 0 = normal
+                    change_seq INTEGER NOT NULL DEFAULT 0,  -- did_scores_clock value of the last score change
+                    flag_seq INTEGER NOT NULL DEFAULT 0  -- did_scores_clock value of the last flag change
+                )
+            ''')
+            _ensure_column(c, 'did_scores', 'change_seq', 'INTEGER NOT NULL DEFAULT 0')
+            _ensure_column(c, 'did_scores', 'flag_seq', 'INTEGER NOT NULL DEFAULT 0')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_did_scores_change_seq ON did_scores (change_seq)')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_did_scores_flag_seq ON did_scores (flag_seq)')
+            # Let the rescoring scheduler find flagged and near-threshold DIDs without a full scan
+            c.execute('CREATE INDEX IF NOT EXISTS idx_did_scores_score ON did_scores (score)')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_did_scores_flagged ON did_scores (did) WHERE flagged = 1')
+
+            # Stamp every score change with a global sequence so sweeps can resume from a checkpoint
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS did_scores_clock (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    change_seq INTEGER NOT NULL
+                )
+            ''')
+            c.execute('INSERT OR IGNORE INTO did_scores_clock (id, change_seq) VALUES (1, 0)')
+            for trigger, event in (('ai', 'AFTER INSERT ON did_scores'),
+                                   ('au', 'AFTER UPDATE OF score ON did_scores WHEN new.score IS NOT old.score')):
+                c.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS did_scores_{trigger} {event}
+                    BEGIN
+                        UPDATE did_scores_clock SET change_seq = change_seq + 1 WHERE id = 1;
+                        UPDATE did_scores SET change_seq = (SELECT change_seq FROM did_scores_clock WHERE id = 1)
+                        WHERE did = new.did;
+                    END
+                ''')
+            # Flag changes get their own stamp so score caches in other processes see them
+            # (change_seq stays score-only: incremental enforcement must not re-evaluate on flags)
+            c.execute('''
+                CREATE TRIGGER IF NOT EXISTS did_scores_flag_au
+                AFTER UPDATE OF flagged ON did_scores WHEN new.flagged IS NOT old.flagged
+                BEGIN
+                    UPDATE did_scores_clock SET change_seq = change_seq + 1 WHERE id = 1;
+                    UPDATE did_scores SET flag_seq = (SELECT change_seq FROM did_scores_clock WHERE id = 1)
+                    WHERE did = new.did;
+                END
+            ''')
+
+            # Progress of incremental enforcement sweeps
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS enforcement_checkpoints (
+                    name TEXT PRIMARY KEY,
+                    change_seq INTEGER NOT NULL DEFAULT -1,
+                    policy_version INTEGER,
+                    policy_snapshot TEXT,
+                    rule_target_version INTEGER,
+                    rule_cursor TEXT,
+                    updated_at TEXT
                 )
             ''')
 
@@ -83,36 +427,452 @@ def init_db():
                     rule_id INTEGER PRIMARY KEY AUTOINCREMENT,
                     rule_name TEXT UNIQUE,
                     min_trust_score REAL,
-                    action TEXT
+                    action TEXT  -- Actions: "alert", "restrict", "review"
                 )
             ''')
 
-            # Create trust_ledger table
+            # Bumped by triggers on every rule change so cached policy indexes know to reload
             c.execute('''
-                CREATE TABLE IF NOT EXISTS trust_ledger (
+                CREATE TABLE IF NOT EXISTS policy_rules_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    version INTEGER NOT NULL
+                )
+            ''')
+            c.execute('INSERT OR IGNORE INTO policy_rules_version (id, version) VALUES (1, 0)')
+            for trigger, operation in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE')):
+                c.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS policy_rules_{trigger} AFTER {operation} ON policy_rules
+                    BEGIN
+                        UPDATE policy_rules_version SET version = version + 1 WHERE id = 1;
+                    END
+                ''')
+
+            # Create the append-only trust ledger: one hash-chained row per event
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS trust_ledger_events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    did TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    event TEXT NOT NULL DEFAULT 'score',
+                    trust_score REAL,
+                    prev_hash TEXT NOT NULL,
+                    hash TEXT NOT NULL
+                )
+            ''')
+            c.execute('''
+                CREATE INDEX IF NOT EXISTS idx_trust_ledger_events_did_timestamp
+                ON trust_ledger_events (did, timestamp)
+            ''')
+
+            # Latest chain hash and summary state per DID, maintained on every append
+            # so neither appends nor readers such as the decay model scan the ledger
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS trust_ledger_heads (
                     did TEXT PRIMARY KEY,
-                    trust_history TEXT
+                    last_seq INTEGER NOT NULL,
+                    last_hash TEXT NOT NULL,
+                    last_timestamp TEXT NOT NULL,  -- last update
+                    entries INTEGER NOT NULL DEFAULT 0,
+                    first_seen TEXT,
+                    last_score REAL,
+                    flag_count INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            _ensure_column(c, 'trust_ledger_heads', 'first_seen', 'TEXT')
+            _ensure_column(c, 'trust_ledger_heads', 'last_score', 'REAL')
+            _ensure_column(c, 'trust_ledger_heads', 'flag_count', 'INTEGER NOT NULL DEFAULT 0')
+            for column in ('first_seen', 'last_timestamp', 'flag_count'):
+                c.execute(f'''
+                    CREATE INDEX IF NOT EXISTS idx_trust_ledger_heads_{column}
+                    ON trust_ledger_heads ({column})
+                ''')
+
+            # Merkle roots over batches of ledger events, and each batch's leaves in tree order
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS proof_batches (
+                    batch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    label TEXT NOT NULL,
+                    root TEXT NOT NULL,
+                    leaf_count INTEGER NOT NULL,
+                    first_seq INTEGER,
+                    last_seq INTEGER,
+                    sealed_through INTEGER,  -- set by seal_ledger(): every event up to here is batched
+                    created_at TEXT NOT NULL
+                )
+            ''')
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS proof_batch_leaves (
+                    batch_id INTEGER NOT NULL,
+                    leaf_index INTEGER NOT NULL,
+                    seq INTEGER NOT NULL,
+                    PRIMARY KEY (batch_id, leaf_index)
+                )
+            ''')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_proof_batch_leaves_seq ON proof_batch_leaves (seq)')
+
+            # Last fetched score per DID and trust source; times are Unix epoch seconds
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS trust_components (
+                    did TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    score REAL NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (did, source)
+                )
+            ''')
+            c.execute('''
+                CREATE INDEX IF NOT EXISTS idx_trust_components_source_expires
+                ON trust_components (source, expires_at)
+            ''')
+
+            # DID -> DID endorsements behind the social trust graph
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS social_edges (
+                    src TEXT NOT NULL,
+                    dst TEXT NOT NULL,
+                    weight REAL NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (src, dst)
+                )
+            ''')
+
+            # Create trust_recovery table
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS trust_recovery (
+                    did TEXT PRIMARY KEY, 
+                    recovery_stage TEXT,
+                    last_attempt TIMESTAMP,
+                    status TEXT DEFAULT 'pending'
                 )
             ''')
 
             conn.commit()
-            logging.info("Database tables initialized successfully")
+            logging.info(f"Database tables initialized successfully (shard {shard})")
+        migrate_trust_ledger(shard, shards)
+        backfill_ledger_summaries(shard=shard, shards=shards)
     except Exception as e:
         logging.error(f"Error initializing database: {e}")
         raise
 
+_initialized_databases = set()
+_init_lock = threading.Lock()
+
+def ensure_db():
+    """Run init_db() once per process for the configured database."""
+    backend = DATABASE_CONFIG['default']
+    key = (backend, DATABASE_CONFIG['backends'][backend]['NAME'], shard_count())
+    if key in _initialized_databases:
+        return
+    with _init_lock:
+        if key not in _initialized_databases:
+            init_db()
+            _initialized_databases.add(key)
+
+### 🔥 Async Storage: keep blocking database work off the event loop
+_db_executor = None
+_db_executor_lock = threading.Lock()
+
+def get_db_executor():
+    """Return the dedicated thread pool that runs database calls for coroutines."""
+    global _db_executor
+    with _db_executor_lock:
+        if _db_executor is None:
+            _db_executor = ThreadPoolExecutor(
+                max_workers=DATABASE_CONFIG['pool']['MAX_SIZE'],  # One pooled connection per worker
+                thread_name_prefix='trust-db'
+            )
+        return _db_executor
+
+def shutdown_db_executor(wait=True):
+    """Stop the database executor; a new one is created on next use."""
+    global _db_executor
+    with _db_executor_lock:
+        executor, _db_executor = _db_executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+def _is_locked_error(error):
+    return isinstance(error, sqlite3.OperationalError) and "database is locked" in str(error)
+
+def retries_internally(func):
+    """Mark a function that commits several transactions and retries each one itself.
+
+    run_db() runs such functions once: rerunning the whole function after
+    a lock error would repeat the transactions that already committed.
+    """
+    func.retries_internally = True
+    return func
+
+def retry_locked(func, *args):
+    """Run a single-transaction function, retrying lock errors with blocking backoff.
+
+    For worker threads (e.g. shard passes), never for the event loop.
+    """
+    retries = DATABASE_CONFIG['max_retry_attempts']
+    delay = DATABASE_CONFIG['retry_delay']
+    for attempt in range(retries):
+        try:
+            return func(*args)
+        except Exception as e:
+            if not _is_locked_error(e) or attempt == retries - 1:
+                raise
+            DB_LOCK_RETRIES.inc(operation=func.__name__)
+            logging.warning(f"⚠️ Database is locked in {func.__name__}. Retrying {attempt+1}/{retries}...")
+            time.sleep(delay * (attempt + 1))
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking database function on the DB executor, retrying lock errors.
+
+    Retries back off with asyncio.sleep, so the event loop keeps running
+    while the database is busy. Functions marked with retries_internally
+    are run once.
+    """
+    loop = asyncio.get_running_loop()
+    retries = 1 if getattr(func, 'retries_internally', False) else DATABASE_CONFIG['max_retry_attempts']
+    delay = DATABASE_CONFIG['retry_delay']
+    for attempt in range(retries):
+        try:
+            return await loop.run_in_executor(get_db_executor(), lambda: func(*args, **kwargs))
+        except Exception as e:
+            if not _is_locked_error(e) or attempt == retries - 1:
+                raise
+            DB_LOCK_RETRIES.inc(operation=func.__name__)
+            logging.warning(f"⚠️ Database is locked in {func.__name__}. Retrying {attempt+1}/{retries}...")
+            await asyncio.sleep(delay * (attempt + 1))
+
 def hash_trust_score(did, score, timestamp):
     """Create a hash of the trust score data for verification."""
     data = f"{did}:{score}:{timestamp}"
     return hashlib.sha256(data.encode()).hexdigest()
 
+# Previous hash of the first ledger entry for every DID
+GENESIS_HASH = '0' * 64
+
+def utc_timestamp():
+    """Current UTC time in the ledger's sortable ISO-8601 format."""
+    return datetime.utcnow().isoformat(timespec='microseconds')
+
+def chain_trust_hash(prev_hash, did, score, timestamp, event='score'):
+    """Chain a trust score hash onto the previous ledger entry's hash."""
+    data = f"{prev_hash}:{event}:{hash_trust_score(did, score, timestamp)}"
+    return hashlib.sha256(data.encode()).hexdigest()
+
+_HEAD_UPSERT = '''
+    ON CONFLICT(did) DO UPDATE SET
+        last_seq = excluded.last_seq,
+        last_hash = excluded.last_hash,
+        last_timestamp = excluded.last_timestamp,
+        entries = entries + excluded.entries,
+        first_seen = COALESCE(first_seen, excluded.first_seen),
+        last_score = excluded.last_score,
+        flag_count = flag_count + excluded.flag_count
+'''
+
+def append_ledger_event(c, did, trust_score, event='score', timestamp=None):
+    """Append one hash-chained ledger event using the caller's cursor and transaction.
+
+    Timestamps never go backwards within a DID's chain, so (did, timestamp)
+    order is chain order. Returns the new entry's hash.
+    """
+    c.execute('SELECT last_hash, last_timestamp FROM trust_ledger_heads WHERE did = ?', (did,))
+    head = c.fetchone()
+    prev_hash, last_timestamp = head if head else (GENESIS_HASH, None)
+    timestamp = timestamp or utc_timestamp()
+    if last_timestamp and timestamp < last_timestamp:
+        timestamp = last_timestamp
+
+    entry_hash = chain_trust_hash(prev_hash, did, trust_score, timestamp, event)
+    c.execute('''
+        INSERT INTO trust_ledger_events (did, timestamp, event, trust_score, prev_hash, hash)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (did, timestamp, event, trust_score, prev_hash, entry_hash))
+    c.execute(f'''
+        INSERT INTO trust_ledger_heads
+            (did, last_seq, last_hash, last_timestamp, entries, first_seen, last_score, flag_count)
+        VALUES (?, ?, ?, ?, 1, ?, ?, ?)
+        {_HEAD_UPSERT}
+    ''', (did, c.lastrowid, entry_hash, timestamp, timestamp, trust_score, int(event == 'flag')))
+    return entry_hash
+
+def _ledger_row(row):
+    seq, did, timestamp, event, trust_score, prev_hash, entry_hash = row
+    return {"seq": seq, "did": did, "timestamp": timestamp, "event": event,
+            "trust_score": trust_score, "prev_hash": prev_hash, "hash": entry_hash}
+
+_LEDGER_COLUMNS = 'seq, did, timestamp, event, trust_score, prev_hash, hash'
+
+def ledger_range(did, start=None, end=None):
+    """Yield a DID's ledger entries with start <= timestamp < end, oldest first."""
+    query = f'SELECT {_LEDGER_COLUMNS} FROM trust_ledger_events WHERE did = ?'
+    params = [did]
+    if start is not None:
+        query += ' AND timestamp >= ?'
+        params.append(start)
+    if end is not None:
+        query += ' AND timestamp < ?'
+        params.append(end)
+    with db_connection(did=did) as conn:
+        c = conn.cursor()
+        c.execute(query + ' ORDER BY timestamp, seq', params)
+        for row in c:
+            yield _ledger_row(row)
+
+def ledger_tail(did, n=10):
+    """Return a DID's latest `n` ledger entries, oldest first."""
+    with db_connection(did=did) as conn:
+        c = conn.cursor()
+        c.execute(f'''
+            SELECT {_LEDGER_COLUMNS} FROM trust_ledger_events
+            WHERE did = ? ORDER BY timestamp DESC, seq DESC LIMIT ?
+        ''', (did, n))
+        rows = c.fetchall()
+    return [_ledger_row(row) for row in reversed(rows)]
+
+@db_operation
+def verify_ledger_chain(did=None, shard=None):
+    """Recompute the hash chain for one DID, or all DIDs, streaming row by row.
+
+    Returns {'checked': <entries>, 'dids': <chains>, 'broken': [...]} where each
+    broken item names the DID, the first bad `seq` and the reason. Without
+    a DID every shard is verified in parallel (or only `shard`).
+    """
+    report = {'checked': 0, 'dids': 0, 'broken': []}
+    if did is None and shard is None and shard_count() > 1:
+        for part in map_shards(lambda shard: verify_ledger_chain(shard=shard)):
+            report['checked'] += part['checked']
+            report['dids'] += part['dids']
+            report['broken'] += part['broken']
+        return report
+    query = f'SELECT {_LEDGER_COLUMNS} FROM trust_ledger_events'
+    params = ()
+    if did is not None:
+        query += ' WHERE did = ?'
+        params = (did,)
+
+    with db_connection(did=did, shard=shard) as conn:
+        rows = conn.cursor()
+        heads = conn.cursor()
+
+        def close_chain(chain_did, running_hash, failed):
+            heads.execute('SELECT last_hash FROM trust_ledger_heads WHERE did = ?', (chain_did,))
+            head = heads.fetchone()
+            if not failed and (head[0] if head else GENESIS_HASH) != running_hash:
+                report['broken'].append({'did': chain_did, 'seq': None, 'reason': 'head mismatch'})
+
+        current, running_hash, failed = None, GENESIS_HASH, False
+        for seq, row_did, timestamp, event, trust_score, prev_hash, entry_hash in rows.execute(
+                query + ' ORDER BY did, timestamp, seq', params):
+            if row_did != current:
+                if current is not None:
+                    close_chain(current, running_hash, failed)
+                current, running_hash, failed = row_did, GENESIS_HASH, False
+                report['dids'] += 1
+            report['checked'] += 1
+            if failed:
+                continue
+            if prev_hash != running_hash:
+                report['broken'].append({'did': row_did, 'seq': seq, 'reason': 'chain link mismatch'})
+                failed = True
+            elif chain_trust_hash(prev_hash, row_did, trust_score, timestamp, event) != entry_hash:
+                report['broken'].append({'did': row_did, 'seq': seq, 'reason': 'hash mismatch'})
+                failed = True
+            running_hash = entry_hash
+        if current is not None:
+            close_chain(current, running_hash, failed)
+
+        # A chain whose entries were all deleted still has a head
+        if did is not None and current is None:
+            close_chain(did, GENESIS_HASH, False)
+        elif did is None:
+            heads.execute('SELECT COUNT(*) FROM trust_ledger_heads')
+            if heads.fetchone()[0] != report['dids']:
+                report['broken'].append({'did': None, 'seq': None, 'reason': 'heads without entries'})
+    return report
+
+def migrate_trust_ledger(shard=0, shards=None):
+    """Convert legacy per-DID JSON `trust_ledger` blobs into ledger events.
+
+    The legacy table is renamed to `trust_ledger_legacy` afterwards, so the
+    migration runs once. Legacy tables only exist in unsharded databases;
+    rebalance_shards() refuses to run before they are migrated. Returns the
+    number of events written.
+    """
+    with db_connection('sqlite', shard=shard, shards=shards) as conn:
+        c = conn.cursor()
+        c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'trust_ledger'")
+        if not c.fetchone():
+            return 0
+        c.execute('PRAGMA table_info(trust_ledger)')
+        if 'trust_history' not in [column[1] for column in c.fetchall()]:
+            return 0
+
+        conn.execute('BEGIN IMMEDIATE')
+        migrated = 0
+        legacy = conn.cursor()
+        for did, trust_history in legacy.execute('SELECT did, trust_history FROM trust_ledger'):
+            entries = json.loads(trust_history) if trust_history else []
+            entries.sort(key=lambda entry: datetime.fromisoformat(entry['timestamp']))
+            for entry in entries:
+                timestamp = datetime.fromisoformat(entry['timestamp']).isoformat(timespec='microseconds')
+                append_ledger_event(c, did, entry.get('trust_score'), 'migrated', timestamp)
+                migrated += 1
+        c.execute('ALTER TABLE trust_ledger RENAME TO trust_ledger_legacy')
+        conn.commit()
+    logging.info(f"Migrated {migrated} legacy trust ledger entries")
+    return migrated
+
+def backfill_ledger_summaries(full=False, shard=None, shards=None):
+    """Fill first_seen/last_score/flag_count on ledger heads from the events.
+
+    Only heads missing `first_seen` are touched unless `full` is set, so this
+    is cheap to run on every start-up. Covers every shard unless one is
+    given. Returns the number of heads updated.
+    """
+    if shard is None:
+        return sum(map_shards(lambda shard: backfill_ledger_summaries(full, shard, shards),
+                              range(shards or shard_count())))
+    with db_connection(shard=shard, shards=shards) as conn:
+        c = conn.cursor()
+        c.execute(f'''
+            UPDATE trust_ledger_heads SET
+                first_seen = (SELECT MIN(e.timestamp) FROM trust_ledger_events e
+                              WHERE e.did = trust_ledger_heads.did),
+                last_score = (SELECT e.trust_score FROM trust_ledger_events e
+                              WHERE e.did = trust_ledger_heads.did
+                              ORDER BY e.timestamp DESC, e.seq DESC LIMIT 1),
+                flag_count = (SELECT COUNT(*) FROM trust_ledger_events e
+                              WHERE e.did = trust_ledger_heads.did AND e.event = 'flag')
+            {'' if full else 'WHERE first_seen IS NULL'}
+        ''')
+        updated = c.rowcount
+        conn.commit()
+    if updated:
+        logging.info(f"Backfilled ledger summaries for {updated} DIDs")
+    return updated
+
+def get_ledger_summary(did):
+    """Return a DID's ledger summary (first_seen, last_update, last_score, flag_count, entries) or None."""
+    with db_connection(did=did) as conn:
+        c = conn.cursor()
+        c.execute('''
+            SELECT first_seen, last_timestamp, last_score, flag_count, entries
+            FROM trust_ledger_heads WHERE did = ?
+        ''', (did,))
+        row = c.fetchone()
+    if not row:
+        return None
+    first_seen, last_update, last_score, flag_count, entries = row
+    return {"did": did, "first_seen": first_seen, "last_update": last_update,
+            "last_score": last_score, "flag_count": flag_count, "entries": entries}
+
+@db_operation
 def insert_trust_score(did, score):
-    """Insert or update a DID trust score with cryptographic proof."""
+    """Insert or update a DID trust score and append it to the trust ledger."""
     try:
-        with get_database_connection() as conn:
+        with db_connection(did=did) as conn:
             c = conn.cursor()
-            timestamp = datetime.utcnow().isoformat()
-            score_hash = hash_trust_score(did, score, timestamp)
+            timestamp = utc_timestamp()
 
             c.execute('''
                 INSERT INTO did_scores (did, score, flagged) 
@@ -120,25 +880,1116 @@ def insert_trust_score(did, score):
                 ON CONFLICT(did) DO UPDATE SET score = ?;
             ''', (did, score, score))
 
-            c.execute('''
-                INSERT INTO trust_ledger (did, trust_history)
-                VALUES (?, ?)
-                ON CONFLICT(did) DO UPDATE SET trust_history = ?;
-            ''', (did, json.dumps([{"timestamp": timestamp, "trust_score": score, "hash": score_hash}]), 
-                  json.dumps([{"timestamp": timestamp, "trust_score": score, "hash": score_hash}])))
+            score_hash = append_ledger_event(c, did, score, 'score', timestamp)
 
             conn.commit()
+            score_cache.invalidate(did)
             logging.debug(f'Inserted/Updated trust score for {did}: {score} | Hash: {score_hash}')
     except Exception as e:
         logging.error(f"Error inserting trust score for {did}: {e}")
         raise
 
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def append_ledger_events(c, entries, timestamp=None):
+    """Append many (did, trust_score, event) ledger entries in the caller's write transaction.
+
+    Reads the affected heads once, chains the entries in memory and writes
+    events and heads with executemany. The caller must hold the write lock
+    (BEGIN IMMEDIATE) because sequence numbers are assigned here. Returns
+    the (seq, hash) of each new event, e.g. for a ProofBatch.
+    """
+    if not entries:
+        return []
+    timestamp = timestamp or utc_timestamp()
+    dids = list({entry[0] for entry in entries})
+    heads = {}
+    for start in range(0, len(dids), 500):
+        batch = dids[start:start + 500]
+        c.execute(
+            f"SELECT did, last_hash, last_timestamp FROM trust_ledger_heads "
+            f"WHERE did IN ({','.join('?' * len(batch))})", batch)
+        heads.update({did: (last_hash, last_timestamp) for did, last_hash, last_timestamp in c.fetchall()})
+    c.execute('SELECT COALESCE(MAX(seq), 0) FROM trust_ledger_events')
+    seq = c.fetchone()[0]
+
+    events = []
+    summaries = {}  # did -> [last_seq, entries, first_timestamp, last_score, flags]
+    for did, score, event in entries:
+        prev_hash, last_timestamp = heads.get(did, (GENESIS_HASH, None))
+        entry_timestamp = max(timestamp, last_timestamp) if last_timestamp else timestamp
+        entry_hash = chain_trust_hash(prev_hash, did, score, entry_timestamp, event)
+        seq += 1
+        events.append((seq, did, entry_timestamp, event, score, prev_hash, entry_hash))
+        heads[did] = (entry_hash, entry_timestamp)
+        summary = summaries.setdefault(did, [seq, 0, entry_timestamp, score, 0])
+        summary[0], summary[3] = seq, score
+        summary[1] += 1
+        summary[4] += event == 'flag'
+
+    c.executemany('''
+        INSERT INTO trust_ledger_events (seq, did, timestamp, event, trust_score, prev_hash, hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', events)
+    c.executemany(f'''
+        INSERT INTO trust_ledger_heads
+            (did, last_seq, last_hash, last_timestamp, entries, first_seen, last_score, flag_count)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        {_HEAD_UPSERT}
+    ''', [(did, last_seq, heads[did][0], heads[did][1], entries, first_timestamp, last_score, flags)
+          for did, (last_seq, entries, first_timestamp, last_score, flags) in summaries.items()])
+    return [(seq, entry_hash) for seq, _, _, _, _, _, entry_hash in events]
+
+@retries_internally
+@db_operation
+def insert_trust_scores(rows, chunk_size=1000, proof_batch=None):
+    """Write many (did, score) pairs and their ledger events in chunked transactions.
+
+    Each chunk is one transaction per shard it touches (written in
+    parallel): did_scores is upserted with executemany and the ledger
+    entries are appended with append_ledger_events().
+    Committed events are added to `proof_batch` if one is given. A lock
+    error is retried for the failing shard's transaction only. Returns
+    the number of rows written.
+    """
+    written = 0
+    for chunk in _chunks(rows, chunk_size):
+        groups = group_by_shard(chunk, key=lambda row: row[0])
+        map_shards(lambda shard: _insert_score_chunk(shard, groups[shard], proof_batch), groups)
+        written += len(chunk)
+    return written
+
+def _insert_score_chunk(shard, chunk, proof_batch=None):
+    """Write one shard's part of a chunk as one transaction, then hand its events to `proof_batch`."""
+    events = retry_locked(_write_score_chunk, shard, chunk)
+    score_cache.invalidate_many(did for did, _ in chunk)
+    if proof_batch is not None:
+        proof_batch.add(events, shard)
+    logging.debug(f'Inserted/Updated {len(chunk)} trust scores in one transaction')
+
+def _write_score_chunk(shard, chunk):
+    with db_connection(shard=shard) as conn:
+        c = conn.cursor()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            c.executemany('''
+                INSERT INTO did_scores (did, score, flagged)
+                VALUES (?, ?, 0)
+                ON CONFLICT(did) DO UPDATE SET score = excluded.score
+            ''', chunk)
+            events = append_ledger_events(c, [(did, score, 'score') for did, score in chunk])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Error inserting batch of {len(chunk)} trust scores: {e}")
+            raise
+    return events
+
+### 🔥 Shard Rebalancing: move every DID's rows to a layout with another shard count
+# Per-DID tables and the column that routes their rows; trust_ledger_events keeps
+# seq order per DID and gets new seqs, enforcement checkpoints and proof batches
+# are rebuilt rather than copied
+_SHARDED_TABLES = (
+    ('did_scores', 'did', ('did', 'score', 'flagged')),
+    ('trust_ledger_events', 'did', ('did', 'timestamp', 'event', 'trust_score', 'prev_hash', 'hash')),
+    ('trust_ledger_heads', 'did', ('did', 'last_seq', 'last_hash', 'last_timestamp', 'entries',
+                                   'first_seen', 'last_score', 'flag_count')),
+    ('trust_components', 'did', ('did', 'source', 'score', 'fetched_at', 'expires_at')),
+    ('trust_recovery', 'did', ('did', 'recovery_stage', 'last_attempt', 'status')),
+    ('social_edges', 'src', ('src', 'dst', 'weight', 'updated_at')),
+)
+
+@db_operation
+def rebalance_shards(shards, chunk_size=10000, activate=True):
+    """Copy every DID's rows from the current layout into `shards` new shard files.
+
+    Offline tool: stop every writer first. The new files are created next
+    to the old ones (the shard count is part of their names) and must not
+    exist yet; the old files are left untouched, so the copy can be
+    checked and the old layout kept until then. Policy rules move with
+    shard 0. Row counts are compared per table once everything is copied.
+
+    With `activate`, this process switches to the new layout and seals
+    the copied ledger into proof batches; other processes switch when
+    they restart with SQLITE_SHARDS set to `shards`. Incremental
+    enforcement starts over with a full sweep there. Returns {table: rows}.
+    """
+    old = shard_count()
+    if shards < 1 or shards == old:
+        raise ValueError(f"Cannot rebalance {old} shard(s) into {shards}")
+    for shard in range(shards):
+        if os.path.exists(shard_path(shard, shards)):
+            raise FileExistsError(f"{shard_path(shard, shards)} already exists; remove it (e.g. after an "
+                                  f"interrupted rebalance) before rebalancing into {shards} shards")
+    ensure_db()  # Legacy ledgers are migrated first, so only trust_ledger_events has to be copied
+    init_db(shards=shards)
+
+    copied = {table: 0 for table, _, _ in _SHARDED_TABLES}
+    expected = dict(copied)
+    for shard in range(old):
+        with db_connection(shard=shard) as source:
+            c = source.cursor()
+            for table, key, columns in _SHARDED_TABLES:
+                c.execute(f'SELECT COUNT(*) FROM {table}')
+                expected[table] += c.fetchone()[0]
+                order = 'seq' if table == 'trust_ledger_events' else 'rowid'
+                c.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY {order}")
+                insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+                position = columns.index(key)
+                while True:
+                    rows = c.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    for target, target_rows in group_by_shard(rows, key=lambda row: row[position], shards=shards).items():
+                        with db_connection(shard=target, shards=shards) as conn:
+                            begin_write(conn)
+                            conn.cursor().executemany(insert, target_rows)
+                            conn.commit()
+                    copied[table] += len(rows)
+        logging.info(f"Rebalanced shard {shard} of {old} into {shards} shards")
+
+    with db_connection(shard=0) as source, db_connection(shard=0, shards=shards) as conn:
+        c = source.cursor()
+        c.execute('SELECT rule_id, rule_name, min_trust_score, action FROM policy_rules')
+        rules = c.fetchall()
+        c.execute('SELECT version FROM policy_rules_version WHERE id = 1')
+        version = c.fetchone()[0]
+        target = conn.cursor()
+        begin_write(conn)
+        target.executemany('INSERT INTO policy_rules (rule_id, rule_name, min_trust_score, action) VALUES (?, ?, ?, ?)',
+                           rules)
+        target.execute('UPDATE policy_rules_version SET version = ? WHERE id = 1', (version,))
+        conn.commit()
+
+    def finish(shard):
+        with db_connection(shard=shard, shards=shards) as conn:
+            c = conn.cursor()
+            begin_write(conn)
+            # Heads point at the events' new seqs
+            c.execute('''
+                UPDATE trust_ledger_heads SET last_seq = (
+                    SELECT MAX(seq) FROM trust_ledger_events e WHERE e.did = trust_ledger_heads.did)
+                WHERE EXISTS (SELECT 1 FROM trust_ledger_events e WHERE e.did = trust_ledger_heads.did)
+            ''')
+            conn.commit()
+    map_shards(finish, range(shards))
+
+    mismatched = {table: (expected[table], copied[table]) for table in copied if copied[table] != expected[table]}
+    if mismatched:
+        raise RuntimeError(f"Rebalance copied the wrong number of rows (expected, copied): {mismatched}")
+    if activate:
+        DATABASE_CONFIG['backends']['sqlite']['SHARDS'] = shards
+        close_pools()
+        policy_index.invalidate()
+        seal_ledger()
+    logging.info(f"Rebalanced {old} shard(s) into {shards}: {copied}")
+    return copied
+
+### 🔥 Database Maintenance: checkpoints, integrity checks, ANALYZE and vacuum off the write path
+MAINTENANCE_CONFIG = {
+    'poll_interval': float(os.getenv('MAINTENANCE_POLL_INTERVAL', '10')),  # Seconds between due-job checks
+    'checkpoint_wal_bytes': int(os.getenv('MAINTENANCE_CHECKPOINT_WAL_BYTES', str(64 * 1024 * 1024))),  # TRUNCATE beyond this
+    'checkpoint_interval': float(os.getenv('MAINTENANCE_CHECKPOINT_INTERVAL', '300')),  # Seconds between PASSIVE checkpoints
+    'integrity_interval': float(os.getenv('MAINTENANCE_INTEGRITY_INTERVAL', '86400')),  # Seconds between quick_checks, 0 = never
+    'analyze_interval': float(os.getenv('MAINTENANCE_ANALYZE_INTERVAL', '86400')),  # Seconds between ANALYZE runs, 0 = never
+    'analysis_limit': int(os.getenv('MAINTENANCE_ANALYSIS_LIMIT', '1000')),  # Rows ANALYZE samples per index
+    'vacuum_interval': float(os.getenv('MAINTENANCE_VACUUM_INTERVAL', '3600')),  # Seconds between incremental vacuums, 0 = never
+    'vacuum_pages': int(os.getenv('MAINTENANCE_VACUUM_PAGES', '1000'))  # Free pages released per incremental vacuum
+}
+
+MAINTENANCE_SECONDS = histogram('trust_maintenance_seconds', "Database maintenance job duration", ('job', 'outcome'),
+                                buckets=(0.001, 0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0))
+MAINTENANCE_WAL_BYTES = histogram('trust_maintenance_wal_bytes', "WAL file size seen by the maintenance service", (),
+                                  buckets=tuple(2 ** i * 1024 * 1024 for i in range(0, 12)))
+MAINTENANCE_INTEGRITY_FAILURES = counter('trust_maintenance_integrity_failures_total',
+                                         "quick_check runs that reported problems")
+
+class DatabaseMaintenance:
+    """Runs SQLite housekeeping on its own connection, outside every write path.
+
+    - checkpoint: PASSIVE every `checkpoint_interval` seconds (never waits
+      for readers or writers), TRUNCATE once the WAL file grows past
+      `checkpoint_wal_bytes`;
+    - integrity: PRAGMA quick_check. It is read-only, so in WAL mode it
+      never blocks writers;
+    - analyze: ANALYZE bounded by `analysis_limit`;
+    - vacuum: incremental_vacuum of up to `vacuum_pages` free pages, on
+      databases created with auto_vacuum = INCREMENTAL (new ones are).
+      The pragma only reaches an existing file through a full VACUUM, so
+      older files are skipped until enable_incremental_vacuum() has run.
+
+    run_due() runs whatever is due; stats() reports the last results. One
+    instance looks after one database file (see maintenance_services()).
+    """
+
+    JOBS = ('checkpoint', 'integrity', 'analyze', 'vacuum')
+
+    def __init__(self, path=None, **overrides):
+        self.path = path
+        self.config = {**MAINTENANCE_CONFIG, **overrides}
+        self._lock = threading.Lock()
+        now = time.monotonic()
+        # Heavy jobs first run one interval after start, not during startup
+        self._last_run = {'checkpoint': now, 'integrity': now, 'analyze': now, 'vacuum': now}
+        self.results = {}  # job -> last result
+        self.runs = {job: 0 for job in self.JOBS}
+
+    def _database(self):
+        return self.path or DATABASE_CONFIG['backends']['sqlite']['NAME']
+
+    def _connect(self):
+        # Unpooled, so a long quick_check never holds a connection writers are waiting for
+        conn = sqlite3.connect(self._database(), timeout=30)
+        conn.execute('PRAGMA busy_timeout = 5000')
+        return conn
+
+    def wal_bytes(self):
+        try:
+            return os.path.getsize(self._database() + '-wal')
+        except OSError:
+            return 0
+
+    def due(self, now=None):
+        """Return the jobs due now, cheapest first."""
+        now = time.monotonic() if now is None else now
+        wal = self.wal_bytes()
+        MAINTENANCE_WAL_BYTES.observe(wal)
+        due = []
+        if wal >= self.config['checkpoint_wal_bytes'] or self._elapsed('checkpoint', 'checkpoint_interval', now):
+            due.append('checkpoint')
+        for job in ('vacuum', 'analyze', 'integrity'):
+            if self._elapsed(job, f'{job}_interval', now):
+                due.append(job)
+        return due
+
+    def _elapsed(self, job, interval_key, now):
+        interval = self.config[interval_key]
+        return interval > 0 and now - self._last_run[job] >= interval
+
+    def run_due(self, now=None):
+        """Run every due job; returns {job: result}. Concurrent calls return {} instead of queueing."""
+        if not self._lock.acquire(blocking=False):
+            return {}
+        try:
+            return {job: self.run(job) for job in self.due(now)}
+        finally:
+            self._lock.release()
+
+    def run(self, job):
+        """Run one job now and return its result."""
+        with timed(MAINTENANCE_SECONDS, job=job):
+            conn = self._connect()
+            try:
+                result = getattr(self, f'_{job}')(conn)
+            finally:
+                conn.close()
+        self._last_run[job] = time.monotonic()
+        self.runs[job] += 1
+        self.results[job] = result
+        return result
+
+    def _checkpoint(self, conn):
+        wal = self.wal_bytes()
+        mode = 'TRUNCATE' if wal >= self.config['checkpoint_wal_bytes'] else 'PASSIVE'
+        busy, log_frames, checkpointed = conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+        if busy:
+            logging.warning(f"WAL checkpoint ({mode}) of {wal} bytes could not finish: readers or writers busy")
+        return {'mode': mode, 'wal_bytes': wal, 'busy': bool(busy), 'log_frames': log_frames,
+                'checkpointed_frames': checkpointed}
+
+    def _integrity(self, conn):
+        problems = [row[0] for row in conn.execute('PRAGMA quick_check(10)').fetchall() if row[0] != 'ok']
+        if problems:
+            MAINTENANCE_INTEGRITY_FAILURES.inc()
+            logging.critical(f"Database integrity check failed for {self._database()}: {problems}")
+        return {'ok': not problems, 'problems': problems}
+
+    def _analyze(self, conn):
+        conn.execute(f"PRAGMA analysis_limit = {int(self.config['analysis_limit'])}")
+        conn.execute('ANALYZE')
+        conn.commit()
+        return {'analysis_limit': self.config['analysis_limit']}
+
+    def _vacuum(self, conn):
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            return {'skipped': 'auto_vacuum is not INCREMENTAL; run enable_incremental_vacuum() once to enable it'}
+        free_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        # executescript steps the pragma to completion; execute() would free a single page
+        conn.executescript(f"PRAGMA incremental_vacuum({int(self.config['vacuum_pages'])})")
+        free_after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        return {'freed_pages': free_before - free_after, 'free_pages': free_after}
+
+    def enable_incremental_vacuum(self):
+        """Switch an existing database to auto_vacuum = INCREMENTAL; returns False if it already was.
+
+        Runs a full VACUUM, which rewrites the file and blocks writers until
+        it is done: call it in a maintenance window, never from run_due().
+        """
+        conn = self._connect()
+        try:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+                return False
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            with timed(MAINTENANCE_SECONDS, job='full_vacuum'):
+                conn.execute('VACUUM')
+            logging.info(f"Enabled incremental vacuum on {self._database()}")
+            return True
+        finally:
+            conn.close()
+
+    def stats(self):
+        return {'wal_bytes': self.wal_bytes(), 'runs': dict(self.runs), 'last': dict(self.results)}
+
+_maintenance_services = {}  # database file -> DatabaseMaintenance
+
+def maintenance_services():
+    """Return one DatabaseMaintenance per shard file of the configured SQLite database."""
+    services = []
+    for shard in range(shard_count()):
+        path = shard_path(shard)
+        if path not in _maintenance_services:
+            _maintenance_services[path] = DatabaseMaintenance(path)
+        services.append(_maintenance_services[path])
+    return services
+
+async def auto_maintain_database(interval=None):
+    """Run due maintenance jobs periodically, on a thread of their own rather than the DB executor."""
+    interval = interval if interval is not None else MAINTENANCE_CONFIG['poll_interval']
+    while True:
+        for service in maintenance_services():
+            try:
+                results = await asyncio.to_thread(service.run_due)
+                if results:
+                    logging.info(f"Database maintenance of {service.path}: {results}")
+            except Exception as e:
+                logging.error(f"Database maintenance of {service.path} failed: {e}")
+        await asyncio.sleep(interval)
+
+### 🔥 Merkle Proof Batches: O(log n) inclusion proofs for batches of ledger events
+# Leaves per proof batch; larger runs are split over several batches
+PROOF_BATCH_MAX_LEAVES = int(os.getenv('PROOF_BATCH_MAX_LEAVES', '100000'))
+
+# Recently used batch trees kept in memory, so further proofs from a batch cost O(log n)
+PROOF_TREE_CACHE_SIZE = int(os.getenv('PROOF_TREE_CACHE_SIZE', '4'))
+
+def merkle_leaf(event_hash):
+    """Leaf node for a ledger event hash (hex). Leaves and inner nodes use distinct prefixes."""
+    return hashlib.sha256(b'\x00' + bytes.fromhex(event_hash)).digest()
+
+def merkle_parent(left, right):
+    return hashlib.sha256(b'\x01' + left + right).digest()
+
+def merkle_levels(leaves):
+    """Build every level of the tree, leaves first. An odd last node is carried up unchanged."""
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [merkle_parent(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+def merkle_path(levels, index):
+    """Return the sibling path of leaf `index` as [(side, hash_hex)], side 'L' or 'R' of the node."""
+    path = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            path.append(('L' if sibling < index else 'R', level[sibling].hex()))
+        index //= 2
+    return path
+
+def merkle_root_from_path(leaf, path):
+    node = leaf
+    for side, sibling in path:
+        sibling = bytes.fromhex(sibling)
+        node = merkle_parent(sibling, node) if side == 'L' else merkle_parent(node, sibling)
+    return node
+
+def _next_batch_id(c, shard):
+    """Pick the next batch id in a shard, or None to let SQLite assign it.
+
+    With several shards, shard i only uses ids congruent to i modulo the
+    shard count, so batch ids stay unique and name their shard.
+    """
+    shards = shard_count()
+    if shards == 1:
+        return None
+    c.execute('SELECT COALESCE(MAX(batch_id), 0) FROM proof_batches')
+    latest = c.fetchone()[0]
+    return latest + 1 + (shard - latest - 1) % shards
+
+def batch_shard(batch_id):
+    """Return the shard holding a proof batch."""
+    return batch_id % shard_count()
+
+def commit_proof_batches(c, label, leaves, sealed_through=None, shard=0):
+    """Commit (seq, event_hash) leaves as Merkle proof batches in the caller's transaction.
+
+    Leaves are split into batches of at most PROOF_BATCH_MAX_LEAVES. `c`
+    must be a cursor on `shard`, where the leaves' events live. Returns
+    the new batch ids.
+    """
+    batch_ids = []
+    for chunk in _chunks(leaves, PROOF_BATCH_MAX_LEAVES):
+        root = merkle_levels([merkle_leaf(entry_hash) for _, entry_hash in chunk])[-1][0]
+        c.execute('''
+            INSERT INTO proof_batches (batch_id, label, root, leaf_count, first_seq, last_seq, sealed_through, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (_next_batch_id(c, shard), label, root.hex(), len(chunk), min(seq for seq, _ in chunk),
+              max(seq for seq, _ in chunk), sealed_through, utc_timestamp()))
+        batch_id = c.lastrowid
+        c.executemany('INSERT INTO proof_batch_leaves (batch_id, leaf_index, seq) VALUES (?, ?, ?)',
+                      [(batch_id, i, seq) for i, (seq, _) in enumerate(chunk)])
+        batch_ids.append(batch_id)
+        logging.debug(f"Committed proof batch {batch_id} ({label}): {len(chunk)} leaves, root {root.hex()}")
+    return batch_ids
+
+_open_proof_batches = weakref.WeakSet()  # Unclosed ProofBatch objects; seal_ledger() leaves their events alone
+_open_proof_batches_lock = threading.Lock()
+
+class ProofBatch:
+    """Collects the ledger events of one run (e.g. aggregate_many) and commits them as proof batches.
+
+    Call add() with the (seq, hash) pairs returned by append_ledger_events()
+    (and the shard they were written to) once their transaction has
+    committed, and close() at the end of the run. Full batches are
+    committed as they fill up; leaves are batched per shard. Until then
+    seal_ledger() stops short of the oldest event held here, and events a
+    seal batched first (e.g. between a commit and add()) are dropped on
+    flush, so no event ends up in two batches.
+    """
+
+    def __init__(self, label, max_leaves=None):
+        self.label = label
+        self.max_leaves = max_leaves or PROOF_BATCH_MAX_LEAVES
+        self.batch_ids = []
+        self._leaves = {}  # shard -> [(seq, hash)]
+        self._lock = threading.RLock()  # Shards are written from parallel workers
+        with _open_proof_batches_lock:
+            _open_proof_batches.add(self)
+
+    def add(self, events, shard=0):
+        with self._lock:
+            leaves = self._leaves.setdefault(shard, [])
+            leaves.extend(events)
+            if len(leaves) >= self.max_leaves:
+                self.flush(full_only=True)
+
+    def oldest_seq(self, shard):
+        """Lowest seq of the events held for `shard`, or None."""
+        with self._lock:
+            return min((seq for seq, _ in self._leaves.get(shard, ())), default=None)
+
+    def flush(self, full_only=False):
+        """Commit the collected leaves (only whole batches if `full_only`). Returns all batch ids so far."""
+        with self._lock:
+            for shard, leaves in self._leaves.items():
+                count = len(leaves) - len(leaves) % self.max_leaves if full_only else len(leaves)
+                if not count:
+                    continue
+                self.batch_ids += retry_locked(self._commit, shard, leaves[:count])
+                del leaves[:count]
+            return self.batch_ids
+
+    def _commit(self, shard, leaves):
+        with db_connection(shard=shard) as conn:
+            c = conn.cursor()
+            begin_write(conn)
+            batched = set()
+            for chunk in _chunks([seq for seq, _ in leaves], 500):
+                c.execute(f"SELECT seq FROM proof_batch_leaves WHERE seq IN ({','.join('?' * len(chunk))})", chunk)
+                batched.update(seq for (seq,) in c.fetchall())
+            leaves = [leaf for leaf in leaves if leaf[0] not in batched]
+            batch_ids = []
+            for start in range(0, len(leaves), self.max_leaves):
+                batch_ids += commit_proof_batches(c, self.label, leaves[start:start + self.max_leaves], shard=shard)
+            conn.commit()
+        return batch_ids
+
+    def close(self):
+        """Commit every remaining leaf and release the events to seal_ledger(). Returns all batch ids."""
+        batch_ids = self.flush()
+        with _open_proof_batches_lock:
+            _open_proof_batches.discard(self)
+        return batch_ids
+
+def _held_by_open_batches(shard):
+    """Lowest seq on `shard` held by an unclosed ProofBatch in this process, or None."""
+    with _open_proof_batches_lock:
+        batches = list(_open_proof_batches)
+    return min((seq for seq in (batch.oldest_seq(shard) for batch in batches) if seq is not None), default=None)
+
+@db_operation
+def seal_ledger(shard=None):
+    """Commit every ledger event not yet in a proof batch (e.g. single writes) as 'seal' batches.
+
+    Returns the new batch ids. Each seal continues from where the previous
+    one stopped, so the ledger is never rescanned from the start. Events
+    from the oldest one held by an open ProofBatch on are left for a later
+    seal. Every shard is sealed (in parallel) unless one is given.
+    """
+    if shard is None:
+        return sorted(batch for batch_ids in map_shards(seal_ledger) for batch in batch_ids)
+    with db_connection(shard=shard) as conn:
+        c = conn.cursor()
+        begin_write(conn)
+        c.execute("SELECT COALESCE(MAX(sealed_through), 0) FROM proof_batches")
+        sealed_through = c.fetchone()[0]
+        c.execute('SELECT COALESCE(MAX(seq), 0) FROM trust_ledger_events')
+        latest = c.fetchone()[0]
+        held = _held_by_open_batches(shard)
+        if held is not None:
+            latest = min(latest, held - 1)
+        c.execute('''
+            SELECT e.seq, e.hash FROM trust_ledger_events e
+            WHERE e.seq > ? AND e.seq <= ?
+              AND NOT EXISTS (SELECT 1 FROM proof_batch_leaves l WHERE l.seq = e.seq)
+            ORDER BY e.seq
+        ''', (sealed_through, latest))
+        writer = conn.cursor()
+        batch_ids = []
+        for chunk in _chunks(c, PROOF_BATCH_MAX_LEAVES):
+            batch_ids += commit_proof_batches(writer, 'seal', chunk, sealed_through=latest, shard=shard)
+        if not batch_ids:
+            conn.rollback()  # Nothing new: no batch, and no empty row to record how far we looked
+            return []
+        conn.commit()
+    logging.info(f"Sealed ledger{f' shard {shard}' if shard_count() > 1 else ''} through seq {latest} "
+                 f"in {len(batch_ids)} proof batches")
+    return batch_ids
+
+_proof_trees = OrderedDict()  # batch_id -> merkle levels
+_proof_trees_lock = threading.Lock()
+
+def _batch_tree(c, batch_id):
+    """Return the Merkle levels of a batch, rebuilt from the ledger and checked against its stored root."""
+    with _proof_trees_lock:
+        levels = _proof_trees.get(batch_id)
+        if levels is not None:
+            _proof_trees.move_to_end(batch_id)
+            return levels
+    c.execute('SELECT root FROM proof_batches WHERE batch_id = ?', (batch_id,))
+    row = c.fetchone()
+    if row is None:
+        raise KeyError(f"Unknown proof batch {batch_id}")
+    c.execute('''
+        SELECT e.hash FROM proof_batch_leaves l JOIN trust_ledger_events e ON e.seq = l.seq
+        WHERE l.batch_id = ? ORDER BY l.leaf_index
+    ''', (batch_id,))
+    levels = merkle_levels([merkle_leaf(entry_hash) for (entry_hash,) in c.fetchall()])
+    if levels[-1][0].hex() != row[0]:
+        raise ValueError(f"Proof batch {batch_id} no longer matches its root; the ledger was modified")
+    with _proof_trees_lock:
+        _proof_trees[batch_id] = levels
+        while len(_proof_trees) > PROOF_TREE_CACHE_SIZE:
+            _proof_trees.popitem(last=False)
+    return levels
+
+@db_operation
+def get_score_proof(did, batch_id=None):
+    """Return an inclusion proof for a DID's latest batched ledger event (optionally in one batch).
+
+    The proof carries the ledger event, its batch root and the O(log n)
+    sibling path; check it offline with verify_score_proof(). Returns None
+    if none of the DID's events has been batched yet.
+    """
+    with db_connection(did=did) as conn:
+        c = conn.cursor()
+        c.execute(f'''
+            SELECT l.batch_id, l.leaf_index, e.seq, e.timestamp, e.event, e.trust_score, e.prev_hash, e.hash
+            FROM trust_ledger_events e JOIN proof_batch_leaves l ON l.seq = e.seq
+            WHERE e.did = ? {'AND l.batch_id = ?' if batch_id is not None else ''}
+            ORDER BY e.seq DESC, l.batch_id DESC LIMIT 1
+        ''', (did,) if batch_id is None else (did, batch_id))
+        row = c.fetchone()
+        if row is None:
+            return None
+        batch_id, leaf_index, seq, timestamp, event, trust_score, prev_hash, entry_hash = row
+        levels = _batch_tree(c, batch_id)
+    return {
+        'batch_id': batch_id,
+        'root': levels[-1][0].hex(),
+        'leaf_index': leaf_index,
+        'leaf_count': len(levels[0]),
+        'event': {'seq': seq, 'did': did, 'timestamp': timestamp, 'event': event,
+                  'trust_score': trust_score, 'prev_hash': prev_hash, 'hash': entry_hash},
+        'path': merkle_path(levels, leaf_index)
+    }
+
+def verify_score_proof(proof, root=None):
+    """Check an inclusion proof offline: the event hashes to its leaf and the path leads to the root.
+
+    Pass the batch root obtained from a trusted source as `root`; otherwise
+    the root inside the proof is used. Needs no database access.
+    """
+    event = proof['event']
+    entry_hash = chain_trust_hash(event['prev_hash'], event['did'], event['trust_score'],
+                                  event['timestamp'], event['event'])
+    if entry_hash != event['hash']:
+        return False
+    expected = root or proof['root']
+    return merkle_root_from_path(merkle_leaf(entry_hash), proof['path']).hex() == expected
+
+@db_operation
+def verify_proof_batches(batch_id=None, shard=None):
+    """Recompute proof batch roots from the ledger (one batch, or all in every shard).
+
+    Returns {'checked': n, 'broken': [batch_id, ...]}.
+    """
+    if batch_id is not None:
+        shard = batch_shard(batch_id)
+    elif shard is None and shard_count() > 1:
+        reports = map_shards(lambda shard: verify_proof_batches(shard=shard))
+        return {'checked': sum(report['checked'] for report in reports),
+                'broken': sorted(batch for report in reports for batch in report['broken'])}
+    report = {'checked': 0, 'broken': []}
+    with db_connection(shard=shard or 0) as conn:
+        c = conn.cursor()
+        if batch_id is None:
+            c.execute('SELECT batch_id FROM proof_batches WHERE leaf_count > 0 ORDER BY batch_id')
+            batch_ids = [row[0] for row in c.fetchall()]
+        else:
+            batch_ids = [batch_id]
+        for batch in batch_ids:
+            with _proof_trees_lock:
+                _proof_trees.pop(batch, None)  # Always rebuild from the ledger
+            try:
+                _batch_tree(c, batch)
+            except ValueError:
+                report['broken'].append(batch)
+            report['checked'] += 1
+    if report['broken']:
+        logging.error(f"Proof batches no longer matching their roots: {report['broken']}")
+    return report
+
+### 🔥 Score Cache: in-process read-through cache of (score, flagged) for the admission path
+# DIDs kept per process; the least recently used are evicted beyond this
+SCORE_CACHE_SIZE = int(os.getenv('SCORE_CACHE_SIZE', '100000'))
+# Seconds an entry is served before it is read again from the database
+SCORE_CACHE_TTL = float(os.getenv('SCORE_CACHE_TTL', '300'))
+# Seconds between polls for writes made by other processes on the same database, 0 = never poll
+SCORE_CACHE_SYNC_INTERVAL = float(os.getenv('SCORE_CACHE_SYNC_INTERVAL', '1'))
+
+SCORE_CACHE_REQUESTS = counter('trust_score_cache_requests_total', "Score cache lookups", ('result',))
+SCORE_CACHE_EVICTIONS = counter('trust_score_cache_evictions_total', "Score cache entries evicted to stay within SCORE_CACHE_SIZE")
+SCORE_CACHE_INVALIDATIONS = counter('trust_score_cache_invalidations_total',
+                                    "Score cache entries dropped or refreshed after a write", ('origin',))
+
+class ScoreCache:
+    """Bounded, thread-safe read-through cache of (score, flagged) per DID.
+
+    Writers in this module invalidate the DIDs they change once their
+    transaction has committed. A miss reserves the DID before reading the
+    database and only stores what it read if nothing invalidated the DID
+    meanwhile, so a slow reader cannot put back a value older than a
+    committed write. DIDs without a score row are cached as None.
+
+    Once `sync_interval` seconds have passed, a lookup hands a sync to a
+    background thread (one at a time) and answers from memory without
+    waiting for it. The sync polls did_scores for rows whose change_seq or
+    flag_seq moved past the previous poll and refreshes the cached ones,
+    which keeps workers in other processes that share the SQLite file
+    consistent within about one interval. Each shard has its own clock, so
+    the poll position is kept per shard.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, sync_interval=None):
+        self.max_entries = SCORE_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl = SCORE_CACHE_TTL if ttl is None else ttl
+        self.sync_interval = SCORE_CACHE_SYNC_INTERVAL if sync_interval is None else sync_interval
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._entries = OrderedDict()  # did -> (expires_at, (score, flagged) or None); expires_at 0 while filling
+        self._sync_seq = {}  # shard -> did_scores_clock value the last sync caught up to
+        self._synced_at = float('-inf')
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.syncs = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Return the cache counters and hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'syncs': self.syncs
+        }
+
+    def get(self, did):
+        """Return (score, flagged) for a DID, or None if it has no score."""
+        if self.sync_interval > 0 and time.monotonic() - self._synced_at >= self.sync_interval:
+            self._sync_in_background()
+        token = object()
+        with self._lock:
+            entry = self._entries.get(did)
+            hit = entry is not None and entry[0] > time.monotonic()
+            if hit:
+                self._entries.move_to_end(did)
+                self.hits += 1
+            else:
+                self._entries[did] = (0.0, token)
+                self._entries.move_to_end(did)
+                self.misses += 1
+                evicted = self._evict()
+        if hit:
+            SCORE_CACHE_REQUESTS.inc(result='hit')
+            return entry[1]
+        SCORE_CACHE_REQUESTS.inc(result='miss')
+        if evicted:
+            SCORE_CACHE_EVICTIONS.inc(evicted)
+
+        try:
+            with db_connection(did=did) as conn:
+                c = conn.cursor()
+                c.execute('SELECT score, flagged FROM did_scores WHERE did = ?', (did,))
+                row = c.fetchone()
+        except BaseException:
+            self._release(did, token)
+            raise
+        status = (row[0], row[1]) if row else None
+        with self._lock:
+            entry = self._entries.get(did)
+            if entry is not None and entry[1] is token:
+                self._entries[did] = (time.monotonic() + self.ttl, status)
+        return status
+
+    def _evict(self):
+        evicted = 0
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            evicted += 1
+        self.evictions += evicted
+        return evicted
+
+    def _release(self, did, token):
+        with self._lock:
+            entry = self._entries.get(did)
+            if entry is not None and entry[1] is token:
+                del self._entries[did]
+
+    def invalidate(self, did=None):
+        """Drop one DID, or every entry when `did` is None."""
+        if did is not None:
+            self.invalidate_many((did,))
+            return
+        with self._lock:
+            self._entries.clear()
+            self._sync_seq = {}
+            self._synced_at = float('-inf')
+
+    def invalidate_many(self, dids, origin='local'):
+        """Drop every DID in `dids` that is cached; returns how many were."""
+        dropped = 0
+        with self._lock:
+            for did in dids:
+                if self._entries.pop(did, None) is not None:
+                    dropped += 1
+            self.invalidations += dropped
+        if dropped:
+            SCORE_CACHE_INVALIDATIONS.inc(dropped, origin=origin)
+        return dropped
+
+    def _sync_in_background(self):
+        if not self._sync_lock.acquire(blocking=False):
+            return  # A sync is already running
+        threading.Thread(target=self._background_sync, name='score-cache-sync', daemon=True).start()
+
+    def _background_sync(self):
+        try:
+            self._sync()
+        except Exception as e:
+            logging.error(f"Score cache sync failed: {e}")
+            self._synced_at = time.monotonic()  # Try again after another interval
+        finally:
+            self._sync_lock.release()
+
+    def sync(self):
+        """Refresh cached DIDs whose score or flag changed since the last sync, in any process.
+
+        The first sync only records the current did_scores_clock of every
+        shard. If more changes than `max_entries` piled up in a shard since
+        the last one, the whole cache is dropped instead. Returns the number
+        of entries refreshed (0 if another thread is syncing).
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            return 0  # Another thread is already syncing
+        try:
+            return self._sync()
+        finally:
+            self._sync_lock.release()
+
+    def _sync(self):
+        clocks, rows, reset = {}, [], False
+        with timed(DB_OPERATION_SECONDS, operation='score_cache_sync'):
+            for shard in range(shard_count()):
+                with db_connection(shard=shard) as conn:
+                    c = conn.cursor()
+                    c.execute('SELECT change_seq FROM did_scores_clock WHERE id = 1')
+                    clock = clocks[shard] = c.fetchone()[0]
+                    since = self._sync_seq.get(shard)
+                    if since is not None and (clock < since or clock - since > self.max_entries):
+                        reset = True  # Another database, or too far behind to be worth replaying
+                    elif since is not None and clock > since and not reset:
+                        c.execute('''
+                            SELECT did, score, flagged FROM did_scores WHERE change_seq > ?
+                            UNION
+                            SELECT did, score, flagged FROM did_scores WHERE flag_seq > ?
+                        ''', (since, since))
+                        rows += c.fetchall()
+        if reset:
+            self.invalidate()
+            SCORE_CACHE_INVALIDATIONS.inc(origin='reset')
+            rows = []
+
+        refreshed = 0
+        with self._lock:
+            expires_at = time.monotonic() + self.ttl
+            for did, score, flagged in rows:
+                if did in self._entries:
+                    self._entries[did] = (expires_at, (score, flagged))
+                    refreshed += 1
+            self.invalidations += refreshed
+            self._sync_seq = clocks
+            self._synced_at = time.monotonic()
+            self.syncs += 1
+        if refreshed:
+            SCORE_CACHE_INVALIDATIONS.inc(refreshed, origin='sync')
+        return refreshed
+
+score_cache = ScoreCache()
+
+def get_trust_status(did):
+    """Return (score, flagged) for a DID from the score cache, or None if it has no score."""
+    return score_cache.get(did)
+
 # Function to retrieve trust scores securely
+@db_operation
 def get_trust_score(did):
-    """Retrieve the trust score of a DID."""
-    c.execute('SELECT score FROM did_scores WHERE did = ?', (did,))
-    result = c.fetchone()
-    return result[0] if result else None
+    """Retrieve the trust score of a DID (read through the score cache)."""
+    status = score_cache.get(did)
+    return status[0] if status else None
+
+### 🔥 Restriction Gate: in-memory admission check for flagged DIDs
+# Seconds between auto_sync_restriction_gate() polls for flag changes made by other processes
+RESTRICTION_GATE_SYNC_INTERVAL = float(os.getenv('RESTRICTION_GATE_SYNC_INTERVAL', '1'))
+
+RESTRICTION_GATE_UPDATES = counter('trust_restriction_gate_updates_total',
+                                   "DIDs added to or removed from the restriction gate", ('origin',))
+
+restriction_gate = RestrictionGate()
+_restriction_gate_lock = threading.Lock()  # Serializes loads and syncs
+_restriction_gate_seq = {}  # shard -> did_scores_clock value the gate has caught up to
+
+def is_restricted(did):
+    """Return True if a DID is flagged, from memory.
+
+    Only the first call in a process reads the database (to load the
+    gate); after that flag_did/unflag_did and enforcement keep it current,
+    and auto_sync_restriction_gate() picks up other processes' changes.
+    """
+    if not restriction_gate.loaded:
+        load_restriction_gate()
+    return restriction_gate.is_restricted(did)
+
+@db_operation
+def load_restriction_gate():
+    """Rebuild restriction_gate from the flagged DIDs in did_scores; returns how many are restricted."""
+    global _restriction_gate_seq
+    with _restriction_gate_lock:
+        clocks, restricted = {}, []
+        for shard in range(shard_count()):
+            with db_connection(shard=shard) as conn:
+                c = conn.cursor()
+                # Read the clock first: flags changed while loading carry a later flag_seq and are synced next
+                c.execute('SELECT change_seq FROM did_scores_clock WHERE id = 1')
+                clocks[shard] = c.fetchone()[0]
+                c.execute('SELECT did FROM did_scores WHERE flagged = 1')
+                restricted += [did for did, in c]
+        restriction_gate.replace(restricted)
+        _restriction_gate_seq = clocks
+    RESTRICTION_GATE_UPDATES.inc(len(restriction_gate), origin='load')
+    return len(restriction_gate)
+
+@db_operation
+def sync_restriction_gate():
+    """Apply flag changes committed since the last load or sync, by any process.
+
+    Loads the gate if it was never loaded or the clock went backwards
+    (another database). Returns the number of DIDs whose restriction changed.
+    """
+    global _restriction_gate_seq
+    if not restriction_gate.loaded:
+        load_restriction_gate()
+        return 0
+    with _restriction_gate_lock:
+        clocks, rows = {}, []
+        with timed(DB_OPERATION_SECONDS, operation='restriction_gate_sync'):
+            for shard in range(shard_count()):
+                with db_connection(shard=shard) as conn:
+                    c = conn.cursor()
+                    c.execute('SELECT change_seq FROM did_scores_clock WHERE id = 1')
+                    clock = clocks[shard] = c.fetchone()[0]
+                    since = _restriction_gate_seq.get(shard)
+                    if since is None or clock < since:
+                        rows = None
+                        break
+                    c.execute('SELECT did, flagged FROM did_scores WHERE flag_seq > ?', (since,))
+                    rows += c.fetchall()
+        if rows is not None:
+            changed = restriction_gate.apply((did, flagged == 1) for did, flagged in rows)
+            _restriction_gate_seq = clocks
+    if rows is None:
+        load_restriction_gate()  # Another database behind the same path
+        return 0
+    if changed:
+        RESTRICTION_GATE_UPDATES.inc(changed, origin='sync')
+    return changed
+
+async def auto_sync_restriction_gate(interval=None):
+    """Keep restriction_gate in step with flag changes made by other processes."""
+    interval = interval if interval is not None else RESTRICTION_GATE_SYNC_INTERVAL
+    while True:
+        await run_db(sync_restriction_gate)
+        await asyncio.sleep(interval)
+
+def _flags_committed(dids, flagged):
+    """Propagate committed flag changes to the score cache and the restriction gate."""
+    dids = list(dids)
+    score_cache.invalidate_many(dids)
+    if restriction_gate.loaded:
+        changed = restriction_gate.apply((did, flagged) for did in dids)
+        if changed:
+            RESTRICTION_GATE_UPDATES.inc(changed, origin='local')
+
+### 🔥 Social Trust Graph: endorsements propagated EigenTrust-style, read by fetch_social_signals
+SOCIAL_GRAPH_CONFIG = {
+    'teleport': float(os.getenv('SOCIAL_TELEPORT', '0.15')),
+    'refresh_interval': float(os.getenv('SOCIAL_REFRESH_INTERVAL', '300')),
+    'min_delta': float(os.getenv('SOCIAL_MIN_DELTA', '0.01')),  # Score change that expires a cached social component
+    'pretrusted': [did for did in os.getenv('SOCIAL_PRETRUSTED_DIDS', '').split(',') if did]
+}
+
+SOCIAL_PROPAGATION_SECONDS = histogram('trust_social_propagation_seconds', "Social trust propagation time",
+                                       ('outcome',), buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+
+def new_social_graph():
+    """Return an empty SocialTrustGraph configured from SOCIAL_GRAPH_CONFIG."""
+    graph = SocialTrustGraph(teleport=SOCIAL_GRAPH_CONFIG['teleport'])
+    graph.set_pretrusted(SOCIAL_GRAPH_CONFIG['pretrusted'])
+    return graph
+
+social_graph = new_social_graph()
+
+@db_operation
+def record_endorsements(rows):
+    """Store (src, dst, weight) endorsements and queue them for the social graph; weight 0 removes one.
+
+    Scores reflect the change after the next refresh_social_trust().
+    Self-endorsements are ignored. Returns the number of rows recorded.
+    """
+    rows = [(src, dst, float(weight)) for src, dst, weight in rows if src != dst]
+    for src, dst, weight in rows:
+        if not math.isfinite(weight) or weight < 0:
+            raise ValueError(f"Endorsement weight of {src} -> {dst} must be a finite number >= 0, got {weight!r}")
+    timestamp = utc_timestamp()
+    for shard, shard_rows in group_by_shard(rows, key=lambda row: row[0]).items():  # Edges live with their src
+        with db_connection(shard=shard) as conn:
+            c = conn.cursor()
+            begin_write(conn)
+            try:
+                c.executemany('DELETE FROM social_edges WHERE src = ? AND dst = ?',
+                              [(src, dst) for src, dst, weight in shard_rows if weight == 0])
+                c.executemany('''
+                    INSERT INTO social_edges (src, dst, weight, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(src, dst) DO UPDATE SET weight = excluded.weight, updated_at = excluded.updated_at
+                ''', [(src, dst, weight, timestamp) for src, dst, weight in shard_rows if weight > 0])
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logging.error(f"Error recording {len(shard_rows)} endorsements: {e}")
+                raise
+    social_graph.update_edges(rows)
+    return len(rows)
+
+@db_operation
+def load_social_graph(chunk_size=100000):
+    """Rebuild social_graph from social_edges and propagate it from scratch, e.g. at startup."""
+    global social_graph
+    graph = new_social_graph()
+    for shard in range(shard_count()):
+        with db_connection(shard=shard) as conn:
+            c = conn.cursor()
+            c.execute('SELECT src, dst, weight FROM social_edges')
+            while True:
+                rows = c.fetchmany(chunk_size)
+                if not rows:
+                    break
+                graph.update_edges(rows)
+                graph.csr()  # Merge each chunk so the pending buffer stays small
+    social_graph = graph
+    return refresh_social_trust(warm=False)
+
+@db_operation
+def invalidate_trust_components(dids, source):
+    """Expire one source's cached component for many DIDs. Returns the number expired."""
+    expired = 0
+    for shard, shard_dids in group_by_shard(dids).items():
+        with db_connection(shard=shard) as conn:
+            c = conn.cursor()
+            for chunk in _chunks(shard_dids, 500):
+                c.execute(f'''
+                    UPDATE trust_components SET expires_at = 0
+                    WHERE source = ? AND expires_at > 0 AND did IN ({','.join('?' * len(chunk))})
+                ''', (source, *chunk))
+                expired += c.rowcount
+            conn.commit()
+    return expired
+
+def refresh_social_trust(warm=True):
+    """Propagate queued endorsement changes, warm-starting from the previous trust vector.
+
+    Cached 'social' components of DIDs whose score moved by at least
+    SOCIAL_GRAPH_CONFIG['min_delta'] are expired so the rescoring scheduler
+    picks them up; after a cold start every cached social component is.
+    Returns the propagation summary plus the number of components expired.
+    """
+    with timed(SOCIAL_PROPAGATION_SECONDS):
+        summary = social_graph.propagate(warm)
+    if summary['warm']:
+        summary['expired'] = invalidate_trust_components(social_graph.changed_dids(SOCIAL_GRAPH_CONFIG['min_delta']),
+                                                         'social')
+    else:
+        summary['expired'] = invalidate_trust_source('social')
+    if not summary['converged']:
+        logging.warning(f"Social trust did not converge: {summary}")
+    logging.info(f"Social trust propagated: {summary}")
+    return summary
+
+async def auto_refresh_social_trust(interval=None):
+    """Propagate endorsement changes into social trust periodically."""
+    interval = interval if interval is not None else SOCIAL_GRAPH_CONFIG['refresh_interval']
+    while True:
+        await run_db(refresh_social_trust)
+        await asyncio.sleep(interval)
 
 # Placeholder functions for fetching verification data, to be implemented based on actual API/endpoints
 async def fetch_onchain_proofs(did):
@@ -150,76 +2001,640 @@ async def fetch_onchain_proofs(did):
         logging.error(f"Error fetching on-chain data for {did}: {e}")
         return {'score': 0.0}
 
+### 🔥 Federated Node Consensus: quorum fan-out with hedged requests
+FEDERATION_CONFIG = {
+    'nodes': [url for url in os.getenv('FEDERATED_NODES', '').split(',') if url],  # Node base URLs
+    'quorum': int(os.getenv('FEDERATED_QUORUM', '2')),  # Agreeing responses needed
+    'fanout': int(os.getenv('FEDERATED_FANOUT', '0')) or None,  # Nodes asked up front (default: quorum)
+    'aggregate': os.getenv('FEDERATED_AGGREGATE', 'median'),  # or 'trimmed_mean'
+    'agreement': float(os.getenv('FEDERATED_AGREEMENT', '0.1')),  # Max distance between agreeing scores
+    'hedge_percentile': float(os.getenv('FEDERATED_HEDGE_PERCENTILE', '0.95')),
+    'node_timeout': float(os.getenv('FEDERATED_NODE_TIMEOUT', '1.5'))  # Keep below FEDERATED_DEADLINE
+}
+
+def new_federated_client():
+    """Return a FederatedQuorumClient for FEDERATION_CONFIG, or None when no nodes are configured."""
+    config = dict(FEDERATION_CONFIG)
+    nodes = config.pop('nodes')
+    if not nodes:
+        return None
+    config['quorum'] = min(config['quorum'], len(nodes))
+    return FederatedQuorumClient(nodes, **config)
+
+federated_client = new_federated_client()
+
 async def fetch_federated_nodes(did):
-    """Fetch trust score from federated nodes."""
+    """Fetch a DID's trust score from a quorum of federated nodes; no score without nodes, quorum or on errors."""
     try:
-        # TODO: Implement federated node query
-        return {'score': 0.7}
+        if federated_client is None:
+            return {'score': None}
+        result = await federated_client.query(did)
+        return {'score': result['score']}
+    except QuorumError as e:
+        logging.warning(f"No federated quorum for {did}: {e}")
+        return {'score': None}
     except Exception as e:
         logging.error(f"Error fetching federated data for {did}: {e}")
-        return {'score': 0.0}
+        return {'score': None}
+
+### 🔥 Usage Patterns: streaming per-DID features read by fetch_usage_patterns
+USAGE_STREAM_CONFIG = {
+    'short_half_life': float(os.getenv('USAGE_SHORT_HALF_LIFE', '3600')),
+    'long_half_life': float(os.getenv('USAGE_LONG_HALF_LIFE', str(7 * 86400))),
+    'distinct_window': float(os.getenv('USAGE_DISTINCT_WINDOW', str(7 * 86400))),
+    'max_profiles': int(os.getenv('USAGE_MAX_PROFILES', '1000000')),  # DIDs tracked in memory
+    'failure_actions': [action for action in os.getenv('USAGE_FAILURE_ACTIONS', 'error,failed,rejected,denied').split(',')
+                        if action]
+}
+
+USAGE_EVENTS = counter('trust_usage_events_total', "Usage events ingested by source", ('source',))
+
+def new_usage_aggregator():
+    """Return an empty UsageAggregator configured from USAGE_STREAM_CONFIG."""
+    return UsageAggregator(**USAGE_STREAM_CONFIG)
+
+usage_aggregator = new_usage_aggregator()
+
+async def consume_usage_events(source, batch_size=1000):
+    """Ingest usage events from a JSON-lines file path or an async iterator of
+    (did, action, counterparty, timestamp) tuples. Returns the number ingested.
+
+    Cached 'usage' components are not expired here; they pick up the new
+    features when their USAGE_TTL runs out.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        count = await asyncio.to_thread(usage_aggregator.ingest_file, source)
+        USAGE_EVENTS.inc(count, source='file')
+    else:
+        count = await usage_aggregator.ingest_stream(source, batch_size)
+        USAGE_EVENTS.inc(count, source='stream')
+    logging.info(f"Ingested {count} usage events: {usage_aggregator.stats()}")
+    return count
 
 async def fetch_usage_patterns(did):
-    """Fetch historical usage data for DID."""
+    """Score a DID from its streamed usage features; no score without usage history.
+
+    Scoring takes the aggregator lock that ingestion holds, so it runs in
+    a worker thread, not on the event loop.
+    """
     try:
-        # TODO: Implement logic to fetch usage data
-        return {'score': 0.6}
+        return {'score': await asyncio.to_thread(usage_aggregator.score, did)}
     except Exception as e:
         logging.error(f"Error fetching usage pattern data for {did}: {e}")
-        return {'score': 0.0}
+        return {'score': None}
 
 async def fetch_social_signals(did):
-    """Fetch social verification signals for DID."""
+    """Look up a DID's propagated social trust; no score before propagation or for unendorsed DIDs."""
     try:
-        # TODO: Implement API call to social verification sources
-        return {'score': 0.5}
+        return {'score': social_graph.score(did)}
     except Exception as e:
         logging.error(f"Error fetching social verification data for {did}: {e}")
-        return {'score': 0.0}
+        return {'score': None}
+
+# Weight of each trust source in the aggregate score (sum should be 1)
+TRUST_WEIGHTS = {
+    'onchain': 0.3,
+    'federated': 0.2,
+    'usage': 0.15,
+    'social': 0.35
+}
+
+# Per-DID-method weight overrides, e.g. TRUST_WEIGHT_PROFILES='{"agent": {"usage": 0.5, "social": 0.5}}'
+TRUST_WEIGHT_PROFILES = json.loads(os.getenv('TRUST_WEIGHT_PROFILES', '{}'))
+
+# Validates the weights at import; backs both the single-DID and the batch scoring paths
+scoring_engine = ScoringEngine(TRUST_WEIGHTS, TRUST_WEIGHT_PROFILES)
+
+# How long aggregate_trust_score waits for each source, in seconds
+TRUST_SOURCE_DEADLINES = {
+    'onchain': float(os.getenv('ONCHAIN_DEADLINE', '2.0')),
+    'federated': float(os.getenv('FEDERATED_DEADLINE', '2.0')),
+    'usage': float(os.getenv('USAGE_DEADLINE', '1.0')),
+    'social': float(os.getenv('SOCIAL_DEADLINE', '1.0'))
+}
+
+# How long a fetched component score is reused before its source is queried again, in seconds
+TRUST_SOURCE_TTLS = {
+    'onchain': float(os.getenv('ONCHAIN_TTL', '600')),
+    'federated': float(os.getenv('FEDERATED_TTL', '900')),
+    'usage': float(os.getenv('USAGE_TTL', '300')),
+    'social': float(os.getenv('SOCIAL_TTL', '86400'))
+}
+
+def trust_sources():
+    """Map each trust source name to its fetch coroutine function."""
+    return {
+        'onchain': fetch_onchain_proofs,
+        'federated': fetch_federated_nodes,
+        'usage': fetch_usage_patterns,
+        'social': fetch_social_signals
+    }
+
+async def _fetch_source(name, fetch, did, deadline, limiter=None):
+    """Fetch one source, returning (status, data) where status is 'ok', 'late' or 'missing'.
+
+    With a `limiter` (see RateLimiter), waits for it before the deadline starts.
+    """
+    if limiter is not None:
+        await limiter.acquire()
+    start = time.perf_counter()
+    try:
+        data = await asyncio.wait_for(fetch(did), timeout=deadline)
+    except asyncio.TimeoutError:
+        logging.warning(f"Trust source '{name}' missed its {deadline}s deadline for {did}")
+        status, data = 'late', None
+    except Exception as e:
+        logging.error(f"Trust source '{name}' failed for {did}: {e}")
+        status, data = 'missing', None
+    else:
+        status = 'missing' if not data or data.get('score') is None else 'ok'
+    SOURCE_FETCH_SECONDS.observe(time.perf_counter() - start, source=name, outcome=status)
+    return status, data if status == 'ok' else None
+
+async def fetch_trust_components(did, deadlines=None, names=None, limiters=None):
+    """Fetch trust sources concurrently (all, or only `names`), each bounded by its own deadline.
+
+    `limiters` optionally maps source names to rate limiters.
+
+    Returns a dict with the normalized 'components' that arrived in time and
+    the names of the sources that were 'late' or 'missing'.
+    """
+    deadlines = {**TRUST_SOURCE_DEADLINES, **(deadlines or {})}
+    sources = trust_sources()
+    names = list(sources) if names is None else list(names)
+    results = await asyncio.gather(*(
+        _fetch_source(name, sources[name], did, deadlines.get(name), (limiters or {}).get(name))
+        for name in names
+    ))
+
+    report = {'components': {}, 'late': [], 'missing': []}
+    for name, (status, data) in zip(names, results):
+        if status == 'ok':
+            # Normalize all scores to 0-1 range
+            report['components'][name] = min(data['score'], 1.0)
+        else:
+            report[status].append(name)
+    return report
+
+### 🔥 Component Cache: refetch only expired or invalidated sources
+@db_operation
+def load_trust_components(did):
+    """Return a DID's cached components as {source: (score, expires_at)}."""
+    with db_connection(did=did) as conn:
+        c = conn.cursor()
+        c.execute('SELECT source, score, expires_at FROM trust_components WHERE did = ?', (did,))
+        return {source: (score, expires_at) for source, score, expires_at in c.fetchall()}
+
+@db_operation
+def store_trust_components(rows):
+    """Cache (did, source, score, fetched_at) rows; each expires after its source's TTL."""
+    rows = [(did, source, score, fetched_at, fetched_at + TRUST_SOURCE_TTLS.get(source, 0))
+            for did, source, score, fetched_at in rows]
+    for shard, shard_rows in group_by_shard(rows, key=lambda row: row[0]).items():
+        with db_connection(shard=shard) as conn:
+            begin_write(conn)
+            conn.cursor().executemany('''
+                INSERT INTO trust_components (did, source, score, fetched_at, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(did, source) DO UPDATE SET
+                    score = excluded.score, fetched_at = excluded.fetched_at, expires_at = excluded.expires_at
+            ''', shard_rows)
+            conn.commit()
+
+@db_operation
+def invalidate_trust_component(did, source=None):
+    """Expire one cached component of a DID (or all of them when `source` is None).
+
+    Call it when an upstream event makes a component stale, e.g. a new
+    on-chain transaction: the next aggregation refetches only that source.
+    Returns the number of components expired.
+    """
+    with db_connection(did=did) as conn:
+        c = conn.cursor()
+        if source is None:
+            c.execute('UPDATE trust_components SET expires_at = 0 WHERE did = ?', (did,))
+        else:
+            c.execute('UPDATE trust_components SET expires_at = 0 WHERE did = ? AND source = ?', (did, source))
+        conn.commit()
+        return c.rowcount
+
+@db_operation
+def invalidate_trust_source(source):
+    """Expire a source's cached component for every DID (in every shard). Returns the number expired."""
+    def expire(shard):
+        with db_connection(shard=shard) as conn:
+            c = conn.cursor()
+            c.execute('UPDATE trust_components SET expires_at = 0 WHERE source = ? AND expires_at > 0', (source,))
+            conn.commit()
+            return c.rowcount
+    return sum(map_shards(expire))
+
+async def fetch_cached_components(did, deadlines=None, refresh=False, store=True, limiters=None):
+    """Like fetch_trust_components(), but sources with an unexpired cached component are not queried.
+
+    The report also lists the 'cached' sources it reused. Freshly fetched
+    components are written to the cache, or, with store=False, left in
+    report['fetched'] as (did, source, score, fetched_at) rows for the
+    caller to pass to store_trust_components(). `refresh` ignores the cache.
+    """
+    cached = {} if refresh else await run_db(load_trust_components, did)
+    now = time.time()
+    fresh = {name: score for name, (score, expires_at) in cached.items() if expires_at > now}
+    names = list(trust_sources())
+    expired = [name for name in names if name not in fresh]
+    report = await fetch_trust_components(did, deadlines, expired, limiters) if expired else {
+        'components': {}, 'late': [], 'missing': []}
+
+    fetched = [(did, name, score, now) for name, score in report['components'].items()]
+    report['components'] = {name: fresh.get(name, report['components'].get(name))
+                            for name in names if name in fresh or name in report['components']}
+    report['cached'] = [name for name in names if name in fresh]
+    if store:
+        await run_db(store_trust_components, fetched)
+    else:
+        report['fetched'] = fetched
+    return report
+
+def cached_trust_components(chunk_size=1000):
+    """Yield (did, {source: score}) for every DID with cached components, shard by shard in DID order.
+
+    Expired components are included: this is the last known value of each
+    source. Reads in keyset-paginated chunks.
+    """
+    for shard in range(shard_count()):
+        last = ''
+        while True:
+            with db_connection(shard=shard) as conn:
+                c = conn.cursor()
+                c.execute('''
+                    SELECT did, source, score FROM trust_components
+                    WHERE did IN (SELECT DISTINCT did FROM trust_components WHERE did > ? ORDER BY did LIMIT ?)
+                    ORDER BY did
+                ''', (last, chunk_size))
+                rows = c.fetchall()
+            if not rows:
+                break
+            components = {}
+            for did, source, score in rows:
+                components.setdefault(did, {})[source] = score
+            yield from components.items()
+            last = rows[-1][0]
+
+def rescore_cached_components(chunk_size=1000):
+    """Recompute and store every DID's score from its cached components, without fetching."""
+    return rescore_components(cached_trust_components(chunk_size), chunk_size)
+
+def weighted_trust_score(components, weights=None, method=None):
+    """Combine component scores; weights are renormalized over the sources present.
+
+    Uses scoring_engine and the weight profile for `method` (a DID method),
+    unless explicit `weights` are given.
+    """
+    if not components:
+        return None
+    engine = scoring_engine if not weights else ScoringEngine(weights)
+    return engine.score(components, method)
+
+def _finish_report(report, did, score):
+    report['did'] = did
+    report['score'] = score
+    report['partial'] = bool(report['late'] or report['missing'])
+    return report
+
+async def score_trust_report(did, deadlines=None):
+    """Compute a DID's trust report without storing it."""
+    report = await fetch_trust_components(did, deadlines)
+    return _finish_report(report, did, weighted_trust_score(report['components'], method=did_method(did)))
+
+def rescore_components(rows, chunk_size=1000):
+    """Rescore DIDs from already-fetched components and store the new scores.
+
+    `rows` is an iterable of (did, {source: score}) pairs. Each chunk is
+    scored in one scoring_engine pass and written with insert_trust_scores();
+    DIDs without components are skipped. The run's ledger events are
+    committed as 'rescore' proof batches. Returns the number of scores written.
+    """
+    written = 0
+    proofs = ProofBatch('rescore')
+    for chunk in _chunks(rows, chunk_size):
+        scored = [(did, score) for did, score in scoring_engine.score_many(chunk) if score is not None]
+        written += insert_trust_scores(scored, chunk_size, proofs)
+    proofs.close()
+    return written
+
+def _store_trust_report(did, score, fetched):
+    store_trust_components(fetched)
+    insert_trust_score(did, score)
+
+async def aggregate_trust_report(did, deadlines=None, refresh=False, limiters=None):
+    """Aggregate a trust score for a DID and report which sources contributed.
+
+    Only sources without an unexpired cached component are queried (all of
+    them with `refresh`); see fetch_cached_components(). Sources that miss
+    their deadline or fail are left out and the remaining weights are
+    renormalized, so the result is marked 'partial'. Nothing is stored when
+    no source answered.
+    """
+    # Make sure database is initialized first
+    await run_db(ensure_db)
+
+    report = await fetch_cached_components(did, deadlines, refresh, store=False, limiters=limiters)
+    fetched = report.pop('fetched')
+    _finish_report(report, did, weighted_trust_score(report['components'], method=did_method(did)))
+    if report['score'] is None:
+        logging.error(f"No trust sources answered for {did}; score not updated")
+    else:
+        await run_db(_store_trust_report, did, report['score'], fetched)
+    return report
 
 # Function to aggregate trust scores from all sources
-async def aggregate_trust_score(did):
+async def aggregate_trust_score(did, deadlines=None, refresh=False):
     """Aggregate and compute a trust score for a DID."""
-    # Make sure database is initialized first
-    init_db()
-    
-    onchain_data = await fetch_onchain_proofs(did)
-    federated_data = await fetch_federated_nodes(did)
-    usage_data = await fetch_usage_patterns(did)
-    social_data = await fetch_social_signals(did)
-
-    # Normalize all scores to 0-1 range
-    onchain_score = min(onchain_data['score'], 1.0)
-    federated_score = min(federated_data['score'], 1.0)
-    usage_score = min(usage_data['score'], 1.0)
-    social_score = min(social_data['score'], 1.0)
-
-    # Define weights for each source (sum should be 1)
-    weights = {
-        'onchain': 0.3,
-        'federated': 0.2,
-        'usage': 0.15,
-        'social': 0.35
+    report = await aggregate_trust_report(did, deadlines, refresh)
+    return report['score']
+
+async def aggregate_many(dids, concurrency=32, deadlines=None, chunk_size=500, refresh=False):
+    """Score many DIDs with at most `concurrency` in flight, yielding reports as they are stored.
+
+    `dids` may be any iterable and is consumed lazily. Scores are written
+    through insert_trust_scores() in chunks of `chunk_size`, and each report
+    is yielded once its chunk has been committed. Each chunk is scored in
+    one scoring_engine pass. Cached components are reused as in
+    aggregate_trust_report(). When the run completes, its ledger events are
+    committed as 'aggregate_many' proof batches.
+    """
+    await run_db(ensure_db)
+    proofs = ProofBatch('aggregate_many')
+    pending = set()
+    remaining = iter(dids)
+    scored = []
+
+    async def fetch(did):
+        return did, await fetch_cached_components(did, deadlines, refresh, store=False)
+
+    def refill():
+        for did in remaining:
+            pending.add(asyncio.ensure_future(fetch(did)))
+            if len(pending) >= concurrency:
+                break
+
+    async def flush():
+        scores = scoring_engine.score_many((did, report['components']) for did, report in scored)
+        done = [_finish_report(report, did, score) for (did, report), (_, score) in zip(scored, scores)]
+        scored.clear()
+        for report in done:
+            if report['score'] is None:
+                logging.error(f"No trust sources answered for {report['did']}; score not updated")
+        fetched = [row for report in done for row in report.pop('fetched')]
+        await run_db(store_trust_components, fetched)
+        rows = [(report['did'], report['score']) for report in done if report['score'] is not None]
+        await run_db(insert_trust_scores, rows, chunk_size, proofs)
+        return done
+
+    refill()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending.difference_update(done)
+            for task in done:
+                scored.append(task.result())
+            refill()
+            if len(scored) >= chunk_size or not pending:
+                for report in await flush():
+                    yield report
+        await run_db(proofs.close)
+    finally:
+        for task in pending:
+            task.cancel()
+
+### 🔥 Rescoring Scheduler: continuous, staleness-ordered refresh of the DID population
+# One config for the scheduler; every value can be overridden per RescoreScheduler
+RESCORE_CONFIG = {
+    'concurrency': int(os.getenv('RESCORE_CONCURRENCY', '32')),  # DIDs rescored at once per process
+    'queue_size': int(os.getenv('RESCORE_QUEUE_SIZE', '10000')),  # Due DIDs held in memory; the poller waits when full
+    'poll_interval': float(os.getenv('RESCORE_POLL_INTERVAL', '30')),  # Seconds between polls when nothing is due
+    'retry_after': float(os.getenv('RESCORE_RETRY_AFTER', '300')),  # Seconds before a DID whose sources failed is retried
+    'near_threshold': float(os.getenv('RESCORE_NEAR_THRESHOLD', '0.05')),  # Score distance to a policy threshold that counts as at risk
+    'shards': int(os.getenv('RESCORE_SHARDS', '1')),  # Worker processes splitting the DID space by hash
+    'rate_limits': {  # Requests per second per trust source, 0 for unlimited
+        'onchain': float(os.getenv('ONCHAIN_RATE_LIMIT', '0')),
+        'federated': float(os.getenv('FEDERATED_RATE_LIMIT', '0')),
+        'usage': float(os.getenv('USAGE_RATE_LIMIT', '0')),
+        'social': float(os.getenv('SOCIAL_RATE_LIMIT', '0'))
     }
+}
 
-    # Calculate weighted trust score
-    trust_score = (weights['onchain'] * onchain_score +
-                   weights['federated'] * federated_score +
-                   weights['usage'] * usage_score +
-                   weights['social'] * social_score)
-
-    insert_trust_score(did, trust_score)
-    return trust_score
-
-# Periodic Task for Data Aggregation, disabled during manual testing
-# async def update_trust_scores():
-#     while True:
-#         # TODO: Fetch all active DIDs from database
-#         did_list = ["did:ethr:123456789abcdef"]  # Placeholder for now
-#         for did in did_list:
-#             await aggregate_trust_score(did)
-#             logging.info(f"Updated trust score for {did}")
-#         await asyncio.sleep(7 * 24 * 60 * 60)  # Runs every 7 days
+RESCORED = counter('trust_rescored_total', "DIDs rescored by the scheduler", ('outcome',))
+
+class RateLimiter:
+    """Async token bucket: at most `rate` acquisitions per second, in bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class RescoreScheduler:
+    """Rescore DIDs as their cached components expire, most at-risk and most stale first.
+
+    A poller reads due DIDs (at-risk DIDs, then the most stale expired
+    components, then DIDs never aggregated) into a bounded priority queue,
+    ordered by risk tier, then by how long ago their first component
+    expired. Flagged DIDs and DIDs
+    within `near_threshold` of a policy threshold are in the first tier. A
+    pool of `concurrency` workers drains the queue through
+    aggregate_trust_report(), which refetches only the expired sources
+    under per-source rate limits. With `shards` > 1, this instance only
+    handles DIDs whose did_shard() equals `shard`; when that matches the
+    storage sharding (SQLITE_SHARDS), it only reads its own shard file.
+    """
+
+    def __init__(self, config=None, shard=0, shards=None):
+        self.config = {**RESCORE_CONFIG, **(config or {})}
+        self.shards = shards or self.config['shards']
+        self.shard = shard
+        self.limiters = {name: RateLimiter(rate) for name, rate in self.config['rate_limits'].items() if rate > 0}
+        self._queued = set()
+        self._retry_at = {}  # did -> monotonic time before which a failed DID is not queued again
+        self._unscored_cursor = {}  # storage shard -> last DID of the previous unscored page
+        self._active = 0
+        self.enqueued = 0
+        self.rescored = 0
+        self.failed = 0
+
+    def stats(self):
+        return {
+            'shard': self.shard,
+            'shards': self.shards,
+            'queued': len(self._queued),
+            'active': self._active,
+            'enqueued': self.enqueued,
+            'rescored': self.rescored,
+            'failed': self.failed
+        }
+
+    def owns(self, did):
+        return self.shards <= 1 or did_shard(did, self.shards) == self.shard
+
+    def risk_tier(self, score, flagged, thresholds):
+        """0 for flagged or near-threshold DIDs, 1 otherwise."""
+        if flagged:
+            return 0
+        if score is not None and thresholds:
+            i = bisect.bisect_left(thresholds, score)
+            nearest = min(abs(score - thresholds[j]) for j in (i - 1, i) if 0 <= j < len(thresholds))
+            if nearest <= self.config['near_threshold']:
+                return 0
+        return 1
+
+    def storage_shards(self):
+        """Storage shards that can hold DIDs owned by this instance."""
+        shards = shard_count()
+        return [self.shard] if shards > 1 and shards == self.shards else range(shards)
+
+    def due_candidates(self, limit, now=None):
+        """Return up to `limit` due (tier, due_at, did) entries owned by this shard."""
+        now = now or time.time()
+        thresholds = policy_index.snapshot()[0]
+        entries = []
+        for shard in self.storage_shards():
+            entries += self._due_in_shard(shard, limit, now, thresholds)
+        entries.sort()
+        return entries[:limit]
+
+    def _due_in_shard(self, shard, limit, now, thresholds):
+        aligned = shard_count() == self.shards
+        scan = limit if aligned else limit * self.shards  # Other shards' DIDs are filtered out below
+        margin = self.config['near_threshold']
+        due = {}
+        with db_connection(shard=shard) as conn:
+            c = conn.cursor()
+            # At-risk DIDs first, so they are queued even when many others are more stale
+            at_risk = ' UNION '.join(['SELECT did FROM did_scores WHERE flagged = 1']
+                                     + ['SELECT did FROM did_scores WHERE score BETWEEN ? AND ?'] * len(thresholds))
+            c.execute(f'''
+                SELECT s.did, (SELECT MIN(tc.expires_at) FROM trust_components tc WHERE tc.did = s.did) AS due_at
+                FROM did_scores s
+                WHERE s.did IN ({at_risk}) AND (due_at IS NULL OR due_at <= ?)
+                LIMIT ?
+            ''', (*[bound for t in thresholds for bound in (t - margin, t + margin)], now, scan))
+            due.update((did, due_at or 0.0) for did, due_at in c.fetchall())
+            for source in trust_sources():
+                c.execute('''
+                    SELECT did, expires_at FROM trust_components
+                    WHERE source = ? AND expires_at <= ? ORDER BY expires_at LIMIT ?
+                ''', (source, now, scan))
+                for did, expires_at in c.fetchall():
+                    if did not in due or expires_at < due[did]:
+                        due[did] = expires_at
+            # DIDs with a score but no cached components were never aggregated: most stale of all
+            c.execute('''
+                SELECT s.did FROM did_scores s
+                WHERE s.did > ? AND NOT EXISTS (SELECT 1 FROM trust_components tc WHERE tc.did = s.did)
+                ORDER BY s.did LIMIT ?
+            ''', (self._unscored_cursor.get(shard, ''), scan))
+            unscored = [did for (did,) in c.fetchall()]
+            self._unscored_cursor[shard] = unscored[-1] if len(unscored) == scan else ''
+            due.update((did, 0.0) for did in unscored)
+
+            monotonic = time.monotonic()
+            dids = [did for did in due if did not in self._queued and self.owns(did)
+                    and self._retry_at.get(did, 0) <= monotonic]
+            state = {}
+            for start in range(0, len(dids), 500):
+                batch = dids[start:start + 500]
+                c.execute(f"SELECT did, score, flagged FROM did_scores WHERE did IN ({','.join('?' * len(batch))})",
+                          batch)
+                state.update((did, (score, flagged)) for did, score, flagged in c.fetchall())
+
+        return [(self.risk_tier(*state.get(did, (None, 0)), thresholds), due[did], did) for did in dids]
+
+    async def _poll(self, queue, until_idle):
+        while True:
+            self._retry_at = {did: at for did, at in self._retry_at.items() if at > time.monotonic()}
+            entries = await run_db(self.due_candidates, max(queue.maxsize - queue.qsize(), 1))
+            for entry in entries:
+                self._queued.add(entry[2])
+                self.enqueued += 1
+                await queue.put(entry)  # Blocks while the queue is full
+            if entries:
+                continue
+            if queue.empty() and not self._active:
+                if until_idle:
+                    return
+                await asyncio.sleep(self.config['poll_interval'])
+            else:
+                await queue.join()  # Everything due is queued; poll again once it has been rescored
+
+    async def _work(self, queue):
+        while True:
+            _, _, did = await queue.get()
+            self._active += 1
+            try:
+                report = await aggregate_trust_report(did, limiters=self.limiters)
+                if report['late'] or report['missing']:
+                    self._retry_at[did] = time.monotonic() + self.config['retry_after']
+                self.rescored += 1
+                RESCORED.inc(outcome='partial' if report['partial'] else 'ok')
+            except Exception as e:
+                self.failed += 1
+                self._retry_at[did] = time.monotonic() + self.config['retry_after']
+                RESCORED.inc(outcome='error')
+                logging.error(f"Scheduled rescoring failed for {did}: {e}")
+            finally:
+                self._active -= 1
+                self._queued.discard(did)
+                queue.task_done()
+
+    async def run(self, until_idle=False):
+        """Rescore forever, or with `until_idle` until nothing is due. Returns stats()."""
+        await run_db(ensure_db)
+        queue = asyncio.PriorityQueue(self.config['queue_size'])
+        workers = [asyncio.ensure_future(self._work(queue)) for _ in range(self.config['concurrency'])]
+        try:
+            await self._poll(queue, until_idle)
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        logging.info(f"Rescoring scheduler stopped: {self.stats()}")
+        return self.stats()
+
+def _run_scheduler_shard(shard, shards, config, database_config):
+    DATABASE_CONFIG.update(database_config)
+    asyncio.run(RescoreScheduler(config, shard, shards).run())
+
+def run_sharded_scheduler(shards=None, config=None):
+    """Run one scheduler process per hash shard of the DID space and wait for them."""
+    import multiprocessing
+    shards = shards or RESCORE_CONFIG['shards']
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(target=_run_scheduler_shard, args=(shard, shards, config, DATABASE_CONFIG),
+                        name=f'rescore-shard-{shard}')
+        for shard in range(shards)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+# Periodic Task for Data Aggregation
+async def update_trust_scores(config=None):
+    """Keep every DID's score fresh: rescore continuously as components expire."""
+    await RescoreScheduler(config).run()
 
 # Example Usage, disabled during manual testing
 if __name__ == "__main__":
@@ -248,43 +2663,118 @@ if __name__ == "__main__":
         logging.error(f"Error in main: {e}")
         raise
 
-import sqlite3
-import logging
-import asyncio
-from datetime import datetime
-
 # Set up logging
-logging.basicConfig(filename='trust_enforcement.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
-
-# Initialize SQLite database
-conn = sqlite3.connect('did_trust_scores.db', check_same_thread=False)
-c = conn.cursor()
-
-# Create tables if they don't exist
-c.execute('''
-    CREATE TABLE IF NOT EXISTS did_scores (
-        did TEXT PRIMARY KEY, 
-        score REAL,
-        flagged INTEGER DEFAULT 0  -- 1 = flagged, 0 = normal
-    )
-''')
-
-c.execute('''
-    CREATE TABLE IF NOT EXISTS policy_rules (
-        rule_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        rule_name TEXT UNIQUE,
-        min_trust_score REAL,
-        action TEXT  -- Actions: "alert", "restrict", "review"
-    )
-''')
-
-conn.commit()
+configure_logging('trust_enforcement.log')
+
+# When several rules match a score, the most severe action wins; ties go to the
+# lower threshold, then to the older rule
+ACTION_PRECEDENCE = {'restrict': 0, 'review': 1, 'alert': 2}
+
+# Seconds between checks for rule changes made by other processes
+POLICY_REFRESH_INTERVAL = float(os.getenv('POLICY_REFRESH_INTERVAL', '5'))
+
+class PolicyIndex:
+    """In-memory threshold index over `policy_rules`.
+
+    Rules are sorted by `min_trust_score`; for every position the rule that
+    wins among all rules from there on is precomputed, so a lookup is one
+    bisect. The index reloads when `policy_rules_version` changes, checked
+    at most every `refresh_interval` seconds or after a local rule edit.
+    A load publishes one immutable (thresholds, winners, version) tuple and
+    every lookup reads it once, so readers on other threads (e.g. shard
+    workers reloading in parallel) never mix two rule sets.
+    """
+
+    def __init__(self, refresh_interval=None):
+        self.refresh_interval = (refresh_interval if refresh_interval is not None
+                                 else POLICY_REFRESH_INTERVAL)
+        self._lock = threading.Lock()
+        self._checked_at = None
+        # (sorted min_trust_score values, winners, version); winners[i] is the
+        # (rule_name, min_trust_score, action) deciding scores below thresholds[i]
+        self._state = ((), (), None)
+
+    @property
+    def version(self):
+        return self._state[2]
+
+    def invalidate(self):
+        """Force a version check on the next lookup."""
+        self._checked_at = None
+
+    def _load(self, c):
+        c.execute('SELECT version FROM policy_rules_version WHERE id = 1')
+        row = c.fetchone()
+        version = row[0] if row else 0
+        if version == self.version:
+            return
+        c.execute('SELECT rule_id, rule_name, min_trust_score, action FROM policy_rules')
+        rules = sorted(
+            (rule for rule in c.fetchall() if rule[3] in ACTION_PRECEDENCE and rule[2] is not None),
+            key=lambda rule: rule[2]
+        )
+        winners = [None] * len(rules)
+        best = None
+        for i in range(len(rules) - 1, -1, -1):
+            rule_id, rule_name, min_score, action = rules[i]
+            key = (ACTION_PRECEDENCE[action], min_score, rule_id)
+            if best is None or key < best[0]:
+                best = (key, (rule_name, min_score, action))
+            winners[i] = best[1]
+        self._state = (tuple(rule[2] for rule in rules), tuple(winners), version)
+        logging.info(f"Loaded {len(rules)} policy rules (version {version})")
+
+    def refresh(self, c=None, force=False):
+        """Reload the rules if they changed since the last load."""
+        now = time.monotonic()
+        if (not force and self._checked_at is not None
+                and now - self._checked_at < self.refresh_interval):
+            return
+        with self._lock:
+            if c is None:
+                with db_connection() as conn:
+                    self._load(conn.cursor())
+            else:
+                self._load(c)
+            self._checked_at = now
+
+    def match(self, score):
+        """Return the deciding (rule_name, min_trust_score, action) for a score, or None."""
+        self.refresh()
+        thresholds, winners, _ = self._state
+        i = bisect.bisect_right(thresholds, score)
+        return winners[i] if i < len(winners) else None
+
+    def snapshot(self):
+        """Return (thresholds, actions) describing the current decision function."""
+        return self.versioned_snapshot()[1]
+
+    def versioned_snapshot(self):
+        """Return (version, (thresholds, actions)) read from one loaded rule set."""
+        self.refresh()
+        thresholds, winners, version = self._state
+        return version, (list(thresholds), [action for _, _, action in winners])
+
+    def case_expression(self, column='score'):
+        """SQL CASE mapping `column` to the deciding action ('pass' if none), with its parameters."""
+        self.refresh()
+        thresholds, winners, _ = self._state
+        clauses, params = [], []
+        for threshold, (_, _, action) in zip(thresholds, winners):
+            clauses.append(f'WHEN {column} < ? THEN ?')
+            params.extend((threshold, action))
+        if not clauses:
+            return "'pass'", []
+        return f"CASE {' '.join(clauses)} ELSE 'pass' END", params
+
+policy_index = PolicyIndex()
 
 ### 🔥 Policy Engine: Enforce Trust-Based Actions
+@db_operation
 def enforce_trust_policy(did):
     """Evaluate a DID against trust policies and determine actions."""
     try:
-        with get_database_connection() as conn:
+        with db_connection(did=did) as conn:
             c = conn.cursor()
             c.execute('SELECT score FROM did_scores WHERE did = ?', (did,))
             result = c.fetchone()
@@ -294,75 +2784,329 @@ def enforce_trust_policy(did):
                 return "DID not found"
 
             trust_score = result[0]
+            rule = policy_index.match(trust_score) if trust_score is not None else None
+            POLICY_DECISIONS.inc(action=rule[2] if rule else 'pass', mode='single')
 
-            # Fetch active rules
-            c.execute('SELECT rule_name, min_trust_score, action FROM policy_rules')
-            rules = c.fetchall()
-
-            for rule_name, min_score, action in rules:
-                if trust_score < min_score:
-                    logging.warning(f"DID {did} flagged under rule '{rule_name}' - Action: {action}")
+            if rule:
+                rule_name, _, action = rule
+                logging.warning(f"DID {did} flagged under rule '{rule_name}' - Action: {action}")
 
-                    if action == "alert":
-                        return f"DID {did} triggered an alert under rule '{rule_name}'."
-                    elif action == "restrict":
-                        flag_did(did)
-                        return f"DID {did} has been restricted under rule '{rule_name}'."
-                    elif action == "review":
-                        return f"DID {did} requires manual review under rule '{rule_name}'."
+                if action == "alert":
+                    return f"DID {did} triggered an alert under rule '{rule_name}'."
+                elif action == "restrict":
+                    flag_did(did)
+                    return f"DID {did} has been restricted under rule '{rule_name}'."
+                elif action == "review":
+                    return f"DID {did} requires manual review under rule '{rule_name}'."
 
             return f"DID {did} passes all trust policies."
     except Exception as e:
         logging.error(f"Error enforcing trust policy for {did}: {e}")
         raise
 
+def _count_decisions(summary, mode):
+    for action in (*ACTION_PRECEDENCE, 'pass'):
+        if summary[action]:
+            POLICY_DECISIONS.inc(summary[action], action=action, mode=mode)
+
+@db_operation
+def enforce_trust_policies():
+    """Evaluate every scored DID in one SQL pass and apply restrictions as one update.
+
+    Returns the number of DIDs per action ('restrict', 'review', 'alert',
+    'pass') and how many DIDs were newly flagged. Shards are evaluated in
+    parallel.
+    """
+    try:
+        summary = _merge_summaries(map_shards(_enforce_shard))
+        _count_decisions(summary, 'bulk')
+
+        logging.info(f"Bulk trust enforcement: {summary}")
+        return summary
+    except Exception as e:
+        logging.error(f"Error enforcing trust policies: {e}")
+        raise
+
+def _enforce_shard(shard):
+    """One shard's part of enforce_trust_policies(), in one transaction."""
+    with db_connection(shard=shard) as conn:
+        c = conn.cursor()
+        policy_index.refresh(c if shard == 0 else None)  # Rules live in shard 0
+        case, params = policy_index.case_expression('score')
+        begin_write(conn)
+
+        c.execute(f'''
+            SELECT {case} AS action, COUNT(*) FROM did_scores
+            WHERE score IS NOT NULL GROUP BY action
+        ''', params)
+        summary = {action: 0 for action in (*ACTION_PRECEDENCE, 'pass')}
+        summary.update(dict(c.fetchall()))
+
+        restrict = f"flagged = 0 AND ({case}) = 'restrict'"
+        c.execute(f"SELECT did, score FROM did_scores WHERE {restrict}", params)
+        newly_flagged = c.fetchall()
+        c.execute(f"UPDATE did_scores SET flagged = 1 WHERE {restrict}", params)
+        events = append_ledger_events(c, [(did, score, 'flag') for did, score in newly_flagged])
+        commit_proof_batches(c, 'enforcement', events, shard=shard)
+        summary['newly_flagged'] = len(newly_flagged)
+        conn.commit()
+    _flags_committed((did for did, _ in newly_flagged), True)
+    return summary
+
+def _merge_summaries(summaries):
+    merged = {}
+    for summary in summaries:
+        for key, count in summary.items():
+            merged[key] = merged.get(key, 0) + count
+    return merged
+
+# Seconds between incremental enforcement sweeps
+ENFORCEMENT_SWEEP_INTERVAL = float(os.getenv('ENFORCEMENT_SWEEP_INTERVAL', '30'))
+
+def _snapshot_action(snapshot, score):
+    thresholds, actions = snapshot
+    i = bisect.bisect_right(thresholds, score)
+    return actions[i] if i < len(actions) else 'pass'
+
+def changed_score_ranges(old_snapshot, new_snapshot):
+    """Return [lo, hi) score ranges whose decision differs between two policy snapshots.
+
+    A bound of None is unbounded. Decisions are constant between consecutive
+    thresholds of either snapshot, so one probe per segment is enough.
+    """
+    breakpoints = sorted(set(old_snapshot[0]) | set(new_snapshot[0]))
+    segments = [(None, breakpoints[0] if breakpoints else None)]
+    segments += [(lo, hi) for lo, hi in zip(breakpoints, breakpoints[1:] + [None])]
+
+    ranges = []
+    for lo, hi in segments:
+        probe = float('-inf') if lo is None else lo
+        if _snapshot_action(old_snapshot, probe) == _snapshot_action(new_snapshot, probe):
+            continue
+        if ranges and ranges[-1][1] == lo:
+            ranges[-1] = (ranges[-1][0], hi)
+        else:
+            ranges.append((lo, hi))
+    return ranges
+
+def _apply_decisions(c, rows, summary):
+    """Evaluate (did, score) rows against the policy index and flag restricted DIDs in one batch.
+
+    Returns the (seq, hash) of the 'flag' ledger events written and the
+    newly flagged DIDs, for the caller to use once it has committed.
+    """
+    restricted = []
+    for did, score in rows:
+        rule = policy_index.match(score) if score is not None else None
+        if not rule:
+            summary['pass'] += 1
+            continue
+        rule_name, _, action = rule
+        summary[action] += 1
+        if action == 'restrict':
+            restricted.append(did)
+        else:
+            logging.warning(f"DID {did} flagged under rule '{rule_name}' - Action: {action}")
+    if restricted:
+        newly_flagged = []
+        for start in range(0, len(restricted), 500):
+            batch = restricted[start:start + 500]
+            c.execute(f"SELECT did, score FROM did_scores WHERE flagged = 0 AND did IN ({','.join('?' * len(batch))})",
+                      batch)
+            newly_flagged.extend(c.fetchall())
+        c.executemany('UPDATE did_scores SET flagged = 1 WHERE did = ?', [(did,) for did, _ in newly_flagged])
+        events = append_ledger_events(c, [(did, score, 'flag') for did, score in newly_flagged])
+        summary['newly_flagged'] += len(newly_flagged)
+        logging.warning(f"Restricted {len(restricted)} DIDs under current trust policies")
+        return events, [did for did, _ in newly_flagged]
+    return [], []
+
+@db_operation
+def incremental_enforce_trust(name='default', chunk_size=1000):
+    """Enforce policies only on DIDs whose score or applicable rules changed since the last sweep.
+
+    Progress is checkpointed per chunk in `enforcement_checkpoints` (in the
+    same transaction as the flag updates), so an interrupted sweep resumes
+    where it stopped. After a rule change only DIDs whose scores fall in a
+    range where the decision changed are re-evaluated. The sweep's 'flag'
+    ledger events are committed as one 'sweep' proof batch (per shard).
+    Shards keep their own checkpoints and are swept in parallel.
+    """
+    proofs = ProofBatch('sweep')
+    try:
+        summary = _merge_summaries(map_shards(lambda shard: _incremental_enforce_shard(shard, name, chunk_size, proofs)))
+        proofs.close()
+
+        _count_decisions(summary, 'incremental')
+        logging.info(f"Incremental trust enforcement '{name}': {summary}")
+        return summary
+    except Exception as e:
+        logging.error(f"Error in incremental trust enforcement '{name}': {e}")
+        raise
+
+def _incremental_enforce_shard(shard, name, chunk_size, proofs):
+    """One shard's part of incremental_enforce_trust(), against its own checkpoint."""
+    summary = {action: 0 for action in (*ACTION_PRECEDENCE, 'pass')}
+    summary.update({'newly_flagged': 0, 'rule_rescan': 0, 'score_changes': 0})
+    with db_connection(shard=shard) as conn:
+        c = conn.cursor()
+        c.execute('INSERT OR IGNORE INTO enforcement_checkpoints (name) VALUES (?)', (name,))
+        conn.commit()
+        policy_index.refresh(c if shard == 0 else None, force=True)  # Rules live in shard 0
+
+        # Rule changes: re-evaluate DIDs whose decision differs between the last applied rules and now
+        c.execute('''
+            SELECT change_seq, policy_version, policy_snapshot, rule_target_version, rule_cursor
+            FROM enforcement_checkpoints WHERE name = ?
+        ''', (name,))
+        change_seq, policy_version, policy_snapshot, rule_target_version, rule_cursor = c.fetchone()
+        rescan_seq, rescanned = -1, ('', ())
+        version, new_snapshot = policy_index.versioned_snapshot()
+        if policy_version != version:
+            old_snapshot = json.loads(policy_snapshot) if policy_snapshot else ([], [])
+            if rule_target_version != version:
+                rule_cursor = ''  # Rules changed again mid-scan: start over against the newest rules
+            ranges = changed_score_ranges(old_snapshot, new_snapshot)
+            where, params = [], []
+            for lo, hi in ranges:
+                bounds = []
+                if lo is not None:
+                    bounds.append('score >= ?')
+                    params.append(lo)
+                if hi is not None:
+                    bounds.append('score < ?')
+                    params.append(hi)
+                where.append('(' + ' AND '.join(bounds or ['score IS NOT NULL']) + ')')
+            if where:
+                # Scores changed after this point are left to the score-change pass, and that pass
+                # skips what the rescan saw, so every DID is decided once per sweep
+                c.execute('SELECT change_seq FROM did_scores_clock WHERE id = 1')
+                rescan_seq = c.fetchone()[0]
+                rescanned = (f"AND NOT COALESCE(change_seq <= ? AND did > ? AND ({' OR '.join(where)}), 0)",
+                             (rescan_seq, rule_cursor, *params))
+
+            while where:
+                begin_write(conn)
+                c.execute(f'''
+                    SELECT did, score FROM did_scores
+                    WHERE did > ? AND change_seq <= ? AND ({' OR '.join(where)})
+                    ORDER BY did LIMIT ?
+                ''', (rule_cursor, rescan_seq, *params, chunk_size))
+                rows = c.fetchall()
+                if not rows:
+                    conn.rollback()
+                    break
+                events, flagged = _apply_decisions(c, rows, summary)
+                summary['rule_rescan'] += len(rows)
+                rule_cursor = rows[-1][0]
+                c.execute('''
+                    UPDATE enforcement_checkpoints
+                    SET rule_target_version = ?, rule_cursor = ?, updated_at = ? WHERE name = ?
+                ''', (version, rule_cursor, utc_timestamp(), name))
+                conn.commit()
+                _flags_committed(flagged, True)
+                proofs.add(events, shard)
+
+            c.execute('''
+                UPDATE enforcement_checkpoints
+                SET policy_version = ?, policy_snapshot = ?, rule_target_version = NULL,
+                    rule_cursor = NULL, updated_at = ?
+                WHERE name = ?
+            ''', (version, json.dumps(new_snapshot), utc_timestamp(), name))
+            conn.commit()
+
+        # Score changes since the checkpoint, in change order
+        skip, skip_params = rescanned
+        while True:
+            begin_write(conn)
+            c.execute(f'''
+                SELECT did, score, change_seq FROM did_scores
+                WHERE change_seq > ? {skip} ORDER BY change_seq LIMIT ?
+            ''', (change_seq, *skip_params, chunk_size))
+            rows = c.fetchall()
+            if not rows:
+                if rescan_seq > change_seq:
+                    # Only rescanned DIDs were left up to rescan_seq
+                    change_seq = rescan_seq
+                    c.execute('''
+                        UPDATE enforcement_checkpoints SET change_seq = ?, updated_at = ? WHERE name = ?
+                    ''', (change_seq, utc_timestamp(), name))
+                    conn.commit()
+                else:
+                    conn.rollback()
+                break
+            events, flagged = _apply_decisions(c, [(did, score) for did, score, _ in rows], summary)
+            summary['score_changes'] += len(rows)
+            change_seq = rows[-1][2]
+            c.execute('''
+                UPDATE enforcement_checkpoints SET change_seq = ?, updated_at = ? WHERE name = ?
+            ''', (change_seq, utc_timestamp(), name))
+            conn.commit()
+            _flags_committed(flagged, True)
+            proofs.add(events, shard)
+    return summary
+
 ### 🔥 Flagging System for Risky DIDs
+@db_operation
+def _set_flag(did, flagged, event):
+    """Change a DID's flag and record the transition in the ledger; no-op if unchanged."""
+    with db_connection(did=did) as conn:
+        c = conn.cursor()
+        c.execute('UPDATE did_scores SET flagged = ? WHERE did = ? AND flagged IS NOT ?', (flagged, did, flagged))
+        changed = c.rowcount > 0
+        if changed:
+            c.execute('SELECT score FROM did_scores WHERE did = ?', (did,))
+            append_ledger_event(c, did, c.fetchone()[0], event)
+        conn.commit()
+    if changed:
+        _flags_committed((did,), bool(flagged))
+    else:
+        score_cache.invalidate(did)
+
 def flag_did(did):
     """Flag a DID as untrusted."""
-    c.execute('UPDATE did_scores SET flagged = 1 WHERE did = ?', (did,))
-    conn.commit()
+    _set_flag(did, 1, 'flag')
     logging.warning(f"DID {did} has been flagged as untrusted.")
 
 def unflag_did(did):
     """Remove a flag from a DID if trust score improves."""
-    c.execute('UPDATE did_scores SET flagged = 0 WHERE did = ?', (did,))
-    conn.commit()
+    _set_flag(did, 0, 'unflag')
     logging.info(f"DID {did} has been restored to normal status.")
 
 ### 🔥 Rule Management for Decentralized Trust Enforcement
 def add_policy_rule(rule_name, min_trust_score, action):
     """Add a trust enforcement rule."""
     try:
-        c.execute('''
-            INSERT INTO policy_rules (rule_name, min_trust_score, action) 
-            VALUES (?, ?, ?)''', (rule_name, min_trust_score, action))
-        conn.commit()
+        with db_connection() as conn:
+            conn.cursor().execute('''
+                INSERT INTO policy_rules (rule_name, min_trust_score, action) 
+                VALUES (?, ?, ?)''', (rule_name, min_trust_score, action))
+            conn.commit()
+        policy_index.invalidate()
         logging.info(f"Added new policy rule: {rule_name} (Min Trust: {min_trust_score}, Action: {action})")
     except sqlite3.IntegrityError:
         logging.warning(f"Policy rule '{rule_name}' already exists.")
 
 def remove_policy_rule(rule_name):
     """Remove a trust enforcement rule."""
-    c.execute('DELETE FROM policy_rules WHERE rule_name = ?', (rule_name,))
-    conn.commit()
+    with db_connection() as conn:
+        conn.cursor().execute('DELETE FROM policy_rules WHERE rule_name = ?', (rule_name,))
+        conn.commit()
+    policy_index.invalidate()
     logging.info(f"Removed policy rule: {rule_name}")
 
 ### 🔥 Example: Automate Trust Enforcement
-async def auto_enforce_trust():
-    """Run automated trust enforcement checks periodically."""
+async def auto_enforce_trust(interval=None):
+    """Run incremental trust enforcement sweeps periodically."""
+    interval = interval if interval is not None else ENFORCEMENT_SWEEP_INTERVAL
     while True:
-        c.execute('SELECT did FROM did_scores')
-        dids = c.fetchall()
-
-        for (did,) in dids:
-            result = enforce_trust_policy(did)
-            logging.info(result)
-
-        await asyncio.sleep(24 * 60 * 60)  # Run every 24 hours
+        await run_db(incremental_enforce_trust)
+        await asyncio.sleep(interval)
 
 ### 🔥 Example Usage
 if __name__ == "__main__":
     test_did = 'did:ethr:123456789abcdef'
+    init_db()
     
     # Example: Add trust policy rules
     add_policy_rule("Low Trust Restriction", 0.4, "restrict")
@@ -372,77 +3116,57 @@ if __name__ == "__main__":
     # Example: Enforce trust rules on a DID
     print(enforce_trust_policy(test_did))
 
-import sqlite3
-import logging
-import asyncio
-import json
-from datetime import datetime, timedelta
-
 # Set up logging
-logging.basicConfig(
-    filename='trust_recovery.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-
-# Initialize SQLite database
-conn = sqlite3.connect('did_trust_scores.db', check_same_thread=False)
-c = conn.cursor()
-
-# Create tables if they don't exist
-c.execute('''CREATE TABLE IF NOT EXISTS trust_recovery (
-                did TEXT PRIMARY KEY, 
-                recovery_stage TEXT,
-                last_attempt TIMESTAMP,
-                status TEXT DEFAULT 'pending'
-            )''')
-
-c.execute('''CREATE TABLE IF NOT EXISTS trust_ledger (
-                did TEXT PRIMARY KEY,
-                trust_history TEXT
-            )''')
-
-conn.commit()
+configure_logging('trust_recovery.log')
 
 ### 🔥 Trust Repair Mechanism for Flagged DIDs
+@db_operation
 def initiate_trust_recovery(did):
     """Start a recovery process for a flagged DID."""
-    c.execute('SELECT flagged FROM did_scores WHERE did = ?', (did,))
-    result = c.fetchone()
-    
-    if not result or result[0] == 0:
-        logging.info(f"DID {did} is not flagged. No recovery needed.")
-        return "DID is not flagged."
-
-    c.execute('''INSERT INTO trust_recovery (did, recovery_stage, last_attempt, status)
-                 VALUES (?, ?, ?, 'pending') 
-                 ON CONFLICT(did) DO UPDATE SET last_attempt = ?''',
-              (did, 'start', datetime.now(), datetime.now()))
-    
-    conn.commit()
+    with db_connection(did=did) as conn:
+        c = conn.cursor()
+        c.execute('SELECT flagged FROM did_scores WHERE did = ?', (did,))
+        result = c.fetchone()
+        
+        if not result or result[0] == 0:
+            logging.info(f"DID {did} is not flagged. No recovery needed.")
+            return "DID is not flagged."
+
+        now = datetime.now().isoformat(' ')
+        c.execute('''INSERT INTO trust_recovery (did, recovery_stage, last_attempt, status)
+                     VALUES (?, ?, ?, 'pending') 
+                     ON CONFLICT(did) DO UPDATE SET last_attempt = ?''',
+                  (did, 'start', now, now))
+        
+        conn.commit()
     logging.info(f"Trust recovery process initiated for DID {did}.")
     return f"Trust recovery started for {did}. Awaiting verification steps."
 
 ### 🔥 Verification Challenge System for Reputation Recovery
+@db_operation
 def verify_trust_recovery(did, verification_proof):
     """Verify a DID's recovery attempt based on submitted proof."""
-    c.execute('SELECT status FROM trust_recovery WHERE did = ?', (did,))
-    result = c.fetchone()
+    with db_connection(did=did) as conn:
+        c = conn.cursor()
+        c.execute('SELECT status FROM trust_recovery WHERE did = ?', (did,))
+        result = c.fetchone()
 
-    if not result or result[0] != 'pending':
-        logging.info(f"DID {did} has no active recovery process.")
-        return "No active recovery process."
+        if not result or result[0] != 'pending':
+            logging.info(f"DID {did} has no active recovery process.")
+            return "No active recovery process."
 
-    # 🔹 Placeholder: Implement actual proof validation with federated identity verification
-    verified = validate_verification_proof(verification_proof)
+        # 🔹 Placeholder: Implement actual proof validation with federated identity verification
+        verified = validate_verification_proof(verification_proof)
+
+        c.execute("UPDATE trust_recovery SET status = ? WHERE did = ?",
+                  ('verified' if verified else 'rejected', did))
+        conn.commit()
 
     if verified:
-        c.execute('UPDATE trust_recovery SET status = "verified" WHERE did = ?', (did,))
         unflag_did(did)
         logging.info(f"DID {did} has successfully recovered trust.")
         return f"DID {did} has recovered trust successfully."
     else:
-        c.execute('UPDATE trust_recovery SET status = "rejected" WHERE did = ?', (did,))
         logging.warning(f"Trust recovery for {did} failed.")
         return f"DID {did} failed recovery verification."
 
@@ -452,168 +3176,186 @@ def validate_verification_proof(proof):
     return proof == "valid_proof"
 
 ### 🔥 Historical Trust Ledger for Trust Repair Speed
+@db_operation
+def _append_trust_ledger(did, trust_score):
+    """Single attempt at appending one ledger entry.
+
+    WAL checkpoints and integrity checks run in the maintenance service
+    (auto_maintain_database), not here.
+    """
+    with db_connection(did=did) as conn:
+        c = conn.cursor()
+        begin_write(conn)
+        # Append one chained entry; earlier history is never rewritten
+        append_ledger_event(c, did, trust_score)
+        conn.commit()
+
+@db_operation
 def update_trust_ledger(did, trust_score):
-    """Update trust ledger with retry logic to prevent database lock errors."""
-    retries = 5  # Number of retries before failing
-    delay = 0.5  # Initial delay for retrying
+    """Append to the trust ledger with retry logic to prevent database lock errors."""
+    retries = DATABASE_CONFIG['max_retry_attempts']  # Number of retries before failing
+    delay = DATABASE_CONFIG['retry_delay']  # Initial delay for retrying
 
     for attempt in range(retries):
         try:
-            with sqlite3.connect('did_trust_scores.db', timeout=10, check_same_thread=False) as conn:
-                conn.execute('PRAGMA wal_checkpoint(TRUNCATE);')  # Clear WAL
-                conn.execute('PRAGMA journal_mode=WAL')  # Ensure WAL mode
-                conn.execute('PRAGMA busy_timeout = 5000;')  # Increase timeout
-                
-                c = conn.cursor()
-                c.execute("PRAGMA quick_check;")  # Check if DB is corrupted
-                
-                # Ensure transaction safety
-                conn.execute('BEGIN IMMEDIATE;')  
-                
-                # Get existing trust history
-                c.execute('SELECT trust_history FROM trust_ledger WHERE did = ?', (did,))
-                result = c.fetchone()
-
-                # Update trust history
-                trust_history = json.loads(result[0]) if result else []
-                trust_history.append({
-                    "timestamp": str(datetime.now()),
-                    "trust_score": trust_score
-                })
-
-                # Insert or update with new history
-                c.execute('''
-                    INSERT INTO trust_ledger (did, trust_history) 
-                    VALUES (?, ?)
-                    ON CONFLICT(did) DO UPDATE SET trust_history = ?
-                ''', (
-                    did, 
-                    json.dumps(trust_history), 
-                    json.dumps(trust_history)
-                ))
-                
-                conn.commit()  # Commit transaction
-                return  # Exit if successful
-                
+            _append_trust_ledger(did, trust_score)
+            return  # Exit if successful
         except sqlite3.OperationalError as e:
-            if "database is locked" in str(e):
+            if "database is locked" in str(e) and attempt < retries - 1:
+                DB_LOCK_RETRIES.inc(operation='update_trust_ledger')
                 logging.warning(f"⚠️ Database is locked. Retrying {attempt+1}/{retries}...")
-                time.sleep(delay * (attempt + 1))  # Exponential backoff
+                time.sleep(delay * (attempt + 1))  # Linear backoff
             else:
+                LEDGER_APPEND_FAILURES.inc(reason='locked' if "database is locked" in str(e) else 'database')
                 logging.error(f"Database error: {e}")
                 raise
         except Exception as e:
+            LEDGER_APPEND_FAILURES.inc(reason='error')
             logging.error(f"Error updating trust ledger for {did}: {e}")
             raise
 
-from datetime import timedelta
+async def update_trust_ledger_async(did, trust_score):
+    """Append to the trust ledger from a coroutine without blocking the event loop."""
+    try:
+        await run_db(_append_trust_ledger, did, trust_score)
+    except Exception as e:
+        logging.error(f"Error updating trust ledger for {did}: {e}")
+        raise
 
 def apply_decay_model(did):
     """Apply dynamic trust decay based on behavior & inactivity."""
-    c.execute('SELECT trust_history FROM trust_ledger WHERE did = ?', (did,))
-    result = c.fetchone()
+    with db_connection(did=did) as conn:
+        c = conn.cursor()
+        c.execute('''
+            SELECT (SELECT first_seen FROM trust_ledger_heads WHERE did = ?),
+                   (SELECT flagged FROM did_scores WHERE did = ?)
+        ''', (did, did))
+        first_seen, flagged = c.fetchone()
 
-    if not result:
+    if first_seen is None:
         return 1  # Default recovery speed for new DIDs
 
-    trust_history = json.loads(result[0])
-    oldest_entry = min(trust_history, key=lambda x: datetime.fromisoformat(x['timestamp']))
-    time_since_first_flag = datetime.utcnow() - datetime.fromisoformat(oldest_entry['timestamp'])
+    time_since_first_flag = datetime.utcnow() - datetime.fromisoformat(first_seen)
 
     # Decay is more aggressive if flagged multiple times
-    c.execute('SELECT flagged FROM did_scores WHERE did = ?', (did,))
-    flagged_result = c.fetchone()
-    is_flagged = flagged_result[0] if flagged_result else 0
+    is_flagged = flagged or 0
+
+    return decay_multiplier(time_since_first_flag, is_flagged)
 
+def decay_multiplier(time_since_first_flag, is_flagged):
+    """Recovery multiplier for a DID given its ledger age and flag state."""
     # Decay model: faster decay for flagged users, slower for active ones
     if is_flagged:
         return 0.3 if time_since_first_flag > timedelta(days=180) else 0.6  # Stronger penalty for flagged users
     else:
         return 0.8 if time_since_first_flag > timedelta(days=180) else 1  # Slower decay for normal users
 
+# Score added per repair pass, scaled by the decay multiplier
+RECOVERY_STEP = 0.1
+
+def repair_trust_score(did):
+    """Apply one gradual recovery step to a single DID; returns the new score, or None if it has none."""
+    current_score = get_current_trust_score(did)
+    if current_score is None:
+        logging.warning(f"Skipping trust recovery for {did}: no score recorded")
+        return None
+    recovery_multiplier = apply_decay_model(did)
+    new_score = min(current_score + (RECOVERY_STEP * recovery_multiplier), 1.0)
+    update_trust_score(did, new_score, 'recovery')
+    logging.info(f"Gradual trust recovery applied to {did}, new score: {new_score}")
+    return new_score
+
+@retries_internally
+@db_operation
+def bulk_trust_repair(now=None):
+    """Apply one recovery step to every pending DID in a single set-based pass.
+
+    One query gathers score, flag state and first-seen time for all
+    pending DIDs; the new scores and matching 'recovery' ledger events are
+    written in one transaction, together with a 'recovery' proof batch.
+    Produces the same scores as calling repair_trust_score() per DID.
+    Shards are repaired in parallel, one transaction each; a lock error
+    retries only the failing shard. Returns {did: new_score}.
+    """
+    now = now or datetime.utcnow()
+    updates = {}
+    for shard_updates in map_shards(lambda shard: retry_locked(_repair_shard, shard, now)):
+        updates.update(shard_updates)
+    logging.info(f"Gradual trust recovery applied to {len(updates)} DIDs")
+    return updates
+
+def _repair_shard(shard, now):
+    """One shard's part of bulk_trust_repair()."""
+    with db_connection(shard=shard) as conn:
+        c = conn.cursor()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            c.execute('''
+                SELECT r.did, s.score, s.flagged, h.first_seen
+                FROM trust_recovery r
+                JOIN did_scores s ON s.did = r.did
+                LEFT JOIN trust_ledger_heads h ON h.did = r.did
+                WHERE r.status = 'pending'
+            ''')
+            updates = {}
+            for did, score, flagged, first_timestamp in c.fetchall():
+                if score is None:
+                    logging.warning(f"Skipping trust recovery for {did}: no score recorded")
+                    continue
+                if first_timestamp is None:
+                    recovery_multiplier = 1  # Default recovery speed for new DIDs
+                else:
+                    recovery_multiplier = decay_multiplier(
+                        now - datetime.fromisoformat(first_timestamp), flagged or 0)
+                updates[did] = min(score + (RECOVERY_STEP * recovery_multiplier), 1.0)
+
+            c.executemany('UPDATE did_scores SET score = ? WHERE did = ?',
+                          [(new_score, did) for did, new_score in updates.items()])
+            events = append_ledger_events(c, [(did, new_score, 'recovery') for did, new_score in updates.items()])
+            commit_proof_batches(c, 'recovery', events, shard=shard)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Error in bulk trust repair (shard {shard}): {e}")
+            raise
+    score_cache.invalidate_many(updates)
+    return updates
+
 ### 🔥 Automated Gradual Trust Score Adjustments Based on Recovery Progress
 async def periodic_trust_repair():
     """Periodically attempt to repair flagged DIDs' trust scores based on recovery progress."""
     while True:
-        c.execute('SELECT did FROM trust_recovery WHERE status = "pending"')
-        dids = c.fetchall()
-
-        for (did,) in dids:
-            recovery_multiplier = apply_decay_model(did)
-            current_score = get_current_trust_score(did)
-            new_score = min(current_score + (0.1 * recovery_multiplier), 1.0)
-            update_trust_score(did, new_score)
-            logging.info(f"Gradual trust recovery applied to {did}, new score: {new_score}")
-
+        await run_db(bulk_trust_repair)
         await asyncio.sleep(24 * 60 * 60)  # Run every 24 hours
 
 # Helper functions (replace with actual database logic)
+@db_operation
 def get_current_trust_score(did):
-    """Get the current trust score for a DID."""
+    """Get the current trust score for a DID (read through the score cache)."""
     try:
-        with get_database_connection() as conn:
-            c = conn.cursor()
-            c.execute('SELECT score FROM did_scores WHERE did = ?', (did,))
-            result = c.fetchone()
-            return result[0] if result else 0.0
+        status = score_cache.get(did)
+        return status[0] if status else 0.0
     except Exception as e:
         logging.error(f"Error getting trust score for {did}: {e}")
         return 0.0
 
-def update_trust_score(did, new_score):
-    c.execute('UPDATE did_scores SET score = ? WHERE did = ?', (new_score, did))
-    conn.commit()
-
-def unflag_did(did):
-    """Remove a flag from a DID if trust score improves."""
-    c.execute('UPDATE did_scores SET flagged = 0 WHERE did = ?', (did,))
-    conn.commit()
-    logging.info(f"DID {did} has been restored to normal status.")
+@db_operation
+def update_trust_score(did, new_score, event='score'):
+    """Update an existing DID's score and append the change to the trust ledger."""
+    with db_connection(did=did) as conn:
+        c = conn.cursor()
+        c.execute('UPDATE did_scores SET score = ? WHERE did = ?', (new_score, did))
+        if c.rowcount > 0:
+            append_ledger_event(c, did, new_score, event)
+        conn.commit()
+    score_cache.invalidate(did)
 
 # Example Usage
 if __name__ == "__main__":
     test_did = 'did:ethr:123456789abcdef'
+    init_db()
     print(initiate_trust_recovery(test_did))
     print(verify_trust_recovery(test_did, "valid_proof"))
     update_trust_ledger(test_did, get_current_trust_score(test_did))
     # loop = asyncio.get_event_loop()
     # loop.run_until_complete(periodic_trust_repair())
-
-def init_db():
-    """Initialize the database and create tables if they don't exist."""
-    conn = sqlite3.connect('trust_scores.db')
-    c = conn.cursor()
-    
-    # Create trust_ledger table if it doesn't exist
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS trust_ledger (
-            did TEXT PRIMARY KEY,
-            trust_score REAL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-
-def insert_trust_score(did, trust_score):
-    """Insert or update trust score for a DID."""
-    conn = sqlite3.connect('trust_scores.db')
-    c = conn.cursor()
-    
-    c.execute('''
-        INSERT OR REPLACE INTO trust_ledger (did, trust_score)
-        VALUES (?, ?)
-    ''', (did, trust_score))
-    
-    conn.commit()
-    conn.close()
-
-# Call init_db at the start of the program
-if __name__ == "__main__":
-    init_db()  # Initialize database before running main logic
-    # ... rest of your main code ...
-
-
-
-
@@ -0,0 +1,404 @@
+import json
+import math
+import time
+import asyncio
+import hashlib
+import threading
+from itertools import islice
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+# Half-lives of the short-term and long-term decayed event counters
+DEFAULT_SHORT_HALF_LIFE = 3600.0
+DEFAULT_LONG_HALF_LIFE = 7 * 86400.0
+# Distinct counterparties are counted over a sliding window of one to two of these
+DEFAULT_DISTINCT_WINDOW = 7 * 86400.0
+DEFAULT_HLL_PRECISION = 7  # 128 registers, ~9% standard error
+DEFAULT_BUCKET_SECONDS = 60.0  # Burst detection granularity
+DEFAULT_SKETCH_WIDTH = 1 << 17
+DEFAULT_SKETCH_DEPTH = 4
+DEFAULT_MAX_PROFILES = 1000000
+DEFAULT_FAILURE_ACTIONS = ('error', 'failed', 'rejected', 'denied')
+# Events folded in per hold of the aggregator lock, so readers never wait behind a whole batch
+INGEST_SLICE = 256
+
+_MASK64 = (1 << 64) - 1
+
+def _hash64(text):
+    """Stable 64-bit hash (unlike hash(), the same in every process)."""
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'little')
+
+def parse_timestamp(value):
+    """Return epoch seconds for a number or an ISO 8601 string (naive strings are UTC)."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+class HyperLogLog:
+    """HyperLogLog distinct counter over 64-bit hashes.
+
+    Small sets are kept exactly as a set of hashes and switch to 2^precision
+    one-byte registers once they would take more room than the registers.
+    """
+
+    __slots__ = ('precision', '_sparse', '_registers')
+
+    def __init__(self, precision=DEFAULT_HLL_PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"HyperLogLog precision must be in [4, 16], got {precision}")
+        self.precision = precision
+        self._sparse = set()
+        self._registers = None
+
+    def add(self, hashed):
+        if self._registers is None:
+            self._sparse.add(hashed)
+            if len(self._sparse) > (1 << self.precision) >> 4:
+                self._densify()
+            return
+        p = self.precision
+        rest = (hashed << p) & _MASK64
+        rank = 64 - p + 1 if rest == 0 else 65 - rest.bit_length()
+        index = hashed >> (64 - p)
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+
+    def _densify(self):
+        sparse, self._sparse = self._sparse, set()
+        self._registers = bytearray(1 << self.precision)
+        for hashed in sparse:
+            self.add(hashed)
+
+    def merge(self, other):
+        """Add every item counted by `other` (same precision) to this counter."""
+        if other._registers is None:
+            for hashed in other._sparse:
+                self.add(hashed)
+            return
+        if self._registers is None:
+            self._densify()
+        self._registers = bytearray(map(max, self._registers, other._registers))
+
+    def count(self):
+        if self._registers is None:
+            return len(self._sparse)
+        return self._estimate(self._registers)
+
+    def _estimate(self, registers):
+        m = len(registers)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / sum(2.0 ** -r for r in registers)
+        zeros = registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)  # Linear counting for small cardinalities
+        return estimate
+
+    def union_count(self, other):
+        """Distinct items counted by this counter or `other`, without modifying either."""
+        if self._registers is None and other._registers is None:
+            return len(self._sparse | other._sparse)
+        merged = HyperLogLog(self.precision)
+        merged.merge(self)
+        merged.merge(other)
+        return merged.count()
+
+class CountMinSketch:
+    """Count-min sketch: `depth` rows of `width` counters; estimates never undercount."""
+
+    __slots__ = ('width', 'depth', '_mask', '_rows')
+
+    def __init__(self, width=DEFAULT_SKETCH_WIDTH, depth=DEFAULT_SKETCH_DEPTH):
+        if width <= 0 or width & (width - 1):
+            raise ValueError(f"Sketch width must be a power of two, got {width}")
+        self.width = width
+        self.depth = depth
+        self._mask = width - 1
+        self._rows = [array('I', bytes(4 * width)) for _ in range(depth)]
+
+    def add(self, hashed, count=1):
+        """Count a 64-bit hashed key and return its new estimate."""
+        h1, h2, mask = hashed & 0xFFFFFFFF, (hashed >> 32) | 1, self._mask
+        estimate = None
+        for i, row in enumerate(self._rows):
+            j = (h1 + i * h2) & mask
+            value = row[j] = row[j] + count
+            if estimate is None or value < estimate:
+                estimate = value
+        return estimate
+
+    def estimate(self, hashed):
+        h1, h2, mask = hashed & 0xFFFFFFFF, (hashed >> 32) | 1, self._mask
+        return min(row[(h1 + i * h2) & mask] for i, row in enumerate(self._rows))
+
+    def clear(self):
+        for row in self._rows:
+            row[:] = array('I', bytes(4 * self.width))
+
+class UsageProfile:
+    """Fixed-size usage features of one DID (a few numbers and up to two distinct counters)."""
+
+    __slots__ = ('first_seen', 'last_seen', 'short', 'long', 'failures', 'window_start',
+                 'counterparties', 'previous_counterparties', 'pair_peak', 'pair_peak_at')
+
+    def __init__(self, timestamp, window_start):
+        self.first_seen = self.last_seen = timestamp
+        self.short = self.long = self.failures = 0.0  # Decayed event counts as of last_seen
+        self.window_start = window_start
+        self.counterparties = None  # HyperLogLogs of the current and previous window, created on first use
+        self.previous_counterparties = None
+        self.pair_peak = 0.0  # Most events to one counterparty in one bucket, decayed from pair_peak_at
+        self.pair_peak_at = timestamp
+
+class UsageAggregator:
+    """Streaming per-DID usage features in bounded memory, scored in constant time.
+
+    Events are (did, action, counterparty, timestamp) tuples. Each DID keeps
+    a UsageProfile:
+
+    - decayed event counters with a short and a long half-life (their
+      normalized ratio is the burst factor) plus a decayed count of
+      failure actions;
+    - a HyperLogLog of distinct counterparties, rotated every
+      `distinct_window` seconds so the count covers one to two windows;
+    - the decayed peak of events to a single counterparty within one
+      `bucket_seconds` bucket.
+
+    Per-bucket (did, counterparty) counts come from two count-min sketches
+    (the current and the previous bucket) shared by every DID, so hammering
+    one counterparty is detected without keeping per-pair state.
+
+    Time is stream time: the latest event timestamp seen, so replaying a
+    file gives the same scores as consuming it live. At most `max_profiles`
+    DIDs are tracked; when the limit is hit, the tenth that received events
+    least recently (in arrival order, so an approximate LRU by stream time)
+    is dropped. Profiles live in memory only.
+    """
+
+    def __init__(self, short_half_life=DEFAULT_SHORT_HALF_LIFE, long_half_life=DEFAULT_LONG_HALF_LIFE,
+                 distinct_window=DEFAULT_DISTINCT_WINDOW, hll_precision=DEFAULT_HLL_PRECISION,
+                 bucket_seconds=DEFAULT_BUCKET_SECONDS, sketch_width=DEFAULT_SKETCH_WIDTH,
+                 sketch_depth=DEFAULT_SKETCH_DEPTH, max_profiles=DEFAULT_MAX_PROFILES,
+                 failure_actions=DEFAULT_FAILURE_ACTIONS, activity_scale=20.0, diversity_scale=3.0,
+                 burst_threshold=10.0, pair_burst_threshold=30.0):
+        if not 0 < short_half_life < long_half_life:
+            raise ValueError("Half-lives must satisfy 0 < short_half_life < long_half_life")
+        self.short_half_life = short_half_life
+        self.long_half_life = long_half_life
+        self.distinct_window = distinct_window
+        HyperLogLog(hll_precision)  # Validates the precision
+        self.hll_precision = hll_precision
+        self.bucket_seconds = bucket_seconds
+        self.max_profiles = max_profiles
+        self.failure_actions = frozenset(failure_actions)
+        self.activity_scale = activity_scale  # Long-term events for an activity factor of 0.5
+        self.diversity_scale = diversity_scale  # Distinct counterparties for a diversity factor of 0.5
+        self.burst_threshold = burst_threshold  # Short/long rate ratio tolerated before the score drops
+        self.pair_burst_threshold = pair_burst_threshold  # Events to one counterparty per bucket tolerated
+        self._lock = threading.Lock()
+        self._profiles = OrderedDict()  # Least recently ingested first
+        self._pairs = CountMinSketch(sketch_width, sketch_depth)
+        self._previous_pairs = CountMinSketch(sketch_width, sketch_depth)
+        self._bucket = None
+        self.clock = None  # Latest event timestamp seen
+        self.events = 0
+        self.dropped_profiles = 0
+
+    def __len__(self):
+        return len(self._profiles)
+
+    def __contains__(self, did):
+        return did in self._profiles
+
+    def ingest(self, did, action, counterparty, timestamp):
+        self.ingest_many(((did, action, counterparty, timestamp),))
+
+    def ingest_many(self, events):
+        """Fold (did, action, counterparty, timestamp) events into the features. Returns the count.
+
+        The lock is held for INGEST_SLICE events at a time.
+        """
+        count = 0
+        events = iter(events)
+        while True:
+            with self._lock:
+                ingested = 0
+                for did, action, counterparty, timestamp in islice(events, INGEST_SLICE):
+                    self._ingest(did, action, counterparty, parse_timestamp(timestamp))
+                    ingested += 1
+                self.events += ingested
+            count += ingested
+            if ingested < INGEST_SLICE:
+                return count
+            time.sleep(0)  # Let a waiting reader take the lock before the next slice
+
+    def ingest_file(self, path, batch_size=10000):
+        """Ingest a JSON-lines file of {"did", "action", "counterparty", "timestamp"} objects."""
+        count = 0
+        with open(path) as f:
+            batch = []
+            for line in f:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                batch.append((event['did'], event.get('action', ''), event.get('counterparty', ''),
+                              event['timestamp']))
+                if len(batch) >= batch_size:
+                    count += self.ingest_many(batch)
+                    batch = []
+            count += self.ingest_many(batch)
+        return count
+
+    async def ingest_stream(self, events, batch_size=1000):
+        """Ingest events from an async iterator in batches, each folded in off the event loop. Returns the count."""
+        count = 0
+        batch = []
+        async for event in events:
+            batch.append(event)
+            if len(batch) >= batch_size:
+                count += await asyncio.to_thread(self.ingest_many, batch)
+                batch = []
+        return count + await asyncio.to_thread(self.ingest_many, batch)
+
+    def _ingest(self, did, action, counterparty, t):
+        if self.clock is None or t > self.clock:
+            self.clock = t
+        profile = self._profiles.get(did)
+        if profile is None:
+            if len(self._profiles) >= self.max_profiles:
+                self._shrink()
+            profile = self._profiles[did] = UsageProfile(t, t - t % self.distinct_window)
+        else:
+            self._profiles.move_to_end(did)
+
+        # Decayed counters: decay the state forward, or the increment back for late events
+        dt = t - profile.last_seen
+        if dt >= 0:
+            short_decay = 2.0 ** (-dt / self.short_half_life)
+            long_decay = 2.0 ** (-dt / self.long_half_life)
+            profile.short = profile.short * short_decay + 1.0
+            profile.long = profile.long * long_decay + 1.0
+            failed = action in self.failure_actions
+            profile.failures = profile.failures * long_decay + (1.0 if failed else 0.0)
+            profile.last_seen = t
+        else:
+            long_weight = 2.0 ** (dt / self.long_half_life)
+            profile.short += 2.0 ** (dt / self.short_half_life)
+            profile.long += long_weight
+            if action in self.failure_actions:
+                profile.failures += long_weight
+            profile.first_seen = min(profile.first_seen, t)
+
+        if not counterparty:
+            return
+        hashed = _hash64(counterparty)
+        if t >= profile.window_start + self.distinct_window:
+            elapsed = int((t - profile.window_start) // self.distinct_window)
+            profile.previous_counterparties = profile.counterparties if elapsed == 1 else None
+            profile.counterparties = None
+            profile.window_start += elapsed * self.distinct_window
+        if t >= profile.window_start:
+            if profile.counterparties is None:
+                profile.counterparties = HyperLogLog(self.hll_precision)
+            profile.counterparties.add(hashed)
+        elif t >= profile.window_start - self.distinct_window:
+            if profile.previous_counterparties is None:
+                profile.previous_counterparties = HyperLogLog(self.hll_precision)
+            profile.previous_counterparties.add(hashed)
+
+        bucket = int(t // self.bucket_seconds)
+        if self._bucket is None or bucket > self._bucket:
+            if self._bucket is not None and bucket == self._bucket + 1:
+                self._pairs, self._previous_pairs = self._previous_pairs, self._pairs
+            else:
+                self._previous_pairs.clear()
+            self._pairs.clear()
+            self._bucket = bucket
+        if bucket == self._bucket:
+            sketch = self._pairs
+        elif bucket == self._bucket - 1:
+            sketch = self._previous_pairs
+        else:
+            return
+        repeats = sketch.add(_hash64(f'{did}\x00{counterparty}'))
+        if repeats > self._decayed(profile.pair_peak, t - profile.pair_peak_at, self.short_half_life):
+            profile.pair_peak, profile.pair_peak_at = float(repeats), t
+
+    def _shrink(self):
+        # Drop the tenth of the profiles that received events least recently, oldest first
+        keep = max(0, self.max_profiles - max(1, self.max_profiles // 10))
+        dropped = max(0, len(self._profiles) - keep)
+        for _ in range(dropped):
+            self._profiles.popitem(last=False)
+        self.dropped_profiles += dropped
+
+    @staticmethod
+    def _decayed(value, age, half_life):
+        return value * 2.0 ** (-max(0.0, age) / half_life)
+
+    def _normalizer(self, age, half_life):
+        # Decayed count a steady rate of one event per second would have built up over `age` seconds
+        return half_life / math.log(2) * (1.0 - 2.0 ** (-age / half_life)) if age > 0 else 1.0
+
+    def features(self, did, now=None):
+        """Return a DID's usage features as of `now` (default: stream time), or None if it is untracked."""
+        with self._lock:  # Profiles and their counters change in place while events are ingested
+            return self._features(did, now)
+
+    def _features(self, did, now):
+        profile = self._profiles.get(did)
+        if profile is None:
+            return None
+        now = self.clock if now is None else max(now, profile.last_seen)
+        age = now - profile.last_seen
+        short = self._decayed(profile.short, age, self.short_half_life)
+        long = self._decayed(profile.long, age, self.long_half_life)
+        failures = self._decayed(profile.failures, age, self.long_half_life)
+        span = now - profile.first_seen
+        short_rate = short / self._normalizer(span, self.short_half_life)
+        long_rate = long / self._normalizer(span, self.long_half_life)
+        current, previous = profile.counterparties, profile.previous_counterparties
+        if now >= profile.window_start + 2 * self.distinct_window:
+            current = previous = None
+        elif now >= profile.window_start + self.distinct_window:
+            current, previous = None, current
+        counters = [counter for counter in (current, previous) if counter is not None]
+        distinct = (counters[0].union_count(counters[1]) if len(counters) == 2
+                    else counters[0].count() if counters else 0)
+        return {
+            'events_short': short,
+            'events_long': long,
+            'failure_ratio': failures / long if long else 0.0,
+            'burst': short_rate / long_rate if long_rate else 0.0,
+            'distinct_counterparties': distinct,
+            'pair_peak': self._decayed(profile.pair_peak, now - profile.pair_peak_at, self.short_half_life),
+            'first_seen': profile.first_seen,
+            'last_seen': profile.last_seen
+        }
+
+    def score(self, did, now=None):
+        """Usage trust score in [0, 1] for a DID, or None without usage history.
+
+        Sustained activity and counterparty diversity raise the score
+        (activity and diversity factors x / (x + scale), averaged); the
+        failure ratio, a burst ratio above `burst_threshold` and repeated
+        events to one counterparty above `pair_burst_threshold` lower it.
+        """
+        features = self.features(did, now)
+        if features is None:
+            return None
+        activity = features['events_long'] / (features['events_long'] + self.activity_scale)
+        diversity = features['distinct_counterparties'] / (features['distinct_counterparties'] + self.diversity_scale)
+        score = (activity + diversity) / 2 * (1.0 - features['failure_ratio'])
+        if features['burst'] > self.burst_threshold:
+            score *= self.burst_threshold / features['burst']
+        if features['pair_peak'] > self.pair_burst_threshold:
+            score *= self.pair_burst_threshold / features['pair_peak']
+        return min(1.0, max(0.0, score))
+
+    def stats(self):
+        return {'profiles': len(self._profiles), 'events': self.events, 'clock': self.clock,
+                'dropped_profiles': self.dropped_profiles}
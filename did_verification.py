@@ -1,9 +1,142 @@
+import os
 import re
+import sys
+import json
+import time
 import asyncio
 import argparse
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from did_metrics import counter, histogram
+
+UNSUPPORTED_DID_FORMAT = "Unsupported DID format"
+
+RESOLUTION_SECONDS = histogram('did_resolution_seconds', "Uncached DID metadata resolution latency",
+                               ('method', 'outcome'))
+METADATA_CACHE_REQUESTS = counter('did_metadata_cache_requests_total', "Metadata cache lookups by result",
+                                  ('result',))
+
+# Seconds a resolved metadata record stays fresh, per DID method
+METADATA_TTLS = {
+    'ethr': 300,
+    'sol': 300,
+    'w3c': 3600,
+    'agent': 60,
+    'fed': 60
+}
+
+def did_method(did):
+    """Return the method segment of a DID (`did:<method>:...`), or None."""
+    if not isinstance(did, str) or not did.startswith('did:'):
+        return None
+    end = did.find(':', 4)
+    return did[4:end] if end > 0 else None
+
+class MetadataCache:
+    """Bounded async TTL/LRU cache for DID metadata with single-flight lookups.
+
+    Concurrent misses for the same DID share one in-flight fetch. Records whose
+    status is not "verified" are cached for `negative_ttl` seconds only; fetch
+    errors are propagated to every waiter and never cached. A fetch that was
+    in flight when the cache was invalidated is not stored, and later
+    lookups start a fresh one.
+    """
+
+    def __init__(self, max_entries=10000, ttls=None, default_ttl=60, negative_ttl=15):
+        self.max_entries = max_entries
+        self.ttls = {**METADATA_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # did -> (expires_at, metadata)
+        self._inflight = {}  # did -> asyncio.Task
+        self._generation = 0  # Bumped by invalidate(); fetches started before it are not stored
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Return the cache counters."""
+        return {
+            'entries': len(self._entries),
+            'inflight': len(self._inflight),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+    def invalidate(self, did=None):
+        """Drop one DID, or every entry when `did` is None."""
+        self._generation += 1
+        if did is None:
+            self._entries.clear()
+            self._inflight.clear()
+        else:
+            self._entries.pop(did, None)
+            self._inflight.pop(did, None)
+
+    def _lookup(self, did):
+        entry = self._entries.get(did)
+        if entry is None:
+            return None
+        expires_at, metadata = entry
+        if expires_at <= time.monotonic():
+            del self._entries[did]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(did)
+        return metadata
+
+    def _store(self, did, did_type, metadata):
+        if metadata.get('status') == 'verified':
+            ttl = self.ttls.get(did_type, self.default_ttl)
+        else:
+            ttl = self.negative_ttl
+        if ttl <= 0:
+            return
+        self._entries[did] = (time.monotonic() + ttl, metadata)
+        self._entries.move_to_end(did)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, did, did_type, fetch):
+        """Return cached metadata for a DID, calling `fetch(did, did_type)` on a miss."""
+        metadata = self._lookup(did)
+        if metadata is not None:
+            self.hits += 1
+            METADATA_CACHE_REQUESTS.inc(result='hit')
+            return dict(metadata)
+
+        task = self._inflight.get(did)
+        if task is not None:
+            self.coalesced += 1
+            METADATA_CACHE_REQUESTS.inc(result='coalesced')
+        else:
+            self.misses += 1
+            METADATA_CACHE_REQUESTS.inc(result='miss')
+            task = asyncio.ensure_future(fetch(did, did_type))
+            self._inflight[did] = task
+            generation = self._generation
+            task.add_done_callback(lambda t: self._complete(did, did_type, generation, t))
+        # Shield so a cancelled caller does not cancel the fetch other waiters share
+        return dict(await asyncio.shield(task))
+
+    def _complete(self, did, did_type, generation, task):
+        if self._inflight.get(did) is task:
+            del self._inflight[did]
+        if generation == self._generation and not task.cancelled() and task.exception() is None:
+            self._store(did, did_type, task.result())
 
 class DIDVerifier:
-    def __init__(self):
+    def __init__(self, metadata_cache=None):
+        self.metadata_cache = metadata_cache if metadata_cache is not None else MetadataCache()
         self.did_patterns = {
             'ethr': r'^did:ethr:(?:0x)?[0-9a-fA-F]{40}$',
             'sol': r'^did:sol:[1-9A-HJ-NP-Za-km-z]{32,44}$',
@@ -11,24 +144,64 @@ class DIDVerifier:
             'agent': r'^did:agent:[a-zA-Z0-9_-]+$',  # New pattern for AI agents
             'fed': r'^did:fed:[a-zA-Z0-9_-]+$'  # New pattern for federated systems
         }
+        self.compile_patterns()
+
+    def compile_patterns(self):
+        """Precompile `did_patterns`, keyed by method. Call again after editing the patterns."""
+        self._compiled_patterns = {
+            method: re.compile(pattern) for method, pattern in self.did_patterns.items()
+        }
+
+    def classify(self, did):
+        """Return the DID method if the DID is well formed, otherwise None.
+
+        Dispatches on the method segment (`did:<method>:`) so only one anchored
+        pattern is ever matched per DID.
+        """
+        method = did_method(did)
+        pattern = self._compiled_patterns.get(method)
+        if pattern is not None and pattern.match(did):
+            return method
+        return None
 
     def validate(self, did):
         """Validate the DID format and return the matching type."""
-        for key, pattern in self.did_patterns.items():
-            if re.match(pattern, did):
-                return key
-        raise ValueError("Unsupported DID format")
+        did_type = self.classify(did)
+        if did_type is None:
+            raise ValueError(UNSUPPORTED_DID_FORMAT)
+        return did_type
+
+    def validate_many(self, dids):
+        """Classify an iterable of DIDs without raising.
+
+        Yields `(did, did_type, error)` tuples in input order; `did_type` is None
+        and `error` holds the message for DIDs that do not validate.
+        """
+        classify = self.classify
+        for did in dids:
+            did_type = classify(did)
+            yield did, did_type, None if did_type is not None else UNSUPPORTED_DID_FORMAT
 
     async def fetch_metadata(self, did):
         """Fetch metadata for a DID to verify its legitimacy."""
         did_type = self.validate(did)
-        
-        if did_type in ["ethr", "sol"]:
-            return await self.fetch_onchain_metadata(did)
-        elif did_type in ["agent", "fed"]:
-            return await self.fetch_offchain_metadata(did)
-        else:
-            return {"status": "unknown", "details": "No verification method available"}
+        return await self.metadata_cache.get(did, did_type, self.resolve_metadata)
+
+    async def resolve_metadata(self, did, did_type):
+        """Resolve metadata for an already-classified DID, bypassing the cache."""
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            if did_type in ["ethr", "sol"]:
+                metadata = await self.fetch_onchain_metadata(did)
+            elif did_type in ["agent", "fed"]:
+                metadata = await self.fetch_offchain_metadata(did)
+            else:
+                metadata = {"status": "unknown", "details": "No verification method available"}
+            outcome = metadata.get('status', 'unknown')
+            return metadata
+        finally:
+            RESOLUTION_SECONDS.observe(time.perf_counter() - start, method=did_type, outcome=outcome)
 
     async def fetch_onchain_metadata(self, did):
         """Mock function to simulate on-chain verification."""
@@ -48,11 +221,166 @@ class DIDVerifier:
         except ValueError:
             return False
 
+### 🔥 Streaming mode: validate DID lists of any size with flat memory
+def read_dids(lines):
+    """Yield stripped, non-empty lines as DIDs."""
+    for line in lines:
+        did = line.strip()
+        if did:
+            yield did
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+_worker_verifier = None
+
+def _init_worker():
+    global _worker_verifier
+    _worker_verifier = DIDVerifier()
+
+def _classify_chunk(dids):
+    """Return the method of every DID in a chunk (None if invalid); runs in pool workers."""
+    return [did_type for _, did_type, _ in _worker_verifier.validate_many(dids)]
+
+async def classify_stream(dids, workers=None, chunk_size=10000, prefetch=2):
+    """Classify an iterable of DIDs across a process pool, yielding `(chunk, methods)` in input order.
+
+    Input is consumed lazily and at most `workers * prefetch` chunks are in
+    flight, so memory stays bounded by the chunk size whatever the input
+    length. Pool results are awaited, so other coroutines (metadata
+    lookups) keep running while chunks are classified. `workers=1`
+    classifies in one worker thread instead of a process pool.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        pool = ThreadPoolExecutor(max_workers=1, initializer=_init_worker)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    try:
+        window = deque()
+        for chunk in _chunks(dids, chunk_size):
+            window.append((chunk, asyncio.wrap_future(pool.submit(_classify_chunk, chunk))))
+            if len(window) >= workers * prefetch:
+                chunk, future = window.popleft()
+                yield chunk, await future
+        while window:
+            chunk, future = window.popleft()
+            yield chunk, await future
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+async def _resolve_chunk(verifier, entries, semaphore):
+    """Resolve (did, did_type) pairs with at most `semaphore` lookups in flight."""
+    async def resolve(did, did_type):
+        async with semaphore:
+            try:
+                return await verifier.metadata_cache.get(did, did_type, verifier.resolve_metadata), None
+            except Exception as e:
+                return None, str(e)
+    return await asyncio.gather(*(resolve(did, did_type) for did, did_type in entries))
+
+def _write_records(out, chunk, did_types, resolved, methods, statuses):
+    """Write one chunk's JSON results and count them; `resolved` maps DIDs to (metadata, error) or is None."""
+    lines = []
+    for did, did_type in zip(chunk, did_types):
+        methods[did_type] += 1
+        if did_type is None:
+            record = {'did': did, 'valid': False, 'error': UNSUPPORTED_DID_FORMAT}
+        else:
+            record = {'did': did, 'valid': True, 'method': did_type}
+            if resolved is not None:
+                metadata, error = resolved[did]
+                if error is None:
+                    record['metadata'] = metadata
+                    statuses[metadata.get('status', 'unknown')] += 1
+                else:
+                    record['error'] = error
+                    statuses['error'] += 1
+        lines.append(json.dumps(record))
+    out.write('\n'.join(lines) + '\n')
+
+async def verify_stream(dids, out, workers=None, chunk_size=10000, resolve=False, concurrency=100, verifier=None):
+    """Validate (and optionally resolve) a stream of DIDs, writing one JSON result per line to `out`.
+
+    A chunk's metadata lookups run while the next chunks are classified;
+    results are written in input order. Returns a summary with the total,
+    valid and invalid counts, the count per DID method and, when
+    resolving, the count per metadata status.
+    """
+    verifier = verifier or DIDVerifier()
+    semaphore = asyncio.Semaphore(concurrency)
+    methods = Counter()
+    statuses = Counter()
+
+    async def resolve_chunk(chunk, did_types):
+        entries = [(did, did_type) for did, did_type in zip(chunk, did_types) if did_type]
+        results = await _resolve_chunk(verifier, entries, semaphore)
+        return dict(zip((did for did, _ in entries), results))
+
+    async def write(chunk, did_types, resolving):
+        _write_records(out, chunk, did_types, await resolving if resolving else None, methods, statuses)
+
+    previous = None  # The chunk whose lookups are running while the next one is classified
+    try:
+        async for chunk, did_types in classify_stream(dids, workers, chunk_size):
+            resolving = asyncio.ensure_future(resolve_chunk(chunk, did_types)) if resolve else None
+            if previous is not None:
+                await write(*previous)
+            previous = chunk, did_types, resolving
+        if previous is not None:
+            await write(*previous)
+            previous = None
+    finally:
+        if previous is not None and previous[2] is not None:
+            previous[2].cancel()
+
+    invalid = methods.pop(None, 0)
+    summary = {
+        'total': sum(methods.values()) + invalid,
+        'valid': sum(methods.values()),
+        'invalid': invalid,
+        'methods': dict(sorted(methods.items()))
+    }
+    if resolve:
+        summary['resolution'] = dict(sorted(statuses.items()))
+    return summary
+
 def main():
     parser = argparse.ArgumentParser(description="DID Validator")
-    parser.add_argument('did', type=str, help="Decentralized Identifier to validate")
+    parser.add_argument('did', type=str, nargs='?', help="Decentralized Identifier to validate")
+    parser.add_argument('-i', '--input', help="Validate DIDs from a file, one per line ('-' for stdin)")
+    parser.add_argument('-o', '--output', default='-', help="JSONL results file in streaming mode (default stdout)")
+    parser.add_argument('--workers', type=int, default=None, help="Classifier processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="DIDs per classification chunk")
+    parser.add_argument('--resolve', action='store_true', help="Also resolve metadata for valid DIDs")
+    parser.add_argument('--concurrency', type=int, default=100, help="Metadata lookups in flight with --resolve")
     args = parser.parse_args()
     did = args.did
+    if did is not None and args.input is not None:
+        parser.error("give either a DID or --input, not both")
+
+    if did is None:
+        if args.input is None and sys.stdin.isatty():
+            parser.error("give a DID, --input FILE, or DIDs on stdin")
+        source = sys.stdin if args.input in (None, '-') else open(args.input)
+        out = sys.stdout if args.output == '-' else open(args.output, 'w')
+        try:
+            summary = asyncio.run(verify_stream(read_dids(source), out, args.workers, args.chunk_size,
+                                                args.resolve, args.concurrency))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if out is not sys.stdout:
+                out.close()
+        print(json.dumps(summary), file=sys.stderr)
+        return
 
     verifier = DIDVerifier()
 
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import did_trust_scoring as trust
+
+
+@pytest.fixture
+def use_database(tmp_path, monkeypatch):
+    """Return use(name='trust', shards=1), which points the scoring module at a fresh SQLite database."""
+    sqlite_config = trust.DATABASE_CONFIG['backends']['sqlite']
+    monkeypatch.setitem(trust.DATABASE_CONFIG, 'default', 'sqlite')
+    monkeypatch.setitem(trust.DATABASE_CONFIG, 'retry_delay', 0.01)
+    monkeypatch.setitem(sqlite_config, 'NAME', sqlite_config['NAME'])
+    monkeypatch.setitem(sqlite_config, 'SHARDS', sqlite_config['SHARDS'])
+    monkeypatch.setattr(trust, 'score_cache', trust.score_cache)
+
+    def use(name='trust', shards=1):
+        trust.shutdown_db_executor()
+        trust.close_pools()
+        sqlite_config['NAME'] = str(tmp_path / f'{name}.db')
+        sqlite_config['SHARDS'] = shards
+        trust.policy_index = trust.PolicyIndex()  # Rule versions of another database mean nothing here
+        trust.score_cache = trust.ScoreCache()
+        trust.init_db()
+        return sqlite_config['NAME']
+
+    yield use
+    trust.shutdown_db_executor()
+    trust.close_pools()
+    trust.policy_index = trust.PolicyIndex()
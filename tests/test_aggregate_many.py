@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+
+import pytest
+
+import did_trust_scoring as trust
+
+DIDS = [f'did:agent:{i}' for i in range(50)] + ['did:ethr:0x' + 'ab' * 20, 'did:agent:silent']
+
+
+def _source_score(name, did):
+    if did == 'did:agent:silent':
+        return None
+    return hashlib.blake2b(f'{name}:{did}'.encode(), digest_size=2).digest()[0] / 255
+
+
+@pytest.fixture
+def in_flight(use_database, monkeypatch):
+    """Stub the trust sources with per-DID scores; returns the in-flight DID counters."""
+    use_database()
+    state = {'now': 0, 'max': 0}
+
+    def stub(name):
+        async def fetch(did):
+            if name == 'onchain':
+                state['now'] += 1
+                state['max'] = max(state['max'], state['now'])
+            try:
+                await asyncio.sleep(0.002)
+                return {'score': _source_score(name, did)}
+            finally:
+                if name == 'onchain':
+                    state['now'] -= 1
+        return fetch
+
+    monkeypatch.setattr(trust, 'trust_sources',
+                        lambda: {name: stub(name) for name in ('onchain', 'federated', 'usage', 'social')})
+    return state
+
+
+def _stored_score(did):
+    with trust.db_connection(did=did) as conn:
+        row = conn.execute('SELECT score FROM did_scores WHERE did = ?', (did,)).fetchone()
+    return row[0] if row else None
+
+
+def test_aggregate_many_matches_single_did_aggregation(in_flight, monkeypatch):
+    flushed = []
+    insert = trust.insert_trust_scores
+
+    def recording_insert(rows, chunk_size=1000, proof_batch=None):
+        flushed.append(len(rows))
+        return insert(rows, chunk_size, proof_batch)
+
+    monkeypatch.setattr(trust, 'insert_trust_scores', recording_insert)
+
+    async def collect():
+        reports = []
+        async for report in trust.aggregate_many(iter(DIDS), concurrency=5, chunk_size=12):
+            assert _stored_score(report['did']) == report['score']  # Committed before it is yielded
+            reports.append(report)
+        return reports
+
+    reports = asyncio.run(collect())
+
+    assert sorted(report['did'] for report in reports) == sorted(DIDS)
+    assert 1 < in_flight['max'] <= 5
+    # A flush starts once a chunk is full; tasks finishing together may add up to concurrency - 1 more
+    assert sum(flushed) == len(DIDS) - 1
+    assert all(12 <= rows < 12 + 5 for rows in flushed[:-1])
+    silent = next(report for report in reports if report['did'] == 'did:agent:silent')
+    assert silent['score'] is None and sorted(silent['missing']) == ['federated', 'onchain', 'social', 'usage']
+
+    monkeypatch.setattr(trust, 'insert_trust_scores', insert)
+    for report in reports:
+        assert asyncio.run(trust.aggregate_trust_score(report['did'], refresh=True)) == report['score']
+
+
+def test_aggregate_many_registers_its_proof_batch(in_flight):
+    async def drain():
+        return [report async for report in trust.aggregate_many(DIDS, concurrency=8, chunk_size=10)]
+
+    asyncio.run(drain())
+
+    with trust.db_connection() as conn:
+        batches = conn.execute("SELECT label, leaf_count FROM proof_batches").fetchall()
+    assert {label for label, _ in batches} == {'aggregate_many'}
+    assert sum(leaf_count for _, leaf_count in batches) == len(DIDS) - 1  # One score event per stored DID
+    assert trust.verify_proof_batches()['broken'] == []
+    assert trust.seal_ledger() == []  # Nothing left over for the sealer
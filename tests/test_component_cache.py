@@ -0,0 +1,135 @@
+import asyncio
+import time
+
+import pytest
+
+import did_trust_scoring as trust
+from did_social_graph import SocialTrustGraph
+
+STUB_SCORES = {'onchain': 0.8, 'federated': 0.6, 'usage': 0.4}
+
+
+class Clock:
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def sources(use_database, monkeypatch):
+    """Stub the non-social sources with call counters and freeze the component cache's clock."""
+    use_database()
+    calls = []
+
+    def stub(name):
+        async def fetch(did):
+            calls.append((name, did))
+            return {'score': STUB_SCORES[name]}
+        return fetch
+
+    stubs = {name: stub(name) for name in STUB_SCORES}
+    stubs['social'] = trust.fetch_social_signals
+    monkeypatch.setattr(trust, 'trust_sources', lambda: dict(stubs))
+    graph = SocialTrustGraph()
+    graph.update_edges([('did:agent:a', 'did:agent:b', 1.0), ('did:agent:b', 'did:agent:a', 1.0)])
+    graph.propagate()
+    monkeypatch.setattr(trust, 'social_graph', graph)
+    clock = Clock()
+    monkeypatch.setattr(time, 'time', clock)
+    return calls, clock
+
+
+def _report(did, refresh=False):
+    return asyncio.run(trust.aggregate_trust_report(did, refresh=refresh))
+
+
+def _fetched(calls):
+    fetched = sorted(name for name, _ in calls)
+    calls.clear()
+    return fetched
+
+
+def test_only_expired_sources_are_refetched(sources, monkeypatch):
+    calls, clock = sources
+    for name, ttl in {'onchain': 600, 'federated': 900, 'usage': 300, 'social': 86400}.items():
+        monkeypatch.setitem(trust.TRUST_SOURCE_TTLS, name, ttl)
+
+    first = _report('did:agent:a')
+    assert _fetched(calls) == ['federated', 'onchain', 'usage'] and first['cached'] == []
+
+    clock.now += 299
+    assert _report('did:agent:a')['cached'] == ['onchain', 'federated', 'usage', 'social']
+    assert _fetched(calls) == []
+
+    clock.now += 2  # Past the usage TTL only
+    report = _report('did:agent:a')
+    assert _fetched(calls) == ['usage']
+    assert report['cached'] == ['onchain', 'federated', 'social']
+    assert report['score'] == first['score']
+
+    clock.now += 400  # Past onchain (600s) but not federated (900s)
+    _report('did:agent:a')
+    assert _fetched(calls) == ['onchain', 'usage']
+
+
+def test_refresh_bypasses_the_cache(sources):
+    calls, _ = sources
+    _report('did:agent:a')
+    calls.clear()
+    report = _report('did:agent:a', refresh=True)
+    assert _fetched(calls) == ['federated', 'onchain', 'usage']
+    assert report['cached'] == []
+    assert _report('did:agent:a')['cached'] == ['onchain', 'federated', 'usage', 'social']
+
+
+def test_invalidated_component_is_refetched(sources):
+    calls, _ = sources
+    _report('did:agent:a')
+    calls.clear()
+    assert trust.invalidate_trust_component('did:agent:a', 'federated') == 1
+    assert _report('did:agent:a')['cached'] == ['onchain', 'usage', 'social']
+    assert _fetched(calls) == ['federated']
+
+
+def _expired(source):
+    with trust.db_connection() as conn:
+        return {did for (did,) in conn.execute(
+            'SELECT did FROM trust_components WHERE source = ? AND expires_at = 0', (source,))}
+
+
+def test_social_refresh_expires_only_changed_social_components(sources, monkeypatch):
+    calls, _ = sources
+    monkeypatch.setitem(trust.SOCIAL_GRAPH_CONFIG, 'min_delta', 0.06)
+    trust.social_graph.update_edges([('did:agent:a', 'did:agent:x', 1.0),
+                                     ('did:agent:d', 'did:agent:e', 1.0), ('did:agent:e', 'did:agent:d', 1.0)])
+    trust.social_graph.propagate()
+    dids = ['did:agent:a', 'did:agent:b', 'did:agent:x', 'did:agent:d', 'did:agent:e']
+    for did in dids:
+        assert 'social' in _report(did)['components']
+    calls.clear()
+
+    trust.social_graph.update_edges([('did:agent:a', 'did:agent:x', 0.1)])  # Shifts trust from x to b
+    summary = trust.refresh_social_trust()
+
+    changed = set(trust.social_graph.changed_dids(0.06))
+    assert changed == {'did:agent:a', 'did:agent:b', 'did:agent:x'}
+    assert summary['warm'] and summary['expired'] == 3
+    assert _expired('social') == changed
+    assert _expired('onchain') == set()
+    report = _report('did:agent:a')
+    assert report['cached'] == ['onchain', 'federated', 'usage']
+    assert report['components']['social'] == pytest.approx(trust.social_graph.score('did:agent:a'))
+    assert _report('did:agent:d')['cached'] == ['onchain', 'federated', 'usage', 'social']
+    assert _fetched(calls) == []  # Social is a graph lookup; no other source was queried again
+
+
+def test_cold_social_refresh_expires_every_social_component(sources):
+    calls, _ = sources
+    _report('did:agent:a')
+    _report('did:agent:b')
+    assert trust.refresh_social_trust(warm=False)['expired'] == 2
+    for did in ('did:agent:a', 'did:agent:b'):
+        assert trust.load_trust_components(did)['social'][1] == 0
+        assert trust.load_trust_components(did)['onchain'][1] > 0
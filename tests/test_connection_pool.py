@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+import did_trust_scoring as trust
+
+
+@pytest.fixture
+def pool(use_database):
+    use_database()
+    pool = trust.ConnectionPool(max_size=2, timeout=0.05, health_check_interval=0)
+    yield pool
+    pool.close()
+
+
+def test_exhausted_pool_times_out(pool):
+    acquired, release = threading.Barrier(3), threading.Event()
+
+    def hold():
+        with pool.connection():
+            acquired.wait()
+            release.wait()
+
+    holders = [threading.Thread(target=hold) for _ in range(2)]
+    for holder in holders:
+        holder.start()
+    acquired.wait()
+    try:
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+    finally:
+        release.set()
+        for holder in holders:
+            holder.join()
+    with pool.connection():  # Returned connections are handed out again
+        pass
+    assert pool.stats()['created'] == 2
+
+
+def test_nested_checkouts_reuse_the_owners_connection(pool):
+    with pool.connection() as outer:
+        with pool.connection() as inner:
+            assert inner is outer
+        assert pool.stats()['in_use'] == 1
+    stats = pool.stats()
+    assert (stats['checkouts'], stats['in_use'], stats['idle']) == (1, 0, 1)
+
+
+def test_error_rolls_back_the_whole_checkout(pool):
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO did_scores (did, score) VALUES ('did:agent:lost', 0.5)")
+            with pool.connection() as nested:
+                nested.execute("INSERT INTO did_scores (did, score) VALUES ('did:agent:nested', 0.5)")
+            raise RuntimeError("boom")
+    with pool.connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM did_scores').fetchone()[0] == 0
+        conn.execute("INSERT INTO did_scores (did, score) VALUES ('did:agent:kept', 0.5)")
+    with pool.connection() as conn:
+        assert conn.execute('SELECT did FROM did_scores').fetchall() == [('did:agent:kept',)]
+
+
+def test_health_check_ping_replaces_dead_connections(pool):
+    with pool.connection() as conn:
+        pass
+    conn.close()  # Dies while idle
+
+    with pool.connection() as fresh:
+        assert fresh is not conn
+        assert fresh.execute('SELECT 1').fetchone() == (1,)
+    assert pool.stats()['discarded'] == 1
+
+    fresh.close()
+    assert pool.health_check() == 1
+    assert pool.stats()['idle'] == 0
+
+
+def test_only_sqlite_is_supported():
+    with pytest.raises(ValueError, match='postgresql'):
+        trust.get_database_connection('postgresql')
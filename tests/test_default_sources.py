@@ -0,0 +1,21 @@
+import asyncio
+
+import did_trust_scoring as trust
+
+
+def test_stock_config_scores_from_onchain_only(use_database, monkeypatch):
+    """No federated nodes, no usage stream and no endorsements: only the on-chain source answers."""
+    use_database()
+    monkeypatch.setitem(trust.FEDERATION_CONFIG, 'nodes', [])
+    monkeypatch.setattr(trust, 'federated_client', trust.new_federated_client())
+    monkeypatch.setattr(trust, 'usage_aggregator', trust.new_usage_aggregator())
+    monkeypatch.setattr(trust, 'social_graph', trust.new_social_graph())
+    trust.social_graph.propagate()
+
+    report = asyncio.run(trust.aggregate_trust_report('did:agent:stock'))
+
+    assert report['components'] == {'onchain': 0.8}
+    assert sorted(report['missing']) == ['federated', 'social', 'usage']
+    assert report['partial'] is True
+    assert report['score'] == 0.8
+    assert trust.get_trust_score('did:agent:stock') == 0.8
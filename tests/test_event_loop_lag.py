@@ -0,0 +1,122 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+
+import did_trust_scoring as trust
+
+TICK = 0.001
+LOCK_HOLD = 0.25  # Each time the contending writer takes the database
+LOCK_ROUNDS = 3
+MAX_LAG = 0.1  # Well below LOCK_HOLD: a coroutine waiting on the lock in-loop would exceed it
+
+
+def _hold_write_lock(path, stop, holds):
+    """Take the database write lock a few times, like a long-running writer in another process."""
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    try:
+        while len(holds) < LOCK_ROUNDS and not stop.is_set():
+            conn.execute('BEGIN IMMEDIATE')
+            holds.append(time.perf_counter())
+            time.sleep(LOCK_HOLD)
+            conn.execute('COMMIT')
+            time.sleep(0.05)
+    finally:
+        conn.close()
+
+
+async def _ticker(lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def _under_contention(path, workload):
+    """Run `workload` while another connection keeps locking the database; return the worst tick lag."""
+    lags, ticking, locking, holds = [], asyncio.Event(), threading.Event(), []
+    locker = threading.Thread(target=_hold_write_lock, args=(path, locking, holds))
+    locker.start()
+    ticker = asyncio.ensure_future(_ticker(lags, ticking))
+    try:
+        while not holds:
+            await asyncio.sleep(TICK)
+        result = await workload()
+    finally:
+        ticking.set()
+        locking.set()
+        await ticker
+        locker.join()
+    return max(lags), result
+
+
+def test_async_paths_keep_the_loop_responsive_under_lock_contention(use_database):
+    path = use_database()
+    dids = [f'did:agent:lag-{i}' for i in range(24)]
+
+    async def workload():
+        scores = await asyncio.gather(*(trust.aggregate_trust_score(did) for did in dids[:8]))
+        await asyncio.gather(*(trust.update_trust_ledger_async(did, 0.5) for did in dids[8:]))
+        await trust.run_db(trust.insert_trust_scores, [(did, 0.6) for did in dids[8:16]])
+        return scores
+
+    lag, scores = asyncio.run(_under_contention(path, workload))
+
+    assert lag < MAX_LAG, f"event loop stalled for {lag * 1000:.0f} ms"
+    assert all(score is not None for score in scores)
+    for did in dids[8:]:
+        assert [entry['event'] for entry in trust.ledger_range(did)][0] == 'score'
+    assert trust.get_trust_score(dids[8]) == 0.6
+
+
+def test_run_db_lock_retries_back_off_without_blocking_the_loop(use_database, monkeypatch):
+    """Lock errors that outlast busy_timeout are retried by run_db() with asyncio.sleep, not time.sleep."""
+    path = use_database()
+    monkeypatch.setitem(trust.DATABASE_CONFIG, 'retry_delay', LOCK_HOLD)
+    attempts = []
+
+    def locked_twice(did, score):
+        attempts.append(did)
+        if len(attempts) < 3:
+            raise sqlite3.OperationalError('database is locked')
+        trust.insert_trust_score(did, score)
+
+    async def workload():
+        await trust.run_db(locked_twice, 'did:agent:retried', 0.4)
+
+    lag, _ = asyncio.run(_under_contention(path, workload))
+
+    assert lag < MAX_LAG, f"event loop stalled for {lag * 1000:.0f} ms"
+    assert len(attempts) == 3
+    assert trust.get_trust_score('did:agent:retried') == 0.4
+
+
+def test_usage_scoring_does_not_wait_on_the_loop_for_ingestion(use_database, monkeypatch, tmp_path):
+    """Scores are read while consume_usage_events() folds in a large file from a worker thread."""
+    use_database()
+    monkeypatch.setattr(trust, 'usage_aggregator', trust.new_usage_aggregator())
+    dids = [f'did:agent:usage-{i}' for i in range(50)]
+    events = tmp_path / 'usage.jsonl'
+    with open(events, 'w') as f:
+        for i in range(60000):
+            f.write(json.dumps({'did': dids[i % len(dids)], 'action': 'call', 'counterparty': f'did:agent:peer-{i % 13}',
+                                'timestamp': 1_700_000_000 + i}) + '\n')
+    trust.usage_aggregator.ingest_many((did, 'call', 'did:agent:peer-0', 1_699_999_999) for did in dids)
+
+    async def workload():
+        lags, ticking = [], asyncio.Event()
+        ticker = asyncio.ensure_future(_ticker(lags, ticking))
+        consumer = asyncio.ensure_future(trust.consume_usage_events(str(events)))
+        reports = []
+        while not consumer.done():
+            reports += await asyncio.gather(*(trust.aggregate_trust_report(did, refresh=True) for did in dids[:10]))
+        ticking.set()
+        await ticker
+        return max(lags), await consumer, reports
+
+    lag, ingested, reports = asyncio.run(workload())
+
+    assert lag < MAX_LAG, f"event loop stalled for {lag * 1000:.0f} ms"
+    assert ingested == 60000
+    assert reports and all('usage' in report['components'] for report in reports)
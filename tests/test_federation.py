@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+import did_trust_scoring as trust
+from did_federation import FederatedQuorumClient, StandInNode, http_get_json, stand_in_score
+
+DID = 'did:agent:federated'
+
+
+async def _with_nodes(count, query, **options):
+    nodes = [await StandInNode(**options, seed=i).start() for i in range(count)]
+    try:
+        return await query([node.url for node in nodes])
+    finally:
+        for node in nodes:
+            await node.stop()
+
+
+@pytest.mark.parametrize('chunked', [False, True])
+def test_http_get_json_reads_framed_bodies(chunked):
+    async def get(urls):
+        # A chunked node keeps the connection open: reading to EOF would time out here
+        return await asyncio.wait_for(http_get_json(f'{urls[0]}/trust/{DID}'), timeout=1.0)
+
+    assert asyncio.run(_with_nodes(1, get, chunked=chunked)) == {'did': DID, 'score': stand_in_score(DID)}
+
+
+def test_quorum_over_chunked_nodes():
+    async def query(urls):
+        return await FederatedQuorumClient(urls, quorum=2, node_timeout=1.0).query(DID)
+
+    result = asyncio.run(_with_nodes(3, query, chunked=True))
+    assert result['score'] == stand_in_score(DID)
+    assert result['agreeing'] >= 2
+
+
+def test_federation_errors_report_the_source_missing(monkeypatch):
+    class BrokenClient:
+        async def query(self, did):
+            raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(trust, 'federated_client', BrokenClient())
+    assert asyncio.run(trust.fetch_federated_nodes(DID)) == {'score': None}
@@ -0,0 +1,52 @@
+import pytest
+
+import did_trust_scoring as trust
+
+DIDS = [f'did:agent:{i}' for i in range(40)]
+
+
+def _decisions(summary):
+    return sum(summary[action] for action in (*trust.ACTION_PRECEDENCE, 'pass'))
+
+
+@pytest.mark.parametrize('shards', [1, 4])
+def test_fresh_checkpoint_decides_each_did_once(use_database, shards):
+    use_database(shards=shards)
+    trust.insert_trust_scores([(did, 0.2) for did in DIDS])
+    trust.add_policy_rule('low', 0.3, 'restrict')
+
+    summary = trust.incremental_enforce_trust()
+
+    assert summary['restrict'] == len(DIDS)
+    assert summary['newly_flagged'] == len(DIDS)
+    assert _decisions(summary) == len(DIDS)
+    assert all(trust.is_restricted(did) for did in DIDS)
+    assert _decisions(trust.incremental_enforce_trust()) == 0
+
+
+def test_single_did_counts_once(use_database):
+    use_database()
+    trust.insert_trust_score(DIDS[0], 0.1)
+    trust.add_policy_rule('low', 0.3, 'restrict')
+
+    assert trust.incremental_enforce_trust()['restrict'] == 1
+
+
+def test_rule_and_score_changes_in_one_sweep(use_database):
+    use_database()
+    trust.insert_trust_scores([(did, 0.6) for did in DIDS])
+    trust.add_policy_rule('low', 0.3, 'restrict')
+    trust.incremental_enforce_trust()
+
+    # A new rule covers [0.3, 0.5); a few DIDs move into it, out of it, or stay elsewhere
+    trust.add_policy_rule('mid', 0.5, 'alert')
+    trust.insert_trust_scores([(did, 0.4) for did in DIDS[:10]])
+    trust.insert_trust_scores([(did, 0.45) for did in DIDS[:5]])
+    trust.insert_trust_scores([(did, 0.9) for did in DIDS[10:15]])
+
+    summary = trust.incremental_enforce_trust()
+
+    assert summary['alert'] == 10
+    assert summary['pass'] == 5
+    assert _decisions(summary) == 15
+    assert _decisions(trust.incremental_enforce_trust()) == 0
@@ -0,0 +1,152 @@
+import json
+
+import pytest
+
+import did_trust_scoring as trust
+
+
+def _write(did, score, event='score', timestamp=None):
+    with trust.db_connection(did=did) as conn:
+        trust.begin_write(conn)
+        return trust.append_ledger_event(conn.cursor(), did, score, event, timestamp)
+
+
+def _execute(sql, params=()):
+    with trust.db_connection() as conn:
+        conn.execute(sql, params)
+
+
+@pytest.fixture
+def ledger(use_database):
+    use_database()
+    for score in (0.5, 0.6, 0.7):
+        trust.update_trust_ledger('did:agent:a', score)
+    trust.update_trust_ledger('did:agent:b', 0.4)
+    return trust.ledger_tail('did:agent:a')
+
+
+def test_intact_chains_verify(ledger):
+    assert [entry['prev_hash'] for entry in ledger] == [trust.GENESIS_HASH] + [e['hash'] for e in ledger[:-1]]
+    assert trust.verify_ledger_chain() == {'checked': 4, 'dids': 2, 'broken': []}
+    assert trust.verify_ledger_chain('did:agent:a') == {'checked': 3, 'dids': 1, 'broken': []}
+
+
+def test_edited_score_is_a_hash_mismatch(ledger):
+    _execute('UPDATE trust_ledger_events SET trust_score = 0.9 WHERE seq = ?', (ledger[1]['seq'],))
+    assert trust.verify_ledger_chain()['broken'] == [
+        {'did': 'did:agent:a', 'seq': ledger[1]['seq'], 'reason': 'hash mismatch'}]
+
+
+def test_deleted_entry_breaks_the_next_link(ledger):
+    _execute('DELETE FROM trust_ledger_events WHERE seq = ?', (ledger[1]['seq'],))
+    assert trust.verify_ledger_chain('did:agent:a')['broken'] == [
+        {'did': 'did:agent:a', 'seq': ledger[2]['seq'], 'reason': 'chain link mismatch'}]
+
+
+def test_truncated_chain_no_longer_matches_its_head(ledger):
+    _execute('DELETE FROM trust_ledger_events WHERE seq = ?', (ledger[2]['seq'],))
+    assert trust.verify_ledger_chain('did:agent:a')['broken'] == [
+        {'did': 'did:agent:a', 'seq': None, 'reason': 'head mismatch'}]
+
+    _execute("DELETE FROM trust_ledger_events WHERE did = 'did:agent:b'")
+    reasons = [item['reason'] for item in trust.verify_ledger_chain()['broken']]
+    assert reasons == ['head mismatch', 'heads without entries']
+
+
+def test_timestamps_never_go_backwards(use_database):
+    use_database()
+    _write('did:agent:a', 0.5, timestamp='2026-06-01T12:00:00.000000')
+    _write('did:agent:a', 0.6, timestamp='2026-06-01T11:00:00.000000')  # Clock stepped back
+    with trust.db_connection() as conn:
+        trust.begin_write(conn)
+        trust.append_ledger_events(conn.cursor(), [('did:agent:a', 0.7, 'score'), ('did:agent:b', 0.1, 'score')],
+                                   timestamp='2026-06-01T10:00:00.000000')
+    _write('did:agent:a', 0.8, timestamp='2026-06-01T13:00:00.000000')
+
+    entries = list(trust.ledger_range('did:agent:a'))
+    assert [entry['trust_score'] for entry in entries] == [0.5, 0.6, 0.7, 0.8]
+    assert [entry['timestamp'][11:13] for entry in entries] == ['12', '12', '12', '13']
+    assert trust.ledger_tail('did:agent:b')[0]['timestamp'] == '2026-06-01T10:00:00.000000'
+    assert trust.verify_ledger_chain()['broken'] == []
+
+
+def test_legacy_json_ledgers_are_migrated_in_time_order(use_database):
+    use_database()
+    legacy = {
+        'did:agent:old': [{'timestamp': '2025-03-02 08:00:00.250000', 'trust_score': 0.6, 'hash': 'x'},
+                          {'timestamp': '2025-03-01 08:00:00', 'trust_score': 0.5, 'hash': 'y'},
+                          {'timestamp': '2025-03-03T08:00:00', 'trust_score': 0.7}],
+        'did:agent:empty': []
+    }
+    _execute('CREATE TABLE trust_ledger (did TEXT PRIMARY KEY, trust_history TEXT)')
+    with trust.db_connection() as conn:
+        conn.executemany('INSERT INTO trust_ledger VALUES (?, ?)',
+                         [(did, json.dumps(history)) for did, history in legacy.items()])
+
+    assert trust.migrate_trust_ledger() == 3
+    assert trust.migrate_trust_ledger() == 0  # The legacy table was renamed
+
+    entries = list(trust.ledger_range('did:agent:old'))
+    assert [(entry['timestamp'], entry['event'], entry['trust_score']) for entry in entries] == [
+        ('2025-03-01T08:00:00.000000', 'migrated', 0.5),
+        ('2025-03-02T08:00:00.250000', 'migrated', 0.6),
+        ('2025-03-03T08:00:00.000000', 'migrated', 0.7)]
+    assert trust.verify_ledger_chain() == {'checked': 3, 'dids': 1, 'broken': []}
+    summary = trust.get_ledger_summary('did:agent:old')
+    assert (summary['first_seen'], summary['last_score'], summary['entries']) == \
+        ('2025-03-01T08:00:00.000000', 0.7, 3)
+    with trust.db_connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM trust_ledger_legacy').fetchone()[0] == 2
+
+
+def _heads_from_events():
+    """Recompute every head's summary from the events alone."""
+    heads = {}
+    for shard in range(trust.shard_count()):
+        with trust.db_connection(shard=shard) as conn:
+            rows = conn.execute('SELECT did, timestamp, event, trust_score FROM trust_ledger_events '
+                                'ORDER BY did, timestamp, seq').fetchall()
+        for did, timestamp, event, score in rows:
+            first_seen, _, flags, entries = heads.get(did, (timestamp, None, 0, 0))
+            heads[did] = (first_seen, score, flags + (event == 'flag'), entries + 1)
+    return heads
+
+
+def _stored_heads():
+    heads = {}
+    for shard in range(trust.shard_count()):
+        with trust.db_connection(shard=shard) as conn:
+            for did, *summary in conn.execute('SELECT did, first_seen, last_score, flag_count, entries '
+                                              'FROM trust_ledger_heads'):
+                heads[did] = tuple(summary)
+    return heads
+
+
+def _append_history(round_):
+    trust.insert_trust_scores([(f'did:agent:{i}', (i + round_) % 10 / 10) for i in range(20)])
+    for i in range(0, 20, 3):
+        trust.flag_did(f'did:agent:{i}')
+    for i in range(0, 20, 6):
+        trust.unflag_did(f'did:agent:{i}')
+    trust.insert_trust_score('did:agent:1', 0.95)
+    trust.update_trust_ledger('did:agent:2', 0.15)
+
+
+def test_backfilled_heads_match_the_events(use_database):
+    use_database(shards=2)
+    _append_history(0)
+    for shard in range(2):  # Heads written before the summary columns existed
+        with trust.db_connection(shard=shard) as conn:
+            conn.execute('UPDATE trust_ledger_heads SET first_seen = NULL, last_score = NULL, flag_count = 0')
+
+    assert trust.backfill_ledger_summaries() == 20
+    assert _stored_heads() == _heads_from_events()
+    assert trust.backfill_ledger_summaries() == 0  # Only heads missing first_seen are touched
+
+    _append_history(1)
+    assert _stored_heads() == _heads_from_events()
+
+    with trust.db_connection(did='did:agent:3') as conn:
+        conn.execute("UPDATE trust_ledger_heads SET last_score = 0.0, flag_count = 9 WHERE did = 'did:agent:3'")
+    assert trust.backfill_ledger_summaries(full=True) == 20
+    assert _stored_heads() == _heads_from_events()
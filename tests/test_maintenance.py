@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import time
+
+import pytest
+
+import did_trust_scoring as trust
+
+
+def _fill_and_delete(rows=3000):
+    trust.insert_trust_scores([(f'did:agent:{i}', 0.5) for i in range(rows)])
+    with trust.db_connection() as conn:
+        conn.execute('DELETE FROM trust_ledger_events')
+        conn.execute('DELETE FROM did_scores')
+
+
+@pytest.fixture
+def maintenance(use_database):
+    path = use_database()
+    return trust.DatabaseMaintenance(path, checkpoint_interval=60, integrity_interval=60, analyze_interval=60,
+                                     vacuum_interval=60, vacuum_pages=100000)
+
+
+def test_jobs_come_due_after_their_interval(maintenance):
+    now = time.monotonic()
+    assert maintenance.due(now) == []
+    assert maintenance.due(now + 61) == ['checkpoint', 'vacuum', 'analyze', 'integrity']
+    maintenance.config['checkpoint_wal_bytes'] = 1
+    trust.insert_trust_score('did:agent:a', 0.5)
+    assert maintenance.due(now) == ['checkpoint']  # A large WAL does not wait for the timer
+
+
+def test_checkpoint_truncates_a_large_wal(maintenance):
+    trust.insert_trust_scores([(f'did:agent:{i}', 0.5) for i in range(500)])
+    assert maintenance.wal_bytes() > 0
+
+    passive = maintenance.run('checkpoint')
+    assert passive['mode'] == 'PASSIVE' and not passive['busy']
+    assert passive['checkpointed_frames'] == passive['log_frames']
+
+    maintenance.config['checkpoint_wal_bytes'] = 1
+    truncate = maintenance.run('checkpoint')
+    assert truncate['mode'] == 'TRUNCATE' and not truncate['busy']
+    assert maintenance.wal_bytes() == 0
+
+
+def test_quick_check_and_analyze(maintenance):
+    trust.insert_trust_scores([(f'did:agent:{i}', 0.5) for i in range(100)])
+    assert maintenance.run('integrity') == {'ok': True, 'problems': []}
+    assert maintenance.run('analyze') == {'analysis_limit': trust.MAINTENANCE_CONFIG['analysis_limit']}
+    with trust.db_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_stat1 WHERE tbl = 'did_scores'").fetchone()[0] > 0
+
+
+def test_run_due_runs_every_due_job_once(maintenance):
+    results = maintenance.run_due(time.monotonic() + 61)
+    assert sorted(results) == sorted(trust.DatabaseMaintenance.JOBS)
+    assert maintenance.run_due() == {}
+    assert maintenance.stats()['runs'] == {job: 1 for job in trust.DatabaseMaintenance.JOBS}
+
+
+def test_incremental_vacuum_releases_free_pages(maintenance):
+    with trust.db_connection() as conn:
+        assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2  # New databases start INCREMENTAL
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    _fill_and_delete()
+    maintenance.run('checkpoint')
+
+    result = maintenance.run('vacuum')
+    assert result['freed_pages'] > 0 and result['free_pages'] == 0
+
+
+def test_existing_database_needs_a_full_vacuum_first(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(path)  # Created before auto_vacuum was set on new files
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE blobs (id INTEGER PRIMARY KEY, data BLOB)')
+    conn.executemany('INSERT INTO blobs (data) VALUES (?)', [(os.urandom(2000),) for _ in range(500)])
+    conn.commit()
+    conn.execute('DELETE FROM blobs')
+    conn.commit()
+    conn.close()
+    maintenance = trust.DatabaseMaintenance(path, vacuum_pages=100000)
+
+    assert 'enable_incremental_vacuum' in maintenance.run('vacuum')['skipped']
+    assert maintenance.enable_incremental_vacuum() is True
+    assert maintenance.enable_incremental_vacuum() is False
+
+    conn = sqlite3.connect(path)
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    conn.executemany('INSERT INTO blobs (data) VALUES (?)', [(os.urandom(2000),) for _ in range(500)])
+    conn.commit()
+    conn.execute('DELETE FROM blobs')
+    conn.commit()
+    conn.close()
+    result = maintenance.run('vacuum')
+    assert result['freed_pages'] > 0 and result['free_pages'] == 0
@@ -0,0 +1,126 @@
+import asyncio
+import time
+import types
+
+import pytest
+
+import did_verification
+from did_verification import MetadataCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(did_verification, 'time',
+                        types.SimpleNamespace(monotonic=clock.monotonic, perf_counter=time.perf_counter))
+    return clock
+
+
+class Resolver:
+    """Counts fetches; answers with `status` after an optional delay."""
+
+    def __init__(self, status='verified', delay=0):
+        self.status = status
+        self.delay = delay
+        self.calls = []
+
+    async def __call__(self, did, did_type):
+        self.calls.append(did)
+        call = len(self.calls)
+        await asyncio.sleep(self.delay)
+        return {'status': self.status, 'call': call}
+
+
+def test_concurrent_misses_share_one_fetch():
+    async def scenario():
+        cache, resolver = MetadataCache(), Resolver(delay=0.01)
+        results = await asyncio.gather(*(cache.get('did:agent:a', 'agent', resolver) for _ in range(10)))
+        return cache, resolver, results
+
+    cache, resolver, results = asyncio.run(scenario())
+    assert resolver.calls == ['did:agent:a']
+    assert results == [{'status': 'verified', 'call': 1}] * 10
+    assert (cache.misses, cache.coalesced, cache.stats()['inflight']) == (1, 9, 0)
+
+
+def test_ttl_depends_on_the_method(clock):
+    cache, resolver = MetadataCache(), Resolver()
+
+    async def lookups():
+        await cache.get('did:agent:a', 'agent', resolver)
+        await cache.get('did:w3c:a', 'w3c', resolver)
+
+    asyncio.run(lookups())
+    clock.now += 61  # Past the agent TTL, within the w3c one
+    asyncio.run(lookups())
+    assert resolver.calls == ['did:agent:a', 'did:w3c:a', 'did:agent:a']
+    assert cache.expirations == 1
+
+    clock.now += 3600
+    asyncio.run(lookups())
+    assert resolver.calls[3:] == ['did:agent:a', 'did:w3c:a']
+
+
+def test_unverified_records_expire_after_the_negative_ttl(clock):
+    cache, resolver = MetadataCache(), Resolver(status='revoked')
+    asyncio.run(cache.get('did:w3c:a', 'w3c', resolver))
+    clock.now += 14.9
+    asyncio.run(cache.get('did:w3c:a', 'w3c', resolver))
+    assert len(resolver.calls) == 1
+    clock.now += 0.2
+    asyncio.run(cache.get('did:w3c:a', 'w3c', resolver))
+    assert len(resolver.calls) == 2
+
+
+def test_fetch_errors_are_not_cached():
+    cache = MetadataCache()
+    calls = []
+
+    async def failing(did, did_type):
+        calls.append(did)
+        raise RuntimeError("resolver unavailable")
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            asyncio.run(cache.get('did:agent:a', 'agent', failing))
+    assert len(calls) == 2 and len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache, resolver = MetadataCache(max_entries=2), Resolver()
+
+    async def scenario():
+        await cache.get('did:agent:a', 'agent', resolver)
+        await cache.get('did:agent:b', 'agent', resolver)
+        await cache.get('did:agent:a', 'agent', resolver)  # a is now the most recently used
+        await cache.get('did:agent:c', 'agent', resolver)
+        await cache.get('did:agent:a', 'agent', resolver)
+        await cache.get('did:agent:b', 'agent', resolver)
+
+    asyncio.run(scenario())
+    assert resolver.calls == ['did:agent:a', 'did:agent:b', 'did:agent:c', 'did:agent:b']
+    assert cache.evictions == 2
+
+
+@pytest.mark.parametrize('target', ['did:agent:a', None])
+def test_invalidate_during_a_fetch_discards_its_result(target):
+    cache, resolver = MetadataCache(), Resolver(delay=0.02)
+
+    async def scenario():
+        stale = asyncio.ensure_future(cache.get('did:agent:a', 'agent', resolver))
+        await asyncio.sleep(0.005)
+        cache.invalidate(target)
+        fresh = await cache.get('did:agent:a', 'agent', resolver)  # Does not join the stale fetch
+        return await stale, fresh, await cache.get('did:agent:a', 'agent', resolver)
+
+    stale, fresh, cached = asyncio.run(scenario())
+    assert (stale['call'], fresh['call'], cached['call']) == (1, 2, 2)
+    assert len(resolver.calls) == 2
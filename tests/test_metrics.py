@@ -0,0 +1,98 @@
+import logging
+import queue
+import urllib.request
+
+import pytest
+
+import did_metrics
+from did_metrics import DroppingQueueHandler, MetricsRegistry, timed
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    requests = registry.counter('app_requests_total', 'Requests "served"\nby route', ('route',))
+    requests.inc(route='/b')
+    requests.inc(2, route='/a"x')
+    registry.counter('app_idle_total', 'Never incremented')
+
+    assert registry.render() == (
+        '# HELP app_idle_total Never incremented\n'
+        '# TYPE app_idle_total counter\n'
+        '# HELP app_requests_total Requests \\"served\\"\\nby route\n'
+        '# TYPE app_requests_total counter\n'
+        'app_requests_total{route="/a\\"x"} 2\n'
+        'app_requests_total{route="/b"} 1\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram('app_seconds', 'Latency', ('op',), buckets=(0.1, 0.5, 1.0))
+    for value in (0.05, 0.1, 0.3, 0.7, 2.0, 3.0):
+        latency.observe(value, op='read')
+
+    samples = [(name, dict(labels), value) for name, labels, value in latency.samples()]
+    assert samples == [
+        ('app_seconds_bucket', {'op': 'read', 'le': '0.1'}, 2),  # Upper bounds are inclusive
+        ('app_seconds_bucket', {'op': 'read', 'le': '0.5'}, 3),
+        ('app_seconds_bucket', {'op': 'read', 'le': '1.0'}, 4),
+        ('app_seconds_bucket', {'op': 'read', 'le': '+Inf'}, 6),
+        ('app_seconds_sum', {'op': 'read'}, pytest.approx(6.15)),
+        ('app_seconds_count', {'op': 'read'}, 6),
+    ]
+    assert latency.value(op='read')['count'] == 6
+    assert latency.value(op='write') == {'count': 0, 'sum': 0.0}
+    assert 'app_seconds_bucket{op="read",le="+Inf"} 6' in registry.render()
+
+
+def test_histograms_are_observed_not_incremented():
+    registry = MetricsRegistry()
+    with pytest.raises(TypeError):
+        registry.histogram('app_seconds', 'Latency').inc()
+    with pytest.raises(ValueError):
+        registry.counter('app_seconds', 'Same name, other kind')
+
+
+def test_timed_labels_the_outcome():
+    registry = MetricsRegistry()
+    latency = registry.histogram('job_seconds', 'Job time', ('job', 'outcome'))
+
+    @timed(latency, job='sync')
+    def job(fail):
+        if fail:
+            raise RuntimeError("boom")
+
+    job(False)
+    with pytest.raises(RuntimeError):
+        job(True)
+    assert latency.value(job='sync', outcome='ok')['count'] == 1
+    assert latency.value(job='sync', outcome='error')['count'] == 1
+
+
+def test_full_log_queue_drops_and_counts_records():
+    log_queue = queue.Queue(2)
+    handler = DroppingQueueHandler(log_queue)
+    logger = logging.getLogger('test_metrics.dropping')
+    logger.propagate = False
+    logger.addHandler(handler)
+    dropped = did_metrics.LOG_RECORDS_DROPPED.value()
+    try:
+        for i in range(5):
+            logger.warning(f"record {i}")  # Never blocks, however full the queue
+    finally:
+        logger.removeHandler(handler)
+
+    assert [log_queue.get_nowait().getMessage() for _ in range(2)] == ['record 0', 'record 1']
+    assert did_metrics.LOG_RECORDS_DROPPED.value() - dropped == 3
+
+
+def test_metrics_server_serves_the_shared_registry():
+    did_metrics.counter('test_scrapes_total', 'Scrapes seen by the test').inc()
+    server = did_metrics.start_metrics_server(port=0)
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.server_address[1]}/metrics', timeout=5) as response:
+            assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+            body = response.read().decode()
+    finally:
+        server.shutdown()
+    assert 'test_scrapes_total 1' in body
@@ -0,0 +1,117 @@
+import random
+import threading
+from collections import Counter
+
+import did_trust_scoring as trust
+
+
+def _decide(score):
+    rule = trust.policy_index.match(score)
+    return rule[2] if rule else 'pass'
+
+
+def test_most_severe_applicable_action_wins(use_database):
+    use_database()
+    trust.add_policy_rule('watch', 0.9, 'alert')
+    trust.add_policy_rule('check', 0.5, 'review')
+    trust.add_policy_rule('block', 0.3, 'restrict')
+
+    assert [_decide(score) for score in (0.1, 0.3, 0.45, 0.5, 0.89, 0.9, 1.0)] == \
+        ['restrict', 'review', 'review', 'alert', 'alert', 'pass', 'pass']
+
+
+def test_ties_on_min_trust_score(use_database):
+    use_database()
+    trust.add_policy_rule('first-alert', 0.5, 'alert')
+    trust.add_policy_rule('restrict-too', 0.5, 'restrict')
+    trust.add_policy_rule('second-restrict', 0.5, 'restrict')
+
+    assert trust.policy_index.match(0.4) == ('restrict-too', 0.5, 'restrict')
+    assert trust.policy_index.match(0.5) is None
+
+
+def test_lower_threshold_of_same_action_decides(use_database):
+    use_database()
+    trust.add_policy_rule('wide', 0.6, 'review')
+    trust.add_policy_rule('narrow', 0.2, 'review')
+    assert trust.policy_index.match(0.1) == ('narrow', 0.2, 'review')
+    assert trust.policy_index.match(0.4) == ('wide', 0.6, 'review')
+
+
+def test_bulk_sql_case_matches_single_did_enforcement(use_database):
+    use_database()
+    for name, threshold, action in [('a', 0.8, 'alert'), ('r', 0.6, 'review'), ('x', 0.25, 'restrict'),
+                                    ('a2', 0.4, 'alert'), ('x2', 0.6, 'restrict')]:
+        trust.add_policy_rule(name, threshold, action)
+    rng = random.Random(7)
+    scores = [0.0, 0.25, 0.4, 0.6, 0.8, 1.0] + [round(rng.random(), 3) for _ in range(200)]
+    rows = [(f'did:agent:{i}', score) for i, score in enumerate(scores)]
+    trust.insert_trust_scores(rows)
+
+    case, params = trust.policy_index.case_expression('score')
+    with trust.db_connection() as conn:
+        bulk = dict(conn.execute(f'SELECT did, {case} FROM did_scores', params).fetchall())
+    assert bulk == {did: _decide(score) for did, score in rows}
+
+    summary = trust.enforce_trust_policies()
+    expected = Counter(bulk.values())
+    assert {action: summary[action] for action in expected} == dict(expected)
+    for did, _ in rows[:40]:
+        message = trust.enforce_trust_policy(did)
+        assert trust.is_restricted(did) == (bulk[did] == 'restrict')
+        assert ('restricted' in message) == (bulk[did] == 'restrict')
+
+
+class _RulesCursor:
+    """Stands in for a cursor on policy_rules, serving whichever rule set is current."""
+
+    def __init__(self, rule_sets):
+        self.rule_sets = rule_sets
+        self.current = 0
+        self._rows = None
+
+    def execute(self, sql, params=()):
+        if 'policy_rules_version' in sql:
+            self._rows = [(self.current + 1,)]
+        else:
+            self._rows = self.rule_sets[self.current]
+
+    def fetchone(self):
+        return self._rows[0]
+
+    def fetchall(self):
+        return self._rows
+
+
+def test_readers_never_mix_two_rule_sets():
+    rule_sets = [[(1, 'low', 0.5, 'restrict')],
+                 [(1, 'a', 0.2, 'alert'), (2, 'b', 0.4, 'review'), (3, 'c', 0.9, 'alert')]]
+    scores = [0.1, 0.3, 0.6, 0.95]
+    allowed = [{'restrict', 'review'}, {'restrict', 'review'}, {'pass', 'alert'}, {'pass'}]
+    index = trust.PolicyIndex(refresh_interval=3600)
+    cursor = _RulesCursor(rule_sets)
+    index.refresh(cursor, force=True)
+    stop, errors = threading.Event(), []
+
+    def reload():
+        while not stop.is_set():
+            cursor.current ^= 1
+            index.refresh(cursor, force=True)
+
+    def read():
+        try:
+            for _ in range(20000):
+                for score, ok in zip(scores, allowed):
+                    rule = index.match(score)
+                    assert (rule[2] if rule else 'pass') in ok
+        except Exception as e:
+            errors.append(e)
+
+    writer = threading.Thread(target=reload)
+    writer.start()
+    try:
+        read()
+    finally:
+        stop.set()
+        writer.join()
+    assert errors == []
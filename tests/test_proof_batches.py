@@ -0,0 +1,61 @@
+import did_trust_scoring as trust
+
+DIDS = [f'did:agent:{i}' for i in range(20)]
+
+
+def _batch_rows():
+    with trust.db_connection() as conn:
+        return conn.execute('SELECT batch_id, label, leaf_count FROM proof_batches ORDER BY batch_id').fetchall()
+
+
+def _leaf_counts():
+    """seq -> number of proof batches it is a leaf of, for every ledger event."""
+    with trust.db_connection() as conn:
+        return dict(conn.execute('''
+            SELECT e.seq, COUNT(l.seq) FROM trust_ledger_events e
+            LEFT JOIN proof_batch_leaves l ON l.seq = e.seq GROUP BY e.seq
+        ''').fetchall())
+
+
+def test_seal_without_new_events_writes_nothing(use_database):
+    use_database()
+    assert trust.seal_ledger() == []
+    proofs = trust.ProofBatch('test')
+    trust.insert_trust_scores([(did, 0.5) for did in DIDS], proof_batch=proofs)
+    proofs.close()
+    before = _batch_rows()
+
+    assert trust.seal_ledger() == []
+    assert _batch_rows() == before
+    trust.insert_trust_score(DIDS[0], 0.6)
+    assert len(trust.seal_ledger()) == 1
+    assert trust.seal_ledger() == []
+    assert all(leaf_count for _, _, leaf_count in _batch_rows())
+
+
+def test_seal_leaves_events_of_open_batches_alone(use_database):
+    use_database()
+    trust.insert_trust_score('did:agent:single', 0.3)
+    proofs = trust.ProofBatch('test')
+    trust.insert_trust_scores([(did, 0.5) for did in DIDS], proof_batch=proofs)
+
+    sealed = trust.seal_ledger()
+    assert [label for batch_id, label, _ in _batch_rows() if batch_id in sealed] == ['seal']
+    assert sum(_leaf_counts().values()) == 1  # Only the single write
+
+    proofs.close()
+    assert trust.seal_ledger() == []
+    assert set(_leaf_counts().values()) == {1}
+    assert trust.verify_proof_batches()['broken'] == []
+
+
+def test_events_sealed_before_add_are_not_batched_again(use_database):
+    use_database()
+    proofs = trust.ProofBatch('test')
+    events = trust._write_score_chunk(0, [(did, 0.5) for did in DIDS])
+    assert len(trust.seal_ledger()) == 1  # Sealed between the commit and add()
+
+    proofs.add(events)
+    assert proofs.close() == []
+    assert set(_leaf_counts().values()) == {1}
+    assert trust.verify_proof_batches()['broken'] == []
@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import pytest
+
+import did_trust_scoring as trust
+
+SOURCES = ('onchain', 'federated', 'usage', 'social')
+
+
+@pytest.fixture
+def rescored(use_database, monkeypatch):
+    """Stub every trust source; returns the DIDs in the order they were aggregated."""
+    use_database()
+    order = []
+
+    async def onchain(did):
+        order.append(did)
+        return {'score': 0.7}
+
+    async def answer(did):
+        return {'score': 0.7}
+
+    monkeypatch.setattr(trust, 'trust_sources', lambda: {'onchain': onchain, 'federated': answer,
+                                                         'usage': answer, 'social': answer})
+    return order
+
+
+def _expire_components(did, expires_at):
+    with trust.db_connection(did=did) as conn:
+        conn.executemany('INSERT INTO trust_components (did, source, score, fetched_at, expires_at) '
+                         'VALUES (?, ?, 0.5, ?, ?)', [(did, source, expires_at - 60, expires_at) for source in SOURCES])
+
+
+def test_at_risk_and_most_stale_dids_are_rescored_first(rescored):
+    now = time.time()
+    trust.add_policy_rule('review-low', 0.5, 'review')
+    trust.insert_trust_scores([('did:agent:flagged', 0.9), ('did:agent:near', 0.52), ('did:agent:stale', 0.9),
+                               ('did:agent:recent', 0.9), ('did:agent:new', 0.9), ('did:agent:fresh', 0.9)])
+    trust.flag_did('did:agent:flagged')
+    for did, expires_at in [('did:agent:flagged', now - 100), ('did:agent:near', now - 50),
+                            ('did:agent:stale', now - 1000), ('did:agent:recent', now - 10),
+                            ('did:agent:fresh', now + 3600)]:
+        _expire_components(did, expires_at)
+
+    scheduler = trust.RescoreScheduler({'concurrency': 1, 'rate_limits': {}})
+    stats = asyncio.run(scheduler.run(until_idle=True))
+
+    assert rescored == ['did:agent:flagged', 'did:agent:near',  # At risk, most stale first
+                        'did:agent:new', 'did:agent:stale', 'did:agent:recent']
+    assert (stats['rescored'], stats['failed'], stats['queued'], stats['active']) == (5, 0, 0, 0)
+    assert trust.get_trust_score('did:agent:stale') == pytest.approx(0.7)
+
+
+def test_scheduler_shards_split_the_dids(rescored):
+    dids = [f'did:agent:{i}' for i in range(40)]
+    trust.insert_trust_scores([(did, 0.9) for did in dids])
+
+    for shard in range(2):
+        asyncio.run(trust.RescoreScheduler({'concurrency': 4, 'rate_limits': {}}, shard, 2).run(until_idle=True))
+        assert {trust.did_shard(did, 2) for did in rescored} == {shard}
+        rescored.clear()
+    assert trust.RescoreScheduler({'rate_limits': {}}).due_candidates(100) == []
+
+
+def test_rate_limiter_spaces_acquisitions():
+    async def acquire(limiter, n):
+        start = time.perf_counter()
+        for _ in range(n):
+            await limiter.acquire()
+        return time.perf_counter() - start
+
+    assert asyncio.run(acquire(trust.RateLimiter(20, burst=5), 5)) < 0.05  # The burst is free
+    elapsed = asyncio.run(acquire(trust.RateLimiter(20, burst=1), 7))
+    assert 0.29 <= elapsed < 0.6  # Six waits of 1/20s
+
+
+def test_scheduler_respects_source_rate_limits(rescored):
+    trust.insert_trust_scores([(f'did:agent:{i}', 0.9) for i in range(8)])
+    scheduler = trust.RescoreScheduler({'concurrency': 8, 'rate_limits': {'onchain': 5}})
+    start = time.perf_counter()
+    asyncio.run(scheduler.run(until_idle=True))
+    assert len(rescored) == 8
+    assert time.perf_counter() - start >= 0.55  # A burst of 5, then 1/5s per onchain fetch
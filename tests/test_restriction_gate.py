@@ -0,0 +1,89 @@
+import sqlite3
+
+import pytest
+
+import did_trust_scoring as trust
+from did_restriction_gate import BloomFilter, RestrictionGate
+
+
+def test_bloom_filter_has_no_false_negatives():
+    members = [f'did:agent:{i}' for i in range(10000)]
+    bloom = BloomFilter(len(members), 0.01)
+    for did in members:
+        bloom.add(did)
+
+    assert all(did in bloom for did in members)
+    false_positives = sum(f'did:agent:other-{i}' in bloom for i in range(20000))
+    assert false_positives < 20000 * 0.02
+
+
+def test_bloom_filter_round_trips_through_bytes():
+    bloom = BloomFilter(100)
+    for i in range(100):
+        bloom.add(f'did:agent:{i}')
+    copy = BloomFilter.from_bytes(bloom.to_bytes())
+    probes = [f'did:agent:{i}' for i in range(1000)]
+    assert (copy.size, copy.hashes) == (bloom.size, bloom.hashes)
+    assert [did in copy for did in probes] == [did in bloom for did in probes]
+
+
+def test_bloom_filter_rejects_invalid_false_positive_rates():
+    for rate in (0, 1, -0.1):
+        with pytest.raises(ValueError):
+            BloomFilter(10, rate)
+
+
+def test_gate_apply_counts_only_changes():
+    gate = RestrictionGate()
+    gate.replace(['did:agent:a'])
+    assert gate.apply([('did:agent:a', True), ('did:agent:b', True), ('did:agent:c', False)]) == 1
+    assert gate.apply([('did:agent:a', False)]) == 1
+    assert (gate.is_restricted('did:agent:a'), gate.is_restricted('did:agent:b')) == (False, True)
+    assert gate.stats() == {'restricted': 1, 'loaded': True, 'updates': 2}
+
+
+def _flag_elsewhere(did, flagged, shards):
+    """Change a flag through a separate connection, as another process would."""
+    conn = sqlite3.connect(trust.shard_path(trust.did_shard(did, shards), shards))
+    with conn:
+        conn.execute('UPDATE did_scores SET flagged = ? WHERE did = ?', (flagged, did))
+    conn.close()
+
+
+@pytest.mark.parametrize('shards', [1, 2])
+def test_loaded_gate_and_its_bloom_filter_hold_every_flagged_did(use_database, shards):
+    use_database(shards=shards)
+    dids = [f'did:agent:{i}' for i in range(300)]
+    trust.insert_trust_scores([(did, 0.5) for did in dids])
+    flagged = dids[::7]
+    for did in flagged:
+        _flag_elsewhere(did, 1, shards)
+
+    assert trust.load_restriction_gate() == len(flagged)
+    assert [did for did in dids if trust.is_restricted(did)] == flagged
+    bloom = trust.restriction_gate.bloom_filter()
+    assert all(did in bloom for did in flagged)
+
+
+@pytest.mark.parametrize('shards', [1, 2])
+def test_sync_picks_up_flag_changes_from_other_processes(use_database, shards):
+    use_database(shards=shards)
+    trust.insert_trust_scores([(f'did:agent:{i}', 0.5) for i in range(20)])
+    trust.flag_did('did:agent:1')
+    assert trust.is_restricted('did:agent:1')  # Loads the gate
+
+    _flag_elsewhere('did:agent:2', 1, shards)
+    _flag_elsewhere('did:agent:1', 0, shards)
+    _flag_elsewhere('did:agent:3', 1, shards)
+    _flag_elsewhere('did:agent:3', 0, shards)
+    assert trust.is_restricted('did:agent:1') and not trust.is_restricted('did:agent:2')  # Not synced yet
+
+    assert trust.sync_restriction_gate() == 2
+    assert not trust.is_restricted('did:agent:1')
+    assert trust.is_restricted('did:agent:2')
+    assert not trust.is_restricted('did:agent:3')
+    assert trust.sync_restriction_gate() == 0
+
+    trust.unflag_did('did:agent:2')  # Local changes apply at once
+    assert not trust.is_restricted('did:agent:2')
+    assert trust.sync_restriction_gate() == 0
@@ -0,0 +1,90 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import did_trust_scoring as trust
+
+DID = 'did:agent:cached'
+
+
+def test_reads_never_wait_for_a_sync(use_database, monkeypatch):
+    use_database()
+    trust.insert_trust_score(DID, 0.5)
+    cache = trust.score_cache = trust.ScoreCache(sync_interval=0.01)
+    assert cache.get(DID) == (0.5, 0)
+    release, syncing = threading.Event(), threading.Event()
+
+    def stuck_sync():
+        syncing.set()
+        release.wait(5)
+        return 0
+
+    monkeypatch.setattr(cache, '_sync', stuck_sync)
+    time.sleep(0.02)
+    start = time.perf_counter()
+    assert cache.get(DID) == (0.5, 0)
+    assert syncing.wait(1)
+    for _ in range(100):
+        assert cache.get(DID) == (0.5, 0)
+    assert time.perf_counter() - start < 0.5
+    release.set()
+
+
+def test_write_during_a_miss_is_not_overwritten(use_database, monkeypatch):
+    use_database()
+    trust.insert_trust_score(DID, 0.5)
+    trust.score_cache = trust.ScoreCache(sync_interval=0)
+    real_connection = trust.db_connection
+    raced = []
+
+    @contextmanager
+    def racing_connection(*args, **kwargs):
+        with real_connection(*args, **kwargs) as conn:
+            yield conn
+        if not raced:  # The miss has read 0.5; a write commits before it stores what it read
+            raced.append(True)
+            trust.update_trust_score(DID, 0.9)
+
+    monkeypatch.setattr(trust, 'db_connection', racing_connection)
+    assert trust.score_cache.get(DID) == (0.5, 0)
+    monkeypatch.setattr(trust, 'db_connection', real_connection)
+
+    assert raced
+    assert trust.score_cache.get(DID) == (0.9, 0)
+
+
+def test_local_writes_invalidate(use_database):
+    use_database()
+    trust.score_cache = trust.ScoreCache(sync_interval=0)
+    assert trust.get_trust_status(DID) is None
+    trust.insert_trust_score(DID, 0.4)
+    assert trust.get_trust_status(DID) == (0.4, 0)
+    trust.flag_did(DID)
+    assert trust.get_trust_status(DID) == (0.4, 1)
+    trust.insert_trust_scores([(DID, 0.7)])
+    assert trust.get_trust_score(DID) == 0.7
+
+
+def test_other_process_writes_arrive_through_the_change_clock(use_database):
+    path = use_database()
+    trust.insert_trust_score(DID, 0.5)
+    trust.insert_trust_score('did:agent:other', 0.5)
+    cache = trust.score_cache = trust.ScoreCache(sync_interval=0.01)
+    assert cache.get(DID) == (0.5, 0)
+    cache.sync()  # Record the clock position
+
+    # Another process: plain SQL, so nothing in this process is invalidated
+    conn = sqlite3.connect(path)
+    conn.execute('UPDATE did_scores SET score = 0.2 WHERE did = ?', (DID,))
+    conn.execute("UPDATE did_scores SET flagged = 1 WHERE did = 'did:agent:other'")
+    conn.commit()
+    conn.close()
+    assert cache.get(DID) == (0.5, 0)  # Served from memory; the sync runs in the background
+
+    deadline = time.monotonic() + 2
+    while cache.get(DID) != (0.2, 0) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get(DID) == (0.2, 0)
+    assert cache.get('did:agent:other') == (0.5, 1)
+    assert cache.stats()['syncs'] >= 2
@@ -0,0 +1,110 @@
+import json
+import os
+import random
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import did_trust_scoring as trust
+from did_scoring_engine import TRUST_SOURCE_NAMES, ScoringEngine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AGENT_PROFILE = {'onchain': 0.1, 'federated': 0.2, 'usage': 0.35, 'social': 0.35}
+
+
+def _random_components(rng, n):
+    rows = []
+    for _ in range(n):
+        row = {}
+        for name in TRUST_SOURCE_NAMES:
+            roll = rng.random()
+            if roll < 0.3:
+                continue  # Source missing
+            row[name] = None if roll < 0.35 else rng.uniform(-0.2, 1.2)  # Out of range values get clipped
+        rows.append(row)
+    return rows + [{}, {name: None for name in TRUST_SOURCE_NAMES}]
+
+
+def test_score_matrix_matches_weighted_trust_score(monkeypatch):
+    engine = ScoringEngine(trust.TRUST_WEIGHTS, {'agent': AGENT_PROFILE})
+    monkeypatch.setattr(trust, 'scoring_engine', engine)
+    rng = random.Random(3)
+    components = _random_components(rng, 500)
+    methods = [rng.choice(['agent', 'ethr', None]) for _ in components]
+
+    scores = engine.score_matrix(engine.components_matrix(components), methods)
+
+    for row, method, score in zip(components, methods, scores):
+        single = trust.weighted_trust_score(row, method=method)
+        if single is None:
+            assert np.isnan(score)
+        else:
+            assert score == single  # Same float operations in the same order
+    assert np.isnan(scores[-2:]).all()
+
+
+def test_missing_sources_renormalize_the_weights():
+    engine = ScoringEngine(trust.TRUST_WEIGHTS)
+    onchain, social = trust.TRUST_WEIGHTS['onchain'], trust.TRUST_WEIGHTS['social']
+    expected = (onchain * 0.2 + social * 0.9) / (onchain + social)
+
+    assert engine.score({'onchain': 0.2, 'social': 0.9}) == pytest.approx(expected)
+    assert engine.score_matrix([[0.2, np.nan, np.nan, 0.9]])[0] == pytest.approx(expected)
+    assert engine.score({'onchain': 0.4}) == pytest.approx(0.4)
+
+
+def test_only_zero_weight_sources_answering_gives_no_score():
+    engine = ScoringEngine({'onchain': 1.0})
+    assert engine.score({'usage': 0.7}) is None
+    assert np.isnan(engine.score_matrix([[np.nan, np.nan, 0.7, np.nan]])[0])
+
+
+def test_profiles_apply_per_did_method():
+    engine = ScoringEngine(trust.TRUST_WEIGHTS, {'agent': AGENT_PROFILE})
+    components = {'onchain': 1.0, 'federated': 0.0, 'usage': 0.0, 'social': 0.0}
+
+    assert dict(engine.score_many([('did:agent:a', components), ('did:ethr:0x1', components)])) == {
+        'did:agent:a': pytest.approx(0.1), 'did:ethr:0x1': pytest.approx(0.3)}
+    engine.remove_profile('agent')
+    assert engine.score(components, 'agent') == pytest.approx(0.3)
+
+
+@pytest.mark.parametrize('weights', [
+    {'onchain': 0.5, 'social': 0.4},
+    {'onchain': 0.6, 'social': 0.6},
+    {'onchain': 1.2, 'social': -0.2},
+    {'onchain': float('nan'), 'social': 1.0},
+    {'onchain': True},
+    {'onchain': 0.5, 'reputation': 0.5},
+])
+def test_invalid_weights_are_rejected(weights):
+    with pytest.raises(ValueError):
+        ScoringEngine(weights)
+    engine = ScoringEngine(trust.TRUST_WEIGHTS)
+    with pytest.raises(ValueError):
+        engine.set_profile('agent', weights)
+    with pytest.raises(ValueError):
+        trust.weighted_trust_score({'onchain': 0.5}, weights=weights)
+    assert engine.profiles() == {}
+
+
+def _import_with_profiles(tmp_path, profiles):
+    env = {**os.environ, 'TRUST_WEIGHT_PROFILES': json.dumps(profiles), 'PYTHONPATH': ROOT}
+    return subprocess.run(
+        [sys.executable, '-c', 'import json, did_trust_scoring as t; print(json.dumps(t.scoring_engine.profiles()))'],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60)
+
+
+def test_env_json_profiles_are_loaded(tmp_path):
+    result = _import_with_profiles(tmp_path, {'agent': AGENT_PROFILE, 'fed': {'federated': 1.0}})
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.splitlines()[-1]) == {
+        'agent': AGENT_PROFILE, 'fed': {'onchain': 0.0, 'federated': 1.0, 'usage': 0.0, 'social': 0.0}}
+
+
+def test_env_profile_that_does_not_sum_to_one_fails_at_import(tmp_path):
+    result = _import_with_profiles(tmp_path, {'agent': {'usage': 0.5, 'social': 0.4}})
+    assert result.returncode != 0
+    assert 'must sum to 1' in result.stderr
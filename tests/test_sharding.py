@@ -0,0 +1,75 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+import did_trust_scoring as trust
+
+DIDS = [f'did:agent:{i}' for i in range(40)]
+
+
+def _ledger_events(did):
+    return [(entry['event'], entry['trust_score']) for entry in trust.ledger_range(did)]
+
+
+def _fail_once_on_shard(monkeypatch, name, failing_shard):
+    """Make `name` raise a lock error the first time it runs for `failing_shard`."""
+    original = getattr(trust, name)
+    failed = []
+
+    def flaky(shard, *args):
+        if shard == failing_shard and not failed:
+            failed.append(shard)
+            raise sqlite3.OperationalError('database is locked')
+        return original(shard, *args)
+
+    flaky.__name__ = original.__name__
+    monkeypatch.setattr(trust, name, flaky)
+    return failed
+
+
+@pytest.mark.parametrize('shards', [1, 4])
+def test_dids_route_to_one_shard(use_database, shards):
+    use_database(shards=shards)
+    trust.insert_trust_scores([(did, 0.5) for did in DIDS])
+    seen = {}
+    for shard in range(shards):
+        with trust.db_connection(shard=shard) as conn:
+            for (did,) in conn.execute('SELECT did FROM did_scores'):
+                seen[did] = shard
+    assert seen == {did: trust.shard_of(did) for did in DIDS}
+    assert trust.verify_ledger_chain()['broken'] == []
+
+
+def test_bulk_repair_retries_only_the_locked_shard(use_database, monkeypatch):
+    use_database(shards=4)
+    trust.insert_trust_scores([(did, 0.2) for did in DIDS])
+    for did in DIDS:
+        trust.flag_did(did)
+        trust.initiate_trust_recovery(did)
+    failed = _fail_once_on_shard(monkeypatch, '_repair_shard', 1)
+
+    updates = asyncio.run(trust.run_db(trust.bulk_trust_repair))
+
+    assert failed == [1]
+    assert set(updates) == set(DIDS)
+    for did in DIDS:
+        assert trust.get_trust_score(did) == pytest.approx(updates[did])
+        assert [event for event, _ in _ledger_events(did)].count('recovery') == 1
+
+
+def test_insert_retries_only_the_locked_shard(use_database, monkeypatch):
+    use_database(shards=4)
+    failed = _fail_once_on_shard(monkeypatch, '_write_score_chunk', 2)
+    proofs = trust.ProofBatch('test')
+
+    asyncio.run(trust.run_db(trust.insert_trust_scores, [(did, 0.7) for did in DIDS], 1000, proofs))
+    proofs.close()
+
+    assert failed == [2]
+    for did in DIDS:
+        assert _ledger_events(did) == [('score', 0.7)]
+    assert trust.verify_proof_batches() == {'checked': 4, 'broken': []}
+    with trust.db_connection(shard=2) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM proof_batch_leaves').fetchone()[0] == len(
+            [did for did in DIDS if trust.shard_of(did) == 2])
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+import did_trust_scoring as trust
+from did_social_graph import DEFAULT_TELEPORT, SocialTrustGraph
+
+
+def _cycle():
+    graph = SocialTrustGraph()
+    graph.update_edges([('did:a', 'did:b', 1.0), ('did:b', 'did:c', 1.0), ('did:c', 'did:a', 1.0),
+                        ('did:fan', 'did:a', 1.0)])
+    return graph
+
+
+def test_no_score_before_propagation():
+    assert _cycle().score('did:a') is None
+
+
+def test_unendorsed_dids_have_no_score():
+    graph = _cycle()
+    graph.propagate()
+
+    assert graph.score('did:fan') is None  # Endorses others, endorsed by nobody
+    assert graph.score('did:unknown') is None
+    assert 0.5 < graph.score('did:a') <= 1.0
+    # The teleport-only mass an unendorsed DID holds, which used to be reported as its score
+    assert graph.trust('did:fan') * len(graph) == pytest.approx(DEFAULT_TELEPORT)
+
+
+def test_average_trust_scores_one_half():
+    graph = SocialTrustGraph()
+    graph.update_edges([('did:a', 'did:b', 1.0), ('did:b', 'did:c', 1.0), ('did:c', 'did:a', 1.0)])
+    graph.propagate()
+    assert [graph.score(did) for did in ('did:a', 'did:b', 'did:c')] == pytest.approx([0.5] * 3)
+
+
+def test_pretrusted_dids_score_without_endorsements():
+    graph = _cycle()
+    graph.set_pretrusted(['did:fan'])
+    graph.propagate()
+    assert graph.score('did:fan') is not None
+    assert graph.score('did:unknown') is None
+
+
+def test_losing_the_last_endorsement_counts_as_a_change():
+    graph = _cycle()
+    graph.propagate()
+    graph.remove_edge('did:c', 'did:a')
+    graph.remove_edge('did:fan', 'did:a')
+    graph.propagate()
+    assert graph.score('did:a') is None
+    assert 'did:a' in graph.changed_dids(min_delta=1.0)
+
+
+def test_social_source_missing_for_unendorsed_did(monkeypatch):
+    graph = _cycle()
+    graph.propagate()
+    monkeypatch.setattr(trust, 'social_graph', graph)
+    assert asyncio.run(trust.fetch_social_signals('did:fan')) == {'score': None}
+    assert asyncio.run(trust.fetch_social_signals('did:a'))['score'] == graph.score('did:a')
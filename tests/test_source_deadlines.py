@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+import pytest
+
+import did_trust_scoring as trust
+
+
+@pytest.fixture
+def slow_federation(use_database, monkeypatch):
+    """Stub the trust sources: federated answers long after its deadline, the others at once."""
+    use_database()
+    cancelled = []
+
+    async def answer(did):
+        return {'score': 0.6}
+
+    async def slow(did):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(did)
+            raise
+        return {'score': 0.0}
+
+    async def failing(did):
+        raise RuntimeError("usage stream unavailable")
+
+    monkeypatch.setattr(trust, 'trust_sources', lambda: {'onchain': answer, 'federated': slow,
+                                                         'usage': failing, 'social': answer})
+    return cancelled
+
+
+def test_late_source_is_dropped_and_the_rest_aggregated(slow_federation):
+    start = time.perf_counter()
+    report = asyncio.run(trust.aggregate_trust_report('did:agent:a', deadlines={'federated': 0.05}))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1  # Bounded by the deadline, not by the slow source
+    assert slow_federation == ['did:agent:a']  # The late fetch was cancelled, not left running
+    assert report['late'] == ['federated'] and report['missing'] == ['usage']
+    assert report['components'] == {'onchain': 0.6, 'social': 0.6}
+    assert report['partial'] is True
+    assert report['score'] == pytest.approx(0.6)  # Weights renormalized over the sources that answered
+    assert trust.get_trust_score('did:agent:a') == pytest.approx(0.6)
+
+
+def test_late_source_is_not_cached(slow_federation):
+    asyncio.run(trust.aggregate_trust_report('did:agent:a', deadlines={'federated': 0.05}))
+    assert sorted(trust.load_trust_components('did:agent:a')) == ['onchain', 'social']
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import did_trust_scoring as trust
+
+NOW = datetime(2026, 6, 1)
+FROZEN_TIMESTAMP = '2026-06-01T00:00:00.000000'  # Every ledger event written by a repair pass
+
+
+def original_repair_pass(now):
+    """periodic_trust_repair()'s per-DID loop as it was before bulk_trust_repair(), written against the tables.
+
+    The one addition is the 'recovery' ledger event recording each change
+    (bulk_trust_repair() writes one per repaired DID), appended with the
+    unchanged append_ledger_event(). It makes ledgers comparable and keeps
+    later passes honest: DIDs without history get a first-seen time from it.
+    """
+    with trust.db_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT did FROM trust_recovery WHERE status = 'pending'")
+        dids = c.fetchall()
+    for (did,) in dids:
+        with trust.db_connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT MIN(timestamp) FROM trust_ledger_events WHERE did = ?', (did,))
+            first = c.fetchone()[0]
+            c.execute('SELECT flagged FROM did_scores WHERE did = ?', (did,))
+            flagged_row = c.fetchone()
+            if first is None:
+                multiplier = 1
+            else:
+                old = now - datetime.fromisoformat(first) > timedelta(days=180)
+                if flagged_row and flagged_row[0]:
+                    multiplier = 0.3 if old else 0.6
+                else:
+                    multiplier = 0.8 if old else 1
+            c.execute('SELECT score FROM did_scores WHERE did = ?', (did,))
+            row = c.fetchone()
+            new_score = min((row[0] if row else 0.0) + (0.1 * multiplier), 1.0)
+            c.execute('UPDATE did_scores SET score = ? WHERE did = ?', (new_score, did))
+            if c.rowcount:
+                trust.append_ledger_event(c, did, new_score, 'recovery')
+            conn.commit()
+
+
+def seed():
+    """Pending DIDs across every branch of the decay model, plus DIDs the repair must leave alone."""
+    population = [
+        # did, score, flagged, first ledger timestamp (None = no history), recovery status
+        ('did:agent:old-flagged', 0.2, 1, '2025-01-01T00:00:00.000000', 'pending'),
+        ('did:agent:new-flagged', 0.3, 1, '2026-05-01T00:00:00.000000', 'pending'),
+        ('did:agent:old-normal', 0.5, 0, '2025-02-01T00:00:00.000000', 'pending'),
+        ('did:agent:new-normal', 0.45, 0, '2026-04-01T00:00:00.000000', 'pending'),
+        ('did:agent:no-history-flagged', 0.1, 1, None, 'pending'),
+        ('did:agent:no-history', 0.6, 0, None, 'pending'),
+        ('did:agent:capped', 0.97, 0, '2026-03-01T00:00:00.000000', 'pending'),
+        ('did:agent:verified', 0.4, 0, '2025-03-01T00:00:00.000000', 'verified'),
+        ('did:agent:not-recovering', 0.2, 1, '2025-03-01T00:00:00.000000', None),
+    ]
+    with trust.db_connection() as conn:
+        c = conn.cursor()
+        for did, score, flagged, first, status in population:
+            c.execute('INSERT INTO did_scores (did, score, flagged) VALUES (?, ?, ?)', (did, score, flagged))
+            if first is not None:
+                trust.append_ledger_event(c, did, score, 'score', timestamp=first)
+            if status is not None:
+                c.execute("INSERT INTO trust_recovery (did, recovery_stage, last_attempt, status) "
+                          "VALUES (?, 'start', '2026-05-31 00:00:00', ?)", (did, status))
+        # Pending without a score row: neither path may touch it
+        c.execute("INSERT INTO trust_recovery (did, recovery_stage, last_attempt, status) "
+                  "VALUES ('did:agent:unscored', 'start', '2026-05-31 00:00:00', 'pending')")
+        conn.commit()
+
+
+def snapshot():
+    with trust.db_connection() as conn:
+        c = conn.cursor()
+        scores = c.execute('SELECT did, score, flagged FROM did_scores ORDER BY did').fetchall()
+        recovery = c.execute('SELECT * FROM trust_recovery ORDER BY did').fetchall()
+        ledger = c.execute('SELECT did, timestamp, event, trust_score, prev_hash, hash '
+                           'FROM trust_ledger_events ORDER BY did, seq').fetchall()
+        heads = c.execute('SELECT did, last_hash, entries, first_seen, last_score FROM trust_ledger_heads '
+                          'ORDER BY did').fetchall()
+    return {'scores': scores, 'recovery': recovery, 'ledger': ledger, 'heads': heads}
+
+
+@pytest.mark.parametrize('passes', [1, 3])
+def test_bulk_repair_matches_per_did_loop(use_database, monkeypatch, passes):
+    monkeypatch.setattr(trust, 'utc_timestamp', lambda: FROZEN_TIMESTAMP)
+
+    use_database('per-did')
+    seed()
+    for _ in range(passes):
+        original_repair_pass(NOW)
+    expected = snapshot()
+
+    use_database('bulk')
+    seed()
+    for _ in range(passes):
+        trust.bulk_trust_repair(NOW)
+    actual = snapshot()
+
+    assert actual == expected
+    scores = {did: score for did, score, _ in actual['scores']}
+    assert scores['did:agent:capped'] == 1.0
+    assert scores['did:agent:verified'] == 0.4
+    assert trust.verify_ledger_chain()['broken'] == []
+
+
+def test_null_scores_are_skipped_by_both_repair_paths(use_database):
+    use_database()
+    with trust.db_connection() as conn:
+        conn.execute("INSERT INTO did_scores (did, score, flagged) VALUES ('did:agent:null', NULL, 1)")
+        conn.execute("INSERT INTO did_scores (did, score, flagged) VALUES ('did:agent:scored', 0.4, 0)")
+        conn.executemany("INSERT INTO trust_recovery (did, recovery_stage, last_attempt, status) "
+                         "VALUES (?, 'start', '2026-05-31 00:00:00', 'pending')",
+                         [('did:agent:null',), ('did:agent:scored',)])
+    before = snapshot()
+
+    assert trust.repair_trust_score('did:agent:null') is None
+    assert snapshot() == before
+    assert trust.bulk_trust_repair(NOW) == {'did:agent:scored': pytest.approx(0.5)}
+    assert trust.repair_trust_score('did:agent:scored') == pytest.approx(0.6)
+    scores = {did: score for did, score, _ in snapshot()['scores']}
+    assert scores == {'did:agent:null': None, 'did:agent:scored': pytest.approx(0.6)}
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+
+from did_usage_stream import UsageAggregator
+
+
+def test_eviction_drops_the_least_recently_ingested_dids():
+    aggregator = UsageAggregator(max_profiles=10)
+    for i in range(10):
+        aggregator.ingest(f'did:agent:{i}', 'call', 'did:agent:peer', 1000.0 + i)
+    aggregator.ingest('did:agent:0', 'call', 'did:agent:peer', 1010.0)
+
+    aggregator.ingest('did:agent:new', 'call', 'did:agent:peer', 1011.0)
+
+    assert aggregator.dropped_profiles == 1
+    assert 'did:agent:1' not in aggregator
+    assert 'did:agent:0' in aggregator
+    assert 'did:agent:new' in aggregator
+    assert len(aggregator) == 10
+
+
+def test_eviction_keeps_memory_bounded_under_churn():
+    aggregator = UsageAggregator(max_profiles=100)
+    aggregator.ingest_many((f'did:agent:{i}', 'call', '', float(i)) for i in range(5000))
+    assert len(aggregator) <= 100
+    assert aggregator.dropped_profiles == 5000 - len(aggregator)
+    assert 'did:agent:4999' in aggregator
+
+
+def test_features_wait_for_ingest():
+    aggregator = UsageAggregator()
+    aggregator.ingest('did:agent:reader', 'call', 'did:agent:peer', 1000.0)
+    result = []
+    with aggregator._lock:  # An ingest batch in progress
+        reader = threading.Thread(target=lambda: result.append(aggregator.features('did:agent:reader')))
+        reader.start()
+        reader.join(0.05)
+        assert reader.is_alive()
+    reader.join()
+    assert result[0]['events_long'] == 1.0
+
+
+def test_readers_do_not_wait_for_a_whole_batch():
+    aggregator = UsageAggregator()
+    aggregator.ingest('did:agent:reader', 'call', 'did:agent:peer', 0.0)
+    events = [(f'did:agent:{i % 5000}', 'call', f'did:agent:peer-{i % 7}', float(i)) for i in range(100000)]
+    writer = threading.Thread(target=aggregator.ingest_many, args=(events,))
+    writer.start()
+    while aggregator.events < 1000:
+        time.sleep(0.001)
+
+    assert aggregator.score('did:agent:reader') is not None
+    assert writer.is_alive()  # The read got in between two slices of the batch
+    writer.join()
+    assert aggregator.events == len(events) + 1
+
+
+def test_ingest_stream_counts_every_event():
+    async def events():
+        for i in range(2500):
+            yield f'did:agent:{i % 10}', 'call', 'did:agent:peer', float(i)
+
+    aggregator = UsageAggregator()
+    assert asyncio.run(aggregator.ingest_stream(events(), batch_size=1000)) == 2500
+    assert aggregator.events == 2500
+    assert len(aggregator) == 10
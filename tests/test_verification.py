@@ -0,0 +1,103 @@
+import asyncio
+import io
+import json
+import sys
+import time
+
+import pytest
+
+import did_verification
+from did_verification import UNSUPPORTED_DID_FORMAT, DIDVerifier, did_method, verify_stream
+
+ETHR = 'did:ethr:0x' + 'ab' * 20
+DIDS = [ETHR, 'did:agent:a1', 'not-a-did', 'did:fed:node_7', 'did:ethr:0x12', 'did:agent:b2', 'did:web:x',
+        'did:w3c:alice']
+EDGE_CASES = [None, 42, '', 'did:', 'did:agent', 'did::x', 'did:agent:', 'did:agent:a:b', 'did:AGENT:a1',
+              'DID:agent:a1', 'did:sol:' + '1' * 32, 'did:sol:' + '0' * 32, 'did:ethr:' + 'ab' * 20,
+              'did:ethr:0x' + 'ab' * 21, 'did:w3c:a b', ' did:agent:a1']
+
+
+class StubVerifier(DIDVerifier):
+    """Resolves instantly; DIDs containing 'b2' fail to resolve."""
+
+    async def resolve_metadata(self, did, did_type):
+        if 'b2' in did:
+            raise RuntimeError("resolver unavailable")
+        return {'status': 'verified', 'source': did_type}
+
+
+def test_validate_many_and_classify_agree_with_is_valid():
+    verifier = DIDVerifier()
+    results = list(verifier.validate_many(DIDS + EDGE_CASES))
+
+    assert [did for did, _, _ in results] == DIDS + EDGE_CASES
+    for did, did_type, error in results:
+        assert did_type == verifier.classify(did)
+        assert (did_type is not None) == verifier.is_valid(did)
+        assert error == (None if did_type is not None else UNSUPPORTED_DID_FORMAT)
+        if did_type is not None:
+            assert did_type == did_method(did) == verifier.validate(did)
+
+
+def _run(dids, **options):
+    out = io.StringIO()
+    summary = asyncio.run(verify_stream(dids, out, **options))
+    return summary, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_results_keep_input_order_and_counts(workers):
+    summary, records = _run(iter(DIDS * 5), workers=workers, chunk_size=3)
+
+    assert [record['did'] for record in records] == DIDS * 5
+    verifier = DIDVerifier()
+    assert [record['valid'] for record in records] == [verifier.is_valid(did) for did in DIDS * 5]
+    assert summary == {'total': 40, 'valid': 25, 'invalid': 15,
+                       'methods': {'agent': 10, 'ethr': 5, 'fed': 5, 'w3c': 5}}
+
+
+def test_workers_one_matches_process_pool():
+    assert _run(DIDS * 50, workers=1, chunk_size=7) == _run(DIDS * 50, workers=2, chunk_size=7)
+
+
+def test_resolve_reports_errors_per_record():
+    summary, records = _run(DIDS, workers=1, chunk_size=3, resolve=True, verifier=StubVerifier())
+
+    by_did = {record['did']: record for record in records}
+    assert by_did['did:agent:b2'] == {'did': 'did:agent:b2', 'valid': True, 'method': 'agent',
+                                      'error': 'resolver unavailable'}
+    assert by_did[ETHR]['metadata'] == {'status': 'verified', 'source': 'ethr'}
+    assert by_did['not-a-did'] == {'did': 'not-a-did', 'valid': False, 'error': UNSUPPORTED_DID_FORMAT}
+    assert summary['resolution'] == {'error': 1, 'verified': 4}
+
+
+def test_resolution_overlaps_classification(monkeypatch):
+    delay = 0.2
+    classify = did_verification._classify_chunk
+
+    def slow_classify(dids):
+        time.sleep(delay)
+        return classify(dids)
+
+    class SlowVerifier(DIDVerifier):
+        async def resolve_metadata(self, did, did_type):
+            await asyncio.sleep(delay)
+            return {'status': 'verified'}
+
+    monkeypatch.setattr(did_verification, '_classify_chunk', slow_classify)
+    start = time.perf_counter()
+    summary, _ = _run([f'did:agent:{i}' for i in range(4)], workers=1, chunk_size=1, resolve=True,
+                      verifier=SlowVerifier())
+    elapsed = time.perf_counter() - start
+
+    assert summary['resolution'] == {'verified': 4}
+    # One after the other: 8 * delay; overlapped: classification plus the last chunk's lookups
+    assert elapsed < 6 * delay
+
+
+def test_cli_rejects_did_with_input(monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(sys, 'argv', ['did_verification.py', ETHR, '--input', str(tmp_path / 'dids.txt')])
+    with pytest.raises(SystemExit) as exit_info:
+        did_verification.main()
+    assert exit_info.value.code == 2
+    assert 'not both' in capsys.readouterr().err